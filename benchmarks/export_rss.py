@@ -0,0 +1,179 @@
+"""Streams /api/v1/export over synthetic events and samples the RSS of the process.
+
+The export reads events from Redis in chunks, so RSS should stay flat however many
+events are exported. The datastore keys of the given Redis are overwritten, so point
+it at a scratch database:
+
+    python benchmarks/export_rss.py --redis redis://localhost:6379/15 --events 1000000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import time
+from datetime import datetime, timedelta
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--redis", default="redis://localhost:6379/15")
+parser.add_argument("--events", type=int, default=1_000_000)
+parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+parser.add_argument("--samples", type=int, default=20, help="RSS samples to take")
+args = parser.parse_args()
+
+os.environ["REDIS"] = args.redis
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+
+from traffix.dependencies import RedisDependency  # noqa: E402
+from traffix.logic import event_index_key, event_records_key, event_score  # noqa: E402
+from traffix.main import app  # noqa: E402
+
+KEY = "event_game_updates"
+SEED_BATCH_SIZE = 10_000
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as statm:
+        pages = int(statm.read().split()[1])
+    return round(pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024, 1)
+
+
+def peak_rss_mb() -> float:
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+async def seed(redis: RedisDependency, total: int) -> None:
+    start = datetime(2020, 1, 1)
+
+    await redis.redis.delete(
+        *[
+            f"{key}{suffix}"
+            for key in ("event_game_releases", KEY)
+            for suffix in ("", "_sha", "_version", "_synced_at", "_by_date", "_by_id")
+        ]
+    )
+    for offset in range(0, total, SEED_BATCH_SIZE):
+        events = [
+            {
+                "name": f"Game {event_id}",
+                "github_issue_id": event_id,
+                "type": "game_update",
+                "date": str(start + timedelta(minutes=event_id)),
+                "version": f"v{event_id % 100}.{event_id % 7}",
+                "size": event_id % 200,
+                "source": f"https://example.com/games/{event_id}",
+            }
+            for event_id in range(offset + 1, min(offset + SEED_BATCH_SIZE, total) + 1)
+        ]
+        async with redis.redis.pipeline(transaction=False) as pipe:
+            pipe.zadd(
+                event_index_key(KEY),
+                {
+                    event["github_issue_id"]: event_score(event["date"])
+                    for event in events
+                },
+            )
+            pipe.hset(
+                event_records_key(KEY),
+                mapping={
+                    event["github_issue_id"]: json.dumps(event) for event in events
+                },
+            )
+            await pipe.execute()
+
+    await redis.redis.set(f"{KEY}_sha", f"benchmark-{total}")
+    await redis.redis.set(f"{KEY}_synced_at", int(time.time()))
+
+
+async def export(total: int) -> dict:
+    """Drives the export through the ASGI app, discarding the body as it streams."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/v1/export",
+        "raw_path": b"/api/v1/export",
+        "query_string": f"format={args.format}&type=game_update".encode(),
+        "headers": [(b"host", b"benchmark")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+        "app": app,
+    }
+    result = {"status": None, "bytes": 0, "lines": 0, "samples": []}
+    sample_every = max(total // args.samples, 1)
+
+    requested = False
+    finished = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        # The client stays connected until the whole body has been sent
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            lines = result["lines"] + body.count(b"\n")
+            if lines // sample_every > result["lines"] // sample_every:
+                result["samples"].append({"lines": lines, "rss_mb": rss_mb()})
+            result["bytes"] += len(body)
+            result["lines"] = lines
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    return result
+
+
+async def main():
+    redis = RedisDependency(args.redis)
+    await redis.connect()
+    app.state.redis = redis
+
+    try:
+        seed_start = time.perf_counter()
+        await seed(redis, args.events)
+        seed_seconds = time.perf_counter() - seed_start
+
+        rss_before = rss_mb()
+        export_start = time.perf_counter()
+        result = await export(args.events)
+        export_seconds = time.perf_counter() - export_start
+    finally:
+        await redis.disconnect()
+
+    rss = [sample["rss_mb"] for sample in result["samples"]]
+    print(
+        json.dumps(
+            {
+                "events": args.events,
+                "format": args.format,
+                "status": result["status"],
+                "lines": result["lines"],
+                "megabytes": round(result["bytes"] / 1024 / 1024, 1),
+                "seed_seconds": round(seed_seconds, 2),
+                "export_seconds": round(export_seconds, 2),
+                "events_per_second": round(args.events / export_seconds),
+                "rss_before_mb": rss_before,
+                "rss_min_mb": min(rss, default=None),
+                "rss_max_mb": max(rss, default=None),
+                "peak_rss_mb": peak_rss_mb(),
+                "samples": result["samples"],
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,31 @@
+"""In-process fake Redis server, so benchmarks run without a Redis deployment.
+
+The server speaks the Redis protocol over TCP, so the application connects to it
+with its own connection pool exactly as it would to a real Redis.
+"""
+
+import threading
+
+from fakeredis import TcpFakeServer
+
+
+class FakeRedisServer:
+    """Fake Redis listening on a free local port in a background thread."""
+
+    def __init__(self, host: str = "127.0.0.1"):
+        self.server = TcpFakeServer((host, 0), server_type="redis")
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address
+        return f"redis://{host}:{port}/0"
+
+    def start(self) -> "FakeRedisServer":
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
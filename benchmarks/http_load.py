@@ -0,0 +1,188 @@
+"""Load tests the web app end to end over HTTP, reporting latency percentiles and req/s.
+
+Without `--url` the worker writes synthetic datastores into an in-process fake Redis
+and the app is started with uvicorn against it. With `--url` an already running
+deployment is load tested as is. The fake Redis shares a process with the load
+driver, so its results are for comparing commits rather than sizing a deployment.
+Results are saved as JSON named after the current commit:
+
+    python benchmarks/http_load.py --events 100000 --concurrency 32 --duration 30
+    python benchmarks/http_load.py --url http://localhost:8000 --path /game_releases
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from fake_redis import FakeRedisServer
+from reports import save_report
+
+DEFAULT_PATHS = [
+    "/",
+    "/game_releases",
+    "/game_updates",
+    "/api/v1/events?limit=100",
+    "/api/v1/github_events?limit=100",
+]
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--url", help="Running deployment to load test")
+parser.add_argument("--path", action="append", help="Paths requested round robin")
+parser.add_argument("--events", type=int, default=10_000)
+parser.add_argument("--issues", type=int, default=1_000, help="GitHub issues")
+parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+parser.add_argument("--concurrency", type=int, default=32)
+parser.add_argument("--duration", type=float, default=10.0, help="Seconds")
+parser.add_argument("--warmup", type=float, default=2.0, help="Seconds")
+parser.add_argument(
+    "--output", type=Path, help="Defaults to results/http_load/<commit>.json"
+)
+args = parser.parse_args()
+
+fake_redis = None if args.url else FakeRedisServer().start()
+if fake_redis:
+    os.environ["REDIS"] = fake_redis.url
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+
+import httpx  # noqa: E402
+
+from synthetic import seed  # noqa: E402
+from traffix.dependencies import RedisDependency  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_app() -> tuple[str, subprocess.Popen]:
+    """Seeds the fake Redis and serves the app from it, returning its URL."""
+    redis = RedisDependency(fake_redis.url)
+    await redis.connect()
+    await seed(redis.redis, args.events, args.issues)
+    await redis.disconnect()
+
+    port = free_port()
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "traffix.main:app",
+            "--port",
+            str(port),
+            "--workers",
+            str(args.workers),
+            "--log-level",
+            "warning",
+            "--no-access-log",
+        ]
+    )
+
+    url = f"http://127.0.0.1:{port}"
+    async with httpx.AsyncClient() as http:
+        for _ in range(100):
+            try:
+                if (await http.get(f"{url}/health")).status_code == 200:
+                    return url, server
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.1)
+
+    server.terminate()
+    raise RuntimeError("The app did not start within 10 seconds")
+
+
+def percentile(timings: list[float], percent: int) -> float:
+    if len(timings) < 2:
+        return round(timings[0], 3) if timings else 0.0
+    return round(statistics.quantiles(timings, n=100)[percent - 1], 3)
+
+
+def summarize(path: str, samples: list[tuple[float, int]]) -> dict:
+    timings = [latency for latency, _ in samples]
+    return {
+        "path": path,
+        "requests": len(samples),
+        "errors": len([status for _, status in samples if status >= 400]),
+        "requests_per_second": round(len(samples) / args.duration, 1),
+        "p50_ms": percentile(timings, 50),
+        "p95_ms": percentile(timings, 95),
+        "p99_ms": percentile(timings, 99),
+    }
+
+
+async def load(url: str, paths: list[str]) -> dict[str, list[tuple[float, int]]]:
+    """Requests `paths` round robin from `--concurrency` clients.
+
+    Returns the latency in milliseconds and status of every request made after the
+    warm up, by path. Connection errors are recorded with a status of 599.
+    """
+    samples = {path: [] for path in paths}
+    next_path = itertools.cycle(paths).__next__
+
+    start = time.perf_counter()
+    measure_from = start + args.warmup
+    end = measure_from + args.duration
+
+    async def client(http: httpx.AsyncClient):
+        while (now := time.perf_counter()) < end:
+            path = next_path()
+            try:
+                status = (await http.get(path)).status_code
+            except httpx.HTTPError:
+                status = 599
+
+            if now >= measure_from:
+                samples[path].append(((time.perf_counter() - now) * 1000, status))
+
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as http:
+        await asyncio.gather(*[client(http) for _ in range(args.concurrency)])
+
+    return samples
+
+
+async def main():
+    paths = args.path or DEFAULT_PATHS
+    server = None
+    url = args.url
+    if not url:
+        url, server = await start_app()
+
+    try:
+        samples = await load(url, paths)
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        if fake_redis:
+            fake_redis.stop()
+
+    report = save_report(
+        {
+            "url": args.url or "uvicorn with fakeredis",
+            "events": None if args.url else args.events,
+            "workers": None if args.url else args.workers,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "total": summarize("*", list(itertools.chain(*samples.values()))),
+            "results": [summarize(path, samples[path]) for path in paths],
+        },
+        args.output,
+        "http_load",
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""Measures the throughput of the bulk ingestion path for POST /api/v1/events:batch.
+
+Validation runs on one core without Redis, then the whole batch is queued through
+Redis to include serialization and the pipelined writes. The pending queues of the given
+Redis are overwritten, so point it at a scratch database:
+
+    python benchmarks/ingest_throughput.py --redis redis://localhost:6379/15
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--redis", default="redis://localhost:6379/15")
+parser.add_argument("--events", type=int, default=10_000, help="Events per batch")
+parser.add_argument("--rounds", type=int, default=5)
+args = parser.parse_args()
+
+os.environ["REDIS"] = args.redis
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+os.environ["API_INGEST_MAX_BATCH"] = str(args.events)
+
+from traffix.dependencies import RedisDependency  # noqa: E402
+from traffix.ingest import queue_pending_events, validate_batch  # noqa: E402
+
+
+def synthetic_batch(total: int) -> bytes:
+    events = []
+    for event_id in range(1, total + 1):
+        event = {
+            "name": f"Game {event_id}",
+            "github_issue_id": event_id,
+            "date": f"2030-01-{event_id % 28 + 1:02d}T00:00:00",
+            "size": event_id % 200,
+            "source": f"https://example.com/games/{event_id}",
+        }
+        if event_id % 2:
+            event.update(type="game_release", image="https://example.com/image.jpg")
+        else:
+            event.update(type="game_update", version=f"v{event_id % 100}")
+        events.append(event)
+
+    return json.dumps(events).encode("utf-8")
+
+
+async def main():
+    body = synthetic_batch(args.events)
+
+    redis = RedisDependency(args.redis)
+    await redis.connect()
+
+    validate_seconds, queue_seconds = [], []
+    try:
+        for _ in range(args.rounds):
+            start = time.perf_counter()
+            events, errors = validate_batch(body)
+            validate_seconds.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await queue_pending_events(redis, events)
+            queue_seconds.append(time.perf_counter() - start)
+    finally:
+        await redis.disconnect()
+
+    assert not errors and len(events) == args.events
+    best_validate, best_queue = min(validate_seconds), min(queue_seconds)
+    print(
+        json.dumps(
+            {
+                "events": args.events,
+                "rounds": args.rounds,
+                "validate_events_per_second": round(args.events / best_validate),
+                "end_to_end_events_per_second": round(
+                    args.events / (best_validate + best_queue)
+                ),
+                # Includes serializing the events for Redis
+                "queue_seconds": round(best_queue, 3),
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,109 @@
+"""Compares the previous and current loading of the events the notifier announces.
+
+The previous path decoded the whole blob of every datastore, validated every event
+with its model and then filtered the 60 day window. The current path queries the
+date index of each snapshot and only decodes and validates the events in the window.
+
+    python benchmarks/notifier_load_events.py --events 10000 100000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta
+
+from fake_redis import FakeRedisServer
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--events", type=int, nargs="+", default=[10_000, 100_000])
+parser.add_argument("--days", type=int, default=60, help="Notification window")
+parser.add_argument("--rounds", type=int, default=5)
+args = parser.parse_args()
+
+fake_redis = FakeRedisServer().start()
+os.environ["REDIS"] = fake_redis.url
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+
+from aioredis import from_url  # noqa: E402
+
+from synthetic import seed  # noqa: E402
+from traffix.codec import decode_value  # noqa: E402
+from traffix.config import settings  # noqa: E402
+from traffix.logic import EVENT_KEYS, query_events, resolve_snapshot  # noqa: E402
+from traffix.models.events import (  # noqa: E402
+    EventGameRelease,
+    EventGameUpdate,
+    EventQuery,
+)
+
+
+async def previous_load_events(client, start, end):
+    events = []
+    for key in EVENT_KEYS.values():
+        snapshot, _ = await resolve_snapshot(client, key)
+        for event in decode_value(await client.get(snapshot)):
+            match event.get("type"):
+                case "game_release":
+                    event = EventGameRelease.model_validate(event)
+                case "game_update":
+                    event = EventGameUpdate.model_validate(event)
+                case _:
+                    continue
+            events.append(event)
+
+    return sorted(
+        [event for event in events if start <= event.date <= end],
+        key=lambda event: event.date,
+    )
+
+
+async def current_load_events(client, start, end):
+    events, _ = await query_events(client, EventQuery(start=start, end=end))
+    return events
+
+
+async def measure(load, client, start, end) -> tuple[float, int]:
+    timings = []
+    for _ in range(args.rounds):
+        begin = time.perf_counter()
+        events = await load(client, start, end)
+        timings.append(time.perf_counter() - begin)
+
+    return min(timings), len(events)
+
+
+async def main():
+    client = from_url(str(settings.REDIS))
+
+    results = []
+    for total in args.events:
+        await seed(client, total, 0)
+        # Whole seconds, as the date index scores events by the second
+        start = datetime.now().replace(microsecond=0)
+        end = start + timedelta(days=args.days)
+
+        previous, previous_count = await measure(
+            previous_load_events, client, start, end
+        )
+        current, current_count = await measure(current_load_events, client, start, end)
+        assert previous_count == current_count
+
+        results.append(
+            {
+                "events": total,
+                "events_in_window": current_count,
+                "previous_ms": round(previous * 1000, 1),
+                "current_ms": round(current * 1000, 1),
+                "speedup": round(previous / current, 1),
+            }
+        )
+
+    await client.close()
+    fake_redis.stop()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,83 @@
+"""Compares the size and decode time of datastore blobs in legacy JSON and msgpack.
+
+Each blob is encoded like `update_event_list_redis` stores it, then decoded and
+validated like `logic.load_events` reads it. msgpack is measured with and without
+zstd compression:
+
+    python benchmarks/redis_codec.py --events 10000 100000
+"""
+
+import argparse
+import json
+import os
+import time
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--events", type=int, nargs="+", default=[10_000, 100_000])
+parser.add_argument("--rounds", type=int, default=5)
+args = parser.parse_args()
+
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+
+from synthetic import synthetic_events  # noqa: E402
+from traffix.codec import decode_value, encode_value  # noqa: E402
+from traffix.config import settings  # noqa: E402
+from traffix.logic import validate_events  # noqa: E402
+
+
+def measure(func) -> float:
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+
+    return round(min(timings) * 1000, 1)
+
+
+def measure_codec(events: list[dict], codec: str, compress: bool) -> dict:
+    settings.REDIS_CODEC_COMPRESS_MIN_SIZE = 0 if compress else 2**62
+    data = encode_value(events, codec)
+
+    return {
+        "bytes": len(data),
+        "encode_ms": measure(lambda: encode_value(events, codec)),
+        "decode_ms": measure(lambda: decode_value(data)),
+        "decode_validate_ms": measure(
+            lambda: validate_events("event_game_releases", decode_value(data))
+        ),
+    }
+
+
+def main():
+    compress_min_size = settings.REDIS_CODEC_COMPRESS_MIN_SIZE
+
+    results = []
+    for total in args.events:
+        # Only releases, so every event validates against one model
+        releases, _ = synthetic_events(total * 2)
+        json_result = measure_codec(releases, "json", compress=False)
+        msgpack_result = measure_codec(releases, "msgpack", compress=False)
+        zstd_result = measure_codec(releases, "msgpack", compress=True)
+
+        results.append(
+            {
+                "events": len(releases),
+                "json": json_result,
+                "msgpack": msgpack_result,
+                "msgpack_zstd": zstd_result,
+                "size_ratio": round(json_result["bytes"] / zstd_result["bytes"], 1),
+                "decode_validate_speedup": round(
+                    json_result["decode_validate_ms"]
+                    / zstd_result["decode_validate_ms"],
+                    1,
+                ),
+            }
+        )
+
+    settings.REDIS_CODEC_COMPRESS_MIN_SIZE = compress_min_size
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Saves benchmark results as JSON named after the commit they were measured on."""
+
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def current_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def save_report(report: dict, output: Path | None, name: str) -> dict:
+    """Adds the commit and environment to `report` and writes it to `output`.
+
+    Args:
+        report:     Results of the benchmark.
+        output:     Path to write to, defaults to results/<name>/<commit>.json.
+        name:       Name of the benchmark.
+    """
+    commit = current_commit()
+    report = {
+        "benchmark": name,
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        **report,
+    }
+
+    output = output or RESULTS_DIR / name / f"{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Saved results to {output}", file=sys.stderr)
+
+    return report
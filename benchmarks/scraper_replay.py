@@ -0,0 +1,212 @@
+"""Replays recorded GitHub GraphQL responses through the issue scraper.
+
+The recorded issue pages in benchmarks/graphql are served by a local stand-in for
+the GitHub GraphQL API, and the scraper runs against a copy of the datastores in
+benchmarks/graphql/datastore. The issue pages requested, the comments and closes
+sent by the mutations, and the records added to the datastores are checked against
+benchmarks/graphql/expected.json. Exits with 1 on any difference:
+
+    python benchmarks/scraper_replay.py
+
+With `--fail-close` closing an issue fails once, so the first run leaves it in the
+journal and a second run has to close it without commenting again:
+
+    python benchmarks/scraper_replay.py --fail-close 103
+"""
+
+import argparse
+import asyncio
+import copy
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import yaml
+from aiohttp import web
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument(
+    "--fixtures", type=Path, default=Path(__file__).resolve().parent / "graphql"
+)
+parser.add_argument(
+    "--fail-close",
+    type=int,
+    action="append",
+    default=[],
+    help="Issue number whose first close fails, can be repeated",
+)
+args = parser.parse_args()
+
+os.environ["DATASTORE_SHARDED"] = "false"
+os.environ["SCRAPER_JOURNAL_FILE"] = "datastore/.scraper_journal.json"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import issue_scraper  # noqa: E402
+
+# Aliases of the mutation fields, eg. "comment0: addComment(...)"
+MUTATION_FIELD = re.compile(r"((comment|close)(\d+)): (?:addComment|closeIssue)")
+
+
+def issue_nodes(page: dict) -> list[dict]:
+    return page["data"]["repository"]["issues"]["nodes"]
+
+
+class GraphQLServer:
+    """Stand-in for the GitHub GraphQL API, serving the recorded issue pages.
+
+    Issues closed by a mutation are left out of later pages, as GitHub only returns
+    open issues. Every issues page requested and mutation field sent is recorded.
+    """
+
+    def __init__(self, pages: list[dict], failing_closes: list[int]):
+        self.pages = pages
+        self.failing_closes = set(failing_closes)
+        self.node_numbers = {
+            node["id"]: node["number"] for page in pages for node in issue_nodes(page)
+        }
+        self.cursors = []
+        self.mutations = 0
+        self.comments = []
+        self.closes = []
+
+    async def handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body["query"].lstrip().startswith("mutation"):
+            response = self.mutation(body["query"], body["variables"])
+        else:
+            response = self.issues_page(body["variables"]["cursor"])
+
+        reset = int(time.time()) + 3600
+        return web.json_response(
+            response,
+            headers={"X-RateLimit-Remaining": "4999", "X-RateLimit-Reset": str(reset)},
+        )
+
+    def issues_page(self, cursor: str | None) -> dict:
+        self.cursors.append(cursor)
+        cursors = [None] + [
+            page["data"]["repository"]["issues"]["pageInfo"]["endCursor"]
+            for page in self.pages
+        ]
+
+        page = copy.deepcopy(self.pages[cursors.index(cursor)])
+        issues = page["data"]["repository"]["issues"]
+        issues["nodes"] = [
+            node for node in issues["nodes"] if node["number"] not in self.closes
+        ]
+        return page
+
+    def mutation(self, query: str, variables: dict) -> dict:
+        self.mutations += 1
+        data, errors = {}, []
+        for alias, field, index in MUTATION_FIELD.findall(query):
+            number = self.node_numbers[variables[f"issue{index}"]]
+            if field == "comment":
+                self.comments.append(number)
+            elif number in self.failing_closes:
+                self.failing_closes.remove(number)
+                data[alias] = None
+                errors.append(
+                    {"path": [alias], "message": f"Could not close issue #{number}"}
+                )
+                continue
+            else:
+                self.closes.append(number)
+            data[alias] = {"clientMutationId": None}
+
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+
+async def run_scraper() -> bool:
+    """Runs the scraper as the workflow does, returning whether it finished."""
+    # Each workflow run is a new process
+    for issues in issue_scraper.EVENTS.values():
+        issues.clear()
+    issue_scraper.ISSUE_NODE_IDS.clear()
+
+    try:
+        await issue_scraper.main()
+    except SystemExit as err:
+        print(f"Run left issues outstanding: {err}", file=sys.stderr)
+        return False
+    return True
+
+
+def check(failures: list[str], name: str, actual, expected) -> None:
+    if actual != expected:
+        failures.append(f"{name}: expected {expected}, got {actual}")
+
+
+async def replay(pages: list[dict], expected: dict) -> list[str]:
+    server = GraphQLServer(pages, args.fail_close)
+    app = web.Application()
+    app.router.add_post("/graphql", server.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    host, port = runner.addresses[0][:2]
+    issue_scraper.GITHUB_GRAPHQL_URL = f"http://{host}:{port}/graphql"
+
+    start = time.perf_counter()
+    runs = 0
+    finished = False
+    # A failed close is only retried by the next run
+    while not finished and runs < 1 + bool(args.fail_close):
+        finished = await run_scraper()
+        runs += 1
+    elapsed = time.perf_counter() - start
+    await runner.cleanup()
+
+    print(
+        f"{runs} runs, {len(server.cursors)} issue pages, {server.mutations} "
+        f"mutations, commented {server.comments}, closed {server.closes} "
+        f"in {elapsed:.3f}s",
+        file=sys.stderr,
+    )
+
+    failures = []
+    if not finished:
+        failures.append("issues are still outstanding in the journal")
+    check(failures, "issue pages", server.cursors, expected["cursors"] * runs)
+    check(failures, "issues closed", sorted(server.closes), expected["closed"])
+    check(failures, "issues commented", sorted(server.comments), expected["closed"])
+    check(
+        failures,
+        "issues closed more than once",
+        [number for number, count in Counter(server.closes).items() if count > 1],
+        [],
+    )
+    for data_file, names in expected["datastore"].items():
+        with open(data_file) as file:
+            records = yaml.safe_load(file) or []
+        check(failures, data_file, [record["name"] for record in records], names)
+    return failures
+
+
+def main():
+    pages = [
+        json.loads(path.read_text())
+        for path in sorted(args.fixtures.glob("*-issues-page.json"))
+    ]
+    expected = json.loads((args.fixtures / "expected.json").read_text())
+
+    with tempfile.TemporaryDirectory() as directory:
+        shutil.copytree(args.fixtures / "datastore", Path(directory) / "datastore")
+        os.chdir(directory)
+        failures = asyncio.run(replay(pages, expected))
+
+    for failure in failures:
+        print(f"FAILED {failure}", file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""Times event search and autocomplete against the latency budget of the endpoints.
+
+The index is built from synthetic datastores in process, so only the lookups are
+measured, not HTTP or Redis. Building the index, and updating it after a sync
+which changed a few events, are timed too. Exits with 1 when the p99 of any query
+is over `--budget` milliseconds:
+
+    python benchmarks/search.py --events 100000 --budget 5
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from reports import save_report
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--events", type=int, nargs="+", default=[10_000, 100_000])
+parser.add_argument("--rounds", type=int, default=200)
+parser.add_argument("--budget", type=float, default=5.0, help="p99 in milliseconds")
+parser.add_argument(
+    "--output", type=Path, help="Defaults to results/search/<commit>.json"
+)
+args = parser.parse_args()
+
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+
+from synthetic import synthetic_events  # noqa: E402
+from traffix.config import settings  # noqa: E402
+from traffix.logic import EVENT_KEYS, validate_events  # noqa: E402
+from traffix.models.events import EventEnum  # noqa: E402
+from traffix.search import SearchIndex  # noqa: E402
+
+# Common and rare words, prefixes as typed, misspellings and numbers
+SEARCHES = ["diablo", "diablo shadow", "shadow legends 42", "steampowered", "v7"]
+SEARCHES += ["diabol", "shadw legends", "odysey tactics", "4242", "nothing"]
+AUTOCOMPLETES = ["d", "di", "dia", "diablo s", "diablo shadow 1", "odys", "gog"]
+
+
+def percentile(timings: list[float], fraction: float) -> float:
+    return sorted(timings)[min(int(len(timings) * fraction), len(timings) - 1)]
+
+
+def measure(benchmark: str, total: int, func) -> dict:
+    func()
+
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        "benchmark": benchmark,
+        "events": total,
+        "median_ms": round(statistics.median(timings), 3),
+        "p99_ms": round(percentile(timings, 0.99), 3),
+        "over_budget": percentile(timings, 0.99) > args.budget,
+    }
+    over_budget = "  OVER BUDGET" if result["over_budget"] else ""
+    print(
+        f"{benchmark:<45} {total:>9} events  median {result['median_ms']:>8.3f}ms  "
+        f"p99 {result['p99_ms']:>8.3f}ms{over_budget}",
+        file=sys.stderr,
+    )
+    return result
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def benchmark_size(total: int) -> tuple[list[dict], dict]:
+    releases, updates = synthetic_events(total)
+    datastores = {
+        EVENT_KEYS[EventEnum.game_release]: validate_events(
+            EVENT_KEYS[EventEnum.game_release], releases
+        ),
+        EVENT_KEYS[EventEnum.game_update]: validate_events(
+            EVENT_KEYS[EventEnum.game_update], updates
+        ),
+    }
+
+    index = SearchIndex()
+    build_ms = sum(
+        timed(lambda: index.update(key, "v1", events))
+        for key, events in datastores.items()
+    )
+
+    # A sync which renamed 10 releases and removed 10 others
+    key = EVENT_KEYS[EventEnum.game_release]
+    changed = list(datastores[key][20:])
+    for position, event in enumerate(changed[:10]):
+        changed[position] = event.model_copy(
+            update={"name": f"{event.name} Remastered"}
+        )
+    update_ms = timed(lambda: index.update(key, "v2", changed))
+
+    results = []
+    for query in SEARCHES:
+        results.append(
+            measure(
+                f"search {query!r}",
+                total,
+                lambda: index.search(query, settings.SEARCH_PAGE_SIZE),
+            )
+        )
+    for query in AUTOCOMPLETES:
+        results.append(
+            measure(
+                f"autocomplete {query!r}",
+                total,
+                lambda: index.autocomplete(query, settings.SEARCH_AUTOCOMPLETE_SIZE),
+            )
+        )
+
+    print(
+        f"{'index build':<45} {total:>9} events  {build_ms:>8.1f}ms\n"
+        f"{'index update (20 events changed)':<45} {total:>9} events  "
+        f"{update_ms:>8.1f}ms",
+        file=sys.stderr,
+    )
+    return results, {"events": total, "build_ms": build_ms, "update_ms": update_ms}
+
+
+def main():
+    results, indexes = [], []
+    for total in args.events:
+        size_results, index = benchmark_size(total)
+        results.extend(size_results)
+        indexes.append(index)
+
+    save_report(
+        {"budget_ms": args.budget, "indexes": indexes, "results": results},
+        args.output,
+        "search",
+    )
+    if any(result["over_budget"] for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""Benchmarks the hot paths of the web app and worker over synthetic datastores.
+
+Each size in `--events` is written to an in-process fake Redis by the worker, then
+the rendering of the pages, the worker updates and the event queries are timed.
+The page cache is disabled unless `PAGE_CACHE_ENABLED` is set, so pages are rendered
+on every request. Results are saved as JSON named after the current commit, and
+`--compare` reports how the medians changed against the results of another commit:
+
+    python benchmarks/suite.py --events 1000 10000 100000 1000000
+    python benchmarks/suite.py --compare benchmarks/results/suite/<commit>.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from fake_redis import FakeRedisServer
+from reports import save_report
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("--redis", help="Redis to use instead of an in-process fake")
+parser.add_argument("--events", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+parser.add_argument("--issues", type=int, default=1_000, help="GitHub issues")
+parser.add_argument("--rounds", type=int, default=5)
+parser.add_argument(
+    "--output", type=Path, help="Defaults to results/suite/<commit>.json"
+)
+parser.add_argument("--compare", type=Path, help="Results of a previous run")
+parser.add_argument(
+    "--threshold",
+    type=float,
+    default=1.25,
+    help="Slowdown of the median reported as a regression",
+)
+args = parser.parse_args()
+
+fake_redis = None if args.redis else FakeRedisServer().start()
+os.environ["REDIS"] = args.redis or fake_redis.url
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+os.environ.setdefault("PAGE_CACHE_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+from synthetic import seed  # noqa: E402
+from traffix.config import settings  # noqa: E402
+from traffix.dependencies import RedisDependency  # noqa: E402
+from traffix.logic import load_latest_events, query_events  # noqa: E402
+from traffix.main import app  # noqa: E402
+from traffix.models.events import EventEnum, EventQuery  # noqa: E402
+from traffix.worker import run  # noqa: E402
+
+PAGE_SIZE = 25
+
+
+async def measure(benchmark: str, total: int, func) -> dict:
+    """Times `func` over `--rounds` rounds after one warm up round."""
+    await func()
+
+    timings = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        await func()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    result = {
+        "benchmark": benchmark,
+        "events": total,
+        "rounds": args.rounds,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+    print(
+        f"{benchmark:<45} {total:>9} events  "
+        f"median {result['median_ms']:>10.3f}ms  min {result['min_ms']:>10.3f}ms",
+        file=sys.stderr,
+    )
+    return result
+
+
+async def get_page(http: httpx.AsyncClient, url: str) -> None:
+    response = await http.get(url)
+    assert response.status_code == 200, f"GET {url} returned {response.status_code}"
+
+
+async def benchmark_size(redis: RedisDependency, total: int) -> list[dict]:
+    datastores = await seed(redis.redis, total, args.issues)
+    releases = datastores[settings.EVENT_GAME_RELEASES_YAML]
+
+    upcoming = len([event for event in releases if event["date"] >= datetime.now()])
+    deep_offset = upcoming // 2 // PAGE_SIZE * PAGE_SIZE
+
+    start = datetime.now()
+    end = start + timedelta(days=settings.NOTIFIER_WINDOW_DAYS)
+
+    results = []
+    async with httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://benchmark"
+    ) as http:
+        results.append(
+            await measure(
+                "views.all.get_game_releases (first page)",
+                total,
+                lambda: get_page(http, f"/game_releases?limit={PAGE_SIZE}"),
+            )
+        )
+        results.append(
+            await measure(
+                "views.all.get_game_releases (middle page)",
+                total,
+                lambda: get_page(
+                    http, f"/game_releases?limit={PAGE_SIZE}&offset={deep_offset}"
+                ),
+            )
+        )
+        results.append(await measure("main.home", total, lambda: get_page(http, "/")))
+
+    results.append(
+        await measure(
+            "logic.load_latest_events",
+            total,
+            lambda: load_latest_events(redis, limit=10),
+        )
+    )
+    results.append(
+        await measure(
+            "worker.run.update_event_list_redis",
+            total,
+            lambda: run.update_event_list_redis(
+                redis.redis, None, settings.EVENT_GAME_RELEASES_YAML
+            ),
+        )
+    )
+
+    async def latest_50_events():
+        run.latest_50_events(releases)
+
+    results.append(
+        await measure("worker.run.latest_50_events", total, latest_50_events)
+    )
+    results.append(
+        await measure(
+            "logic.query_events (notifier window)",
+            total,
+            lambda: query_events(redis.redis, EventQuery(start=start, end=end)),
+        )
+    )
+    results.append(
+        await measure(
+            "logic.query_events (filtered)",
+            total,
+            lambda: query_events(
+                redis.redis,
+                EventQuery(
+                    type=EventEnum.game_update,
+                    start=start,
+                    end=start + timedelta(days=14),
+                    min_size=50,
+                    host="store.steampowered.com",
+                ),
+            ),
+        )
+    )
+
+    return results
+
+
+def compare(results: list[dict], previous: dict) -> list[str]:
+    """Prints the change of every median against `previous`, returning regressions."""
+    previous_results = {
+        (result["benchmark"], result["events"]): result
+        for result in previous["results"]
+    }
+
+    regressions = []
+    print(f"Compared to {previous['commit']}:", file=sys.stderr)
+    for result in results:
+        baseline = previous_results.get((result["benchmark"], result["events"]))
+        if not baseline:
+            continue
+
+        ratio = result["median_ms"] / max(baseline["median_ms"], 0.001)
+        line = (
+            f"{result['benchmark']:<45} {result['events']:>9} events  "
+            f"{baseline['median_ms']:>10.3f}ms -> {result['median_ms']:>10.3f}ms "
+            f"({ratio:.2f}x)"
+        )
+        if ratio > args.threshold:
+            line += "  REGRESSION"
+            regressions.append(line)
+        print(line, file=sys.stderr)
+
+    return regressions
+
+
+async def main():
+    redis = RedisDependency(settings.REDIS)
+    await redis.connect()
+    app.state.redis = redis
+
+    results = []
+    try:
+        for total in args.events:
+            results.extend(await benchmark_size(redis, total))
+    finally:
+        await redis.disconnect()
+        if fake_redis:
+            fake_redis.stop()
+
+    save_report(
+        {
+            "redis": "fakeredis" if fake_redis else "redis",
+            "page_cache": settings.PAGE_CACHE_ENABLED,
+            "event_cache": settings.EVENT_CACHE_ENABLED,
+            "results": results,
+        },
+        args.output,
+        "suite",
+    )
+
+    if args.compare and compare(results, json.loads(args.compare.read_text())):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
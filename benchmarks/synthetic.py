@@ -0,0 +1,128 @@
+"""Synthetic datastores and GitHub issues, written to Redis by the worker itself.
+
+The worker's GitHub fetchers are replaced with ones serving the synthetic events,
+so Redis ends up in the same state as after a real sync. Import this module after
+`REDIS` is set in the environment, as the settings are read on import.
+"""
+
+import uuid
+from datetime import datetime, timedelta
+
+from aioredis import Redis
+
+from traffix.config import settings
+from traffix.worker import run
+
+# Names are two of these words and the event ID, eg. "Shadow Legends 42"
+NAME_WORDS = [
+    "Age",
+    "Blade",
+    "Crown",
+    "Diablo",
+    "Empire",
+    "Frontier",
+    "Galaxy",
+    "Horizon",
+    "Legends",
+    "Odyssey",
+    "Shadow",
+    "Tactics",
+]
+SOURCE_HOSTS = [
+    "store.steampowered.com",
+    "store.epicgames.com",
+    "www.gog.com",
+    "www.example.com",
+]
+
+
+def synthetic_events(total: int) -> tuple[list[dict], list[dict]]:
+    """Game releases and updates spread over ten years around today.
+
+    Returns the releases and updates as the worker loads them from the YAML files,
+    together making up `total` events.
+    """
+    start = datetime.now().replace(microsecond=0) - timedelta(days=5 * 365)
+    releases, updates = [], []
+
+    for event_id in range(1, total + 1):
+        host = SOURCE_HOSTS[event_id // 2 % len(SOURCE_HOSTS)]
+        first_word = NAME_WORDS[event_id % len(NAME_WORDS)]
+        last_word = NAME_WORDS[event_id // len(NAME_WORDS) % len(NAME_WORDS)]
+        event = {
+            "name": f"{first_word} {last_word} {event_id}",
+            "github_issue_id": event_id,
+            "date": start + timedelta(minutes=event_id * 10 * 365 * 24 * 60 // total),
+            "size": event_id % 200,
+            "source": f"https://{host}/games/{event_id}",
+        }
+        if event_id % 2:
+            event.update(type="game_release", image="https://example.com/image.jpg")
+            releases.append(event)
+        else:
+            event.update(type="game_update", version=f"v{event_id % 100}")
+            updates.append(event)
+
+    return releases, updates
+
+
+def synthetic_issues(total: int) -> list[dict]:
+    """Event submission issues as returned by the GitHub API, one every hour."""
+    start = datetime.now().replace(microsecond=0) - timedelta(hours=total)
+    issues = []
+
+    for number in range(1, total + 1):
+        created_at = (start + timedelta(hours=number)).isoformat() + "Z"
+        event_type = "GAME_RELEASE" if number % 2 else "GAME_UPDATE"
+        issues.append(
+            {
+                "id": number,
+                "number": number,
+                "title": f"[{event_type}]: Game {number}",
+                "user": {"login": f"user{number % 50}"},
+                "created_at": created_at,
+                "updated_at": created_at,
+                "closed_at": None,
+            }
+        )
+
+    return issues
+
+
+def serve_datastores(datastores: dict[str, list[dict]]) -> None:
+    """Makes the worker fetch `datastores`, keyed by YAML file, instead of GitHub.
+
+    Every fetch reports a new commit SHA so the worker never skips a sync.
+    """
+
+    async def fetch_latest_commit_sha(session, yaml_file: str) -> str:
+        return uuid.uuid4().hex
+
+    async def fetch_yaml_from_github(
+        session, yaml_file: str, ref: str = "main"
+    ) -> list[dict]:
+        return datastores[yaml_file]
+
+    settings.DATASTORE_SHARDED = False
+    run.fetch_latest_commit_sha = fetch_latest_commit_sha
+    run.fetch_yaml_from_github = fetch_yaml_from_github
+
+
+async def seed(client: Redis, total: int, total_issues: int) -> dict[str, list[dict]]:
+    """Replaces the contents of Redis with synthetic datastores and issues.
+
+    Returns the datastores keyed by YAML file.
+    """
+    releases, updates = synthetic_events(total)
+    datastores = {
+        settings.EVENT_GAME_RELEASES_YAML: releases,
+        settings.EVENT_GAME_UPDATES_YAML: updates,
+    }
+    serve_datastores(datastores)
+
+    await client.flushdb()
+    for yaml_file in datastores:
+        await run.update_event_list_redis(client, None, yaml_file)
+    await run.update_latest_github_events_redis(client, synthetic_issues(total_issues))
+
+    return datastores
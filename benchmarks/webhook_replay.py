@@ -0,0 +1,168 @@
+"""Replays recorded GitHub webhook deliveries through the receiver and the worker.
+
+Deliveries are JSON files as saved with `GITHUB_WEBHOOK_RECORD_DIR`, eg. the examples
+in benchmarks/webhooks, signed again with `--secret`. By default they are posted to
+the app in process, against a fake Redis seeded with synthetic datastores, and the
+worker then runs the resyncs they queued. Each resync is reported with how long after
+the first delivery it finished:
+
+    python benchmarks/webhook_replay.py benchmarks/webhooks/*.json
+
+With `--url` they are posted to a running app instead, leaving the resyncs to its
+worker:
+
+    python benchmarks/webhook_replay.py --url http://localhost:8000 --secret ... \\
+        benchmarks/webhooks/*.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument("deliveries", type=Path, nargs="+")
+parser.add_argument("--url", help="Post to a running app instead of in process")
+parser.add_argument("--secret", default=os.environ.get("GITHUB_WEBHOOK_SECRET"))
+parser.add_argument("--events", type=int, default=10_000, help="Synthetic events")
+parser.add_argument("--debounce", type=float, default=0.5, help="Seconds, in process")
+parser.add_argument(
+    "--interval", type=float, default=0.0, help="Seconds between deliveries"
+)
+args = parser.parse_args()
+
+if args.url and not args.secret:
+    parser.error("--secret or GITHUB_WEBHOOK_SECRET is required with --url")
+
+os.environ.setdefault("SLACK_WEBHOOK", "https://hooks.slack.com/services/benchmark")
+os.environ["GITHUB_WEBHOOK_SECRET"] = args.secret or "replay"
+if not args.url:
+    from fake_redis import FakeRedisServer
+
+    server = FakeRedisServer().start()
+    os.environ["REDIS"] = server.url
+    os.environ["EVENT_CACHE_ENABLED"] = "false"
+    os.environ["METRICS_ENABLED"] = "false"
+    os.environ["GITHUB_WEBHOOK_DEBOUNCE"] = str(args.debounce)
+
+import httpx  # noqa: E402
+from synthetic import seed  # noqa: E402
+from traffix.config import settings  # noqa: E402
+from traffix.dependencies import RedisDependency  # noqa: E402
+from traffix.webhooks import WEBHOOK_QUEUE_KEY, sign_payload  # noqa: E402
+from traffix.worker import run  # noqa: E402
+
+
+def load_deliveries() -> list[dict]:
+    return [json.loads(path.read_text()) for path in args.deliveries]
+
+
+def serve_issues(issues: dict[int, dict]) -> None:
+    """Makes the worker fetch issues from the replayed deliveries instead of GitHub."""
+
+    async def fetch_issue(session, number: int) -> dict | None:
+        return issues.get(number)
+
+    run.fetch_issue = fetch_issue
+
+
+async def post_deliveries(client: httpx.AsyncClient, deliveries: list[dict]) -> None:
+    for delivery in deliveries:
+        body = json.dumps(delivery["payload"]).encode("utf-8")
+        response = await client.post(
+            "/api/v1/webhooks/github",
+            content=body,
+            headers={
+                "Content-Type": "application/json",
+                "X-GitHub-Event": delivery["event"],
+                "X-GitHub-Delivery": delivery.get("delivery") or "replay",
+                "X-Hub-Signature-256": sign_payload(
+                    body, settings.GITHUB_WEBHOOK_SECRET
+                ),
+            },
+        )
+        queued = response.json().get("queued") if response.is_success else None
+        print(
+            f"{delivery['event']:<8} {delivery.get('delivery')}  "
+            f"{response.status_code}  queued {queued}",
+            file=sys.stderr,
+        )
+        if args.interval:
+            await asyncio.sleep(args.interval)
+
+
+async def replay_remote(deliveries: list[dict]) -> None:
+    async with httpx.AsyncClient(base_url=args.url) as client:
+        await post_deliveries(client, deliveries)
+
+
+async def replay_in_process(deliveries: list[dict]) -> None:
+    from traffix.main import app
+
+    redis = RedisDependency(settings.REDIS)
+    await redis.connect()
+    app.state.redis = redis
+    await seed(redis.redis, args.events, 50)
+    versions = await redis.redis.mget(
+        *(f"{key}_version" for key in ["event_game_releases", "event_game_updates"])
+    )
+
+    # The latest state of each issue, as GitHub would serve it after every delivery
+    issues = {}
+    for delivery in deliveries:
+        issue = delivery["payload"].get("issue")
+        if delivery["event"] == "issues" and issue:
+            deleted = delivery["payload"].get("action") in ("deleted", "transferred")
+            issues[issue["number"]] = None if deleted else issue
+    serve_issues(issues)
+
+    start = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://app") as client:
+        await post_deliveries(client, deliveries)
+
+    resyncs = 0
+    while await redis.redis.zcard(WEBHOOK_QUEUE_KEY):
+        targets = await run.claim_webhook_syncs(redis.redis)
+        if not targets:
+            await asyncio.sleep(settings.WORKER_WEBHOOK_POLL_INTERVAL / 10)
+            continue
+
+        await run.sync_webhook_targets(redis.redis, targets)
+        resyncs += len(targets)
+        print(
+            f"resynced {targets} {time.perf_counter() - start:.3f}s after the first "
+            "delivery",
+            file=sys.stderr,
+        )
+
+    synced_versions = await redis.redis.mget(
+        *(f"{key}_version" for key in ["event_game_releases", "event_game_updates"])
+    )
+    activity = [
+        json.loads(event)["id"]
+        for event in await redis.redis.lrange(run.GITHUB_ACTIVITY_KEY, 0, 4)
+    ]
+    changed = [old != new for old, new in zip(versions, synced_versions)]
+    print(
+        f"{len(deliveries)} deliveries, {resyncs} resyncs, datastore versions "
+        f"changed {changed}, latest GitHub activity {activity}",
+        file=sys.stderr,
+    )
+    await redis.disconnect()
+
+
+def main():
+    deliveries = load_deliveries()
+    if args.url:
+        asyncio.run(replay_remote(deliveries))
+    else:
+        asyncio.run(replay_in_process(deliveries))
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,10 @@
+import asyncio
+import glob
+import json
 import os
-import requests
+import random
+import time
+import aiohttp
 from traffix.models.events import (
     BaseEvent,
     EventGameRelease,
@@ -11,6 +16,7 @@ from datetime import datetime
 import yaml
 import logging
 import re
+from collections import defaultdict
 
 logger = logging.getLogger(__name__)
 
@@ -26,58 +32,317 @@ DATE_FORMAT = "%d/%m/%Y"
 COMMUNITY_APPROVAL_TRIGGER = 10
 MAX_SIZE_BEFORE_MANUAL_APPROVAL = 250  # 250GB, games are quite big these days...
 
-# GitHub API URL to fetch issues
-GITHUB_API_URL = f"https://api.github.com/repos/{OWNER}/{REPO}/issues"
+# Store each datastore as one file per month, eg. datastore/event_game_releases/2024-08.yml
+DATASTORE_SHARDED = os.getenv("DATASTORE_SHARDED", "false").lower() in ("1", "true")
+YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+# GitHub GraphQL API, can be pointed at a local stand-in server
+GITHUB_GRAPHQL_URL = os.getenv("GITHUB_GRAPHQL_URL", "https://api.github.com/graphql")
+ISSUES_PAGE_SIZE = 100
+CLOSE_BATCH_SIZE = 25  # Issues commented and closed per mutation
+MAX_CONCURRENCY = int(os.getenv("SCRAPER_MAX_CONCURRENCY", 4))
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0  # Seconds, doubled on every retry
+BACKOFF_MAX = 60.0
+
+# Outstanding comments/closes, committed with the datastore so a rerun can finish them
+JOURNAL_FILE = os.getenv("SCRAPER_JOURNAL_FILE", "datastore/.scraper_journal.json")
+
+# GraphQL node IDs of fetched issues keyed by issue number, required for mutations
+ISSUE_NODE_IDS: dict[int, str] = {}
+
+ISSUES_QUERY = """
+query ($owner: String!, $repo: String!, $labels: [String!], $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    issues(first: %d, after: $cursor, states: OPEN, labels: $labels) {
+      pageInfo {
+        hasNextPage
+        endCursor
+      }
+      nodes {
+        id
+        databaseId
+        number
+        title
+        body
+        author {
+          login
+          ... on User {
+            databaseId
+          }
+        }
+        labels(first: 20) {
+          nodes {
+            name
+          }
+        }
+        reactions(content: ROCKET) {
+          totalCount
+        }
+      }
+    }
+  }
+}
+""" % ISSUES_PAGE_SIZE
+
+
+class RateLimiter:
+    """Token bucket whose refill rate follows GitHub's `X-RateLimit-*` headers.
+
+    The remaining budget is spread evenly until the rate limit window resets, and
+    requests are paused entirely once the budget is exhausted.
+    """
+
+    def __init__(self, rate: float = 10.0, capacity: int = MAX_CONCURRENCY):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def update(self, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        reset = headers.get("X-RateLimit-Reset")
+        if remaining is None or reset is None:
+            return
 
+        remaining = int(remaining)
+        seconds_until_reset = max(int(reset) - time.time(), 1)
+        if remaining == 0:
+            logger.warning(
+                f"GitHub rate limit exhausted, pausing for {seconds_until_reset:.0f}s"
+            )
+            self.paused_until = time.monotonic() + seconds_until_reset
+            return
 
-def comment_and_close_issue(issue_number: int, comment: str):
-    headers = {
-        "Authorization": f"token {os.getenv('GITHUB_TOKEN')}",
-        "Accept": "application/vnd.github.v3+json",
-    }
-    comment_url = (
-        f"https://api.github.com/repos/{OWNER}/{REPO}/issues/{issue_number}/comments"
-    )
-    close_url = f"https://api.github.com/repos/{OWNER}/{REPO}/issues/{issue_number}"
+        self.rate = min(self.max_rate, remaining / seconds_until_reset)
 
-    # Add a comment
-    response = requests.post(comment_url, headers=headers, json={"body": comment})
-    response.raise_for_status()
 
-    # Close the issue
-    close_payload = {"state": "closed"}
-    response = requests.patch(close_url, headers=headers, json=close_payload)
-    response.raise_for_status()
+def backoff(attempt: int, retry_after: str | None = None) -> float:
+    """Exponential backoff with full jitter, honouring `Retry-After` when given."""
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
 
-    logger.info(f"Issue {issue_number} commented and closed successfully.")
 
+class GitHubClient:
+    """Rate limited GitHub GraphQL client sharing one HTTP session."""
 
-# Fetch issues from GitHub
-def fetch_issues():
-    headers = {"Authorization": f"token {os.getenv('GITHUB_TOKEN')}"}
-    all_issues = []
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        self.rate_limiter = RateLimiter()
+
+    async def graphql(self, query: str, variables: dict | None = None) -> dict:
+        """Runs a GraphQL request, retrying rate limited and failed requests.
+
+        Returns the full response body, as mutations may partially succeed.
+        """
+        payload = {"query": query, "variables": variables or {}}
 
-    for label in EVENTS.keys():
-        params = {"state": "open", "labels": label}
-        response = requests.get(GITHUB_API_URL, headers=headers, params=params)
-        response.raise_for_status()
-        issues = response.json()
-
-        # Avoid duplicate issues
-        issue_ids = {issue["id"] for issue in all_issues}
-        for issue in issues:
-            if issue["id"] not in issue_ids:
-                name = issue.get("title")
-                plus_one = issue["reactions"].get("rocket")
-                if plus_one < COMMUNITY_APPROVAL_TRIGGER:
-                    if issue.get("user", {}).get("id") != 8687668:
+        for attempt in range(MAX_RETRIES + 1):
+            await self.rate_limiter.acquire()
+            try:
+                async with self.session.post(
+                    GITHUB_GRAPHQL_URL, json=payload
+                ) as response:
+                    self.rate_limiter.update(response.headers)
+
+                    retryable = response.status >= 500 or response.status in (403, 429)
+                    if retryable and attempt < MAX_RETRIES:
+                        delay = backoff(attempt, response.headers.get("Retry-After"))
                         logger.warning(
-                            f"Skipping Issue '{name}' due to low community approval... Brandon also overules everything... :)"
+                            f"GraphQL request failed with {response.status}, retrying in {delay:.1f}s"
                         )
+                        await asyncio.sleep(delay)
                         continue
 
+                    response.raise_for_status()
+                    return await response.json()
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as err:
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = backoff(attempt)
+                logger.warning(
+                    f"GraphQL request failed due to {err}, retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+
+def load_journal() -> dict:
+    try:
+        with open(JOURNAL_FILE, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"pending": {}}
+
+
+def save_journal(journal: dict):
+    """Atomically persists the journal, removing it once nothing is outstanding."""
+    if not journal["pending"]:
+        if os.path.exists(JOURNAL_FILE):
+            os.remove(JOURNAL_FILE)
+        return
+
+    tmp_file = f"{JOURNAL_FILE}.tmp"
+    with open(tmp_file, "w") as file:
+        json.dump(journal, file, indent=2, sort_keys=True)
+    os.replace(tmp_file, JOURNAL_FILE)
+
+
+def journal_events(journal: dict, events: list[BaseEvent], comment: str):
+    """Records events whose issues still need to be commented on and closed."""
+    for event in events:
+        issue_number = str(event.github_issue_id)
+        if issue_number in journal["pending"]:
+            continue
+
+        journal["pending"][issue_number] = {
+            "node_id": ISSUE_NODE_IDS[event.github_issue_id],
+            "comment": comment,
+            "commented": False,
+        }
+    save_journal(journal)
+
+
+async def comment_and_close_batch(
+    github: GitHubClient, journal: dict, issue_numbers: list[str]
+):
+    """Comments on and closes a batch of issues with a single mutation.
+
+    Mutation fields are executed in order, so each issue is commented on before it
+    is closed. Issues already commented on in a previous attempt are only closed.
+    """
+    declarations = []
+    fields = []
+    variables = {}
+    for index, issue_number in enumerate(issue_numbers):
+        pending = journal["pending"][issue_number]
+        declarations.append(f"$issue{index}: ID!")
+        variables[f"issue{index}"] = pending["node_id"]
+
+        if not pending["commented"]:
+            declarations.append(f"$body{index}: String!")
+            variables[f"body{index}"] = pending["comment"]
+            fields.append(
+                f"comment{index}: addComment(input: {{subjectId: $issue{index}, body: $body{index}}}) {{ clientMutationId }}"
+            )
+        fields.append(
+            f"close{index}: closeIssue(input: {{issueId: $issue{index}}}) {{ clientMutationId }}"
+        )
+
+    mutation = (
+        f"mutation ({', '.join(declarations)}) {{\n  " + "\n  ".join(fields) + "\n}"
+    )
+    response = await github.graphql(mutation, variables)
+    data = response.get("data") or {}
+
+    closed = []
+    for index, issue_number in enumerate(issue_numbers):
+        if data.get(f"comment{index}"):
+            journal["pending"][issue_number]["commented"] = True
+        if data.get(f"close{index}"):
+            del journal["pending"][issue_number]
+            closed.append(issue_number)
+    save_journal(journal)
+
+    if closed:
+        logger.info(f"Issues {closed} commented and closed successfully.")
+    if response.get("errors"):
+        raise RuntimeError(f"GraphQL mutation partially failed: {response['errors']}")
+
+
+async def comment_and_close_issues(github: GitHubClient, journal: dict):
+    """Works through every outstanding issue in the journal with a bounded worker pool."""
+    issue_numbers = sorted(journal["pending"], key=int)
+    queue = asyncio.Queue()
+    for i in range(0, len(issue_numbers), CLOSE_BATCH_SIZE):
+        queue.put_nowait(issue_numbers[i : i + CLOSE_BATCH_SIZE])
+
+    async def worker():
+        while not queue.empty():
+            batch = queue.get_nowait()
+            try:
+                await comment_and_close_batch(github, journal, batch)
+            except Exception as err:
+                # Left in the journal so the next run picks them up
+                logger.error(f"Unable to comment and close issues {batch}: {err}")
+
+    await asyncio.gather(*(worker() for _ in range(MAX_CONCURRENCY)))
+
+
+# Fetch issues from GitHub
+async def fetch_issues(github: GitHubClient):
+    all_issues = []
+    cursor = None
+
+    # A single paginated query returns the open issues of every label
+    while True:
+        response = await github.graphql(
+            ISSUES_QUERY,
+            {
+                "owner": OWNER,
+                "repo": REPO,
+                "labels": list(EVENTS.keys()),
+                "cursor": cursor,
+            },
+        )
+        if response.get("errors"):
+            raise RuntimeError(f"GraphQL request failed: {response['errors']}")
+
+        issues = response["data"]["repository"]["issues"]
+        all_issues.extend(issues["nodes"])
+
+        if not issues["pageInfo"]["hasNextPage"]:
+            break
+        cursor = issues["pageInfo"]["endCursor"]
+
+    for node in all_issues:
+        name = node.get("title")
+        author = node.get("author") or {}
+        plus_one = node["reactions"]["totalCount"]
+        if plus_one < COMMUNITY_APPROVAL_TRIGGER:
+            if author.get("databaseId") != 8687668:
+                logger.warning(
+                    f"Skipping Issue '{name}' due to low community approval... Brandon also overules everything... :)"
+                )
+                continue
+
+        ISSUE_NODE_IDS[node["number"]] = node["id"]
+        issue = {
+            "id": node["databaseId"],
+            "number": node["number"],
+            "title": name,
+            "body": node["body"],
+            "user": {"id": author.get("databaseId"), "login": author.get("login")},
+            "reactions": {"rocket": plus_one},
+        }
+
+        # Avoid duplicate issues, the first matching label wins
+        labels = [label["name"] for label in node["labels"]["nodes"]]
+        for label in EVENTS.keys():
+            if label in labels:
                 EVENTS[label].append(issue)
-                issue_ids.add(issue["id"])
+                break
 
 
 def validate_event_game_updates() -> list[EventGameUpdate]:
@@ -164,53 +429,138 @@ def validate_gigabytes(number: str | int) -> int | None:
     return number
 
 
-# Update YAML file with new issues
-def process_events(yaml_file: str, events: list[BaseEvent]):
-    # Load existing YAML data
-    data = []
+def normalise_name(name: str) -> str:
+    """Normalises an event name so trivially different names are treated as duplicates."""
+    return " ".join(re.sub(r"[^\w\s]", "", name).casefold().split())
+
+
+def datastore_files(yaml_file: str) -> list[str]:
+    """Returns every file holding records of a datastore."""
+    if not DATASTORE_SHARDED:
+        return [yaml_file]
+
+    shard_directory = os.path.splitext(yaml_file)[0]
+    files = sorted(glob.glob(os.path.join(shard_directory, "*.yml")))
 
+    # Records which have not been moved into shards yet are still checked for duplicates
+    if os.path.exists(yaml_file):
+        files.insert(0, yaml_file)
+    return files
+
+
+def datastore_file(yaml_file: str, event: BaseEvent) -> str:
+    """Returns the file a new event is written to."""
+    if not DATASTORE_SHARDED:
+        return yaml_file
+
+    shard_directory = os.path.splitext(yaml_file)[0]
+    return os.path.join(shard_directory, f"{event.date:%Y-%m}.yml")
+
+
+def append_yaml(yaml_file: str, records: list[dict]):
+    """Appends records to a YAML list without rewriting the existing records.
+
+    A block sequence stays valid when more items are appended to the end of it.
+    Files which may end in a flow style list or a null document are loaded and
+    written again with the records added instead, keeping the existing records.
+    """
     try:
+        with open(yaml_file, "rb") as file:
+            file.seek(0, os.SEEK_END)
+            size = file.tell()
+            file.seek(max(size - 8, 0))
+            tail = file.read()
+    except FileNotFoundError:
+        size, tail = 0, b""
+
+    if size and not tail.strip().endswith((b"]", b"~", b"null")):
+        with open(yaml_file, "a") as file:
+            if not tail.endswith(b"\n"):
+                file.write("\n")
+            yaml.safe_dump(records, file)
+        return
+
+    data = []
+    if size:
         with open(yaml_file, "r") as file:
-            data_loaded: list[BaseEvent] = yaml.safe_load(file)
-            if data_loaded:
-                data = data_loaded
-    except Exception as err:
-        logger.error(f"Unable to open YAML file {yaml_file} due to {err}")
+            data = yaml.load(file, Loader=YAML_LOADER) or []
+
+    os.makedirs(os.path.dirname(yaml_file) or ".", exist_ok=True)
+    tmp_file = f"{yaml_file}.tmp"
+    with open(tmp_file, "w") as file:
+        yaml.safe_dump(data + records, file)
+    os.replace(tmp_file, yaml_file)
+
+
+# Update YAML file with new issues
+def process_events(yaml_file: str, events: list[BaseEvent], journal: dict):
+    # Index existing YAML data
+    names = set()
+    github_issue_ids = set()
 
-    names = [d.get("name") for d in data]
-    github_issue_ids = [d.get("github_issue_id") for d in data]
+    for data_file in datastore_files(yaml_file):
+        try:
+            with open(data_file, "r") as file:
+                data: list[dict] = yaml.load(file, Loader=YAML_LOADER) or []
+        except Exception as err:
+            logger.error(f"Unable to open YAML file {data_file} due to {err}")
+            continue
 
+        for record in data:
+            names.add(normalise_name(str(record.get("name", ""))))
+            github_issue_ids.add(record.get("github_issue_id"))
+
+    new_records = defaultdict(list)
     for event in events:
-        if event.name in names or event.github_issue_id in github_issue_ids:
+        name = normalise_name(event.name)
+        if name in names or event.github_issue_id in github_issue_ids:
             logger.warning(
                 f"Event name and/or github issue ID is already in use: {event.name} ({event.github_issue_id})"
             )
             continue
 
-        data.append(event.model_dump())
+        names.add(name)
+        github_issue_ids.add(event.github_issue_id)
+        new_records[datastore_file(yaml_file, event)].append(event.model_dump())
 
-    # Save the updated YAML file
-    with open(yaml_file, "w") as file:
-        yaml.safe_dump(data, file)
+    # Only the new records are written to the YAML files
+    for data_file, records in new_records.items():
+        append_yaml(data_file, records)
 
-    # Loop after YAML file has been saved
-    for event in events:
-        comment_and_close_issue(
-            issue_number=event.github_issue_id,
-            comment=f"Thank you for your contribution! 🎉\n\nThis event was processed successfully and added to the relevant YAML datastore `{yaml_file}`.",
+    # Issues are closed once the YAML file has been saved
+    journal_events(
+        journal,
+        events,
+        comment=f"Thank you for your contribution! 🎉\n\nThis event was processed successfully and added to the relevant YAML datastore `{yaml_file}`.",
+    )
+
+
+async def main():
+    journal = load_journal()
+    if journal["pending"]:
+        logger.info(
+            f"Resuming {len(journal['pending'])} outstanding issue closes from the journal"
         )
 
+    headers = {"Authorization": f"bearer {os.getenv('GITHUB_TOKEN')}"}
+    async with aiohttp.ClientSession(headers=headers) as session:
+        github = GitHubClient(session)
+        await fetch_issues(github)
+
+        # Process issues
+        game_releases = validate_event_game_releases()
+        game_updates = validate_event_game_updates()
 
-def main():
-    fetch_issues()
+        process_events("datastore/event_game_releases.yml", game_releases, journal)
+        process_events("datastore/event_game_updates.yml", game_updates, journal)
 
-    # Process issues
-    game_releases = validate_event_game_releases()
-    game_updates = validate_event_game_updates()
+        await comment_and_close_issues(github, journal)
 
-    process_events("datastore/event_game_releases.yml", game_releases)
-    process_events("datastore/event_game_updates.yml", game_updates)
+    if journal["pending"]:
+        raise SystemExit(
+            f"{len(journal['pending'])} issues are still outstanding in {JOURNAL_FILE}"
+        )
 
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
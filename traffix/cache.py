@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from time import monotonic, time
+from typing import Awaitable, Callable
+
+from aioredis import Redis
+from aioredis.exceptions import ConnectionError as RedisConnectionError
+from aioredis.exceptions import TimeoutError as RedisTimeoutError
+from fastapi import Request, Response
+from structlog import get_logger
+
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+
+logger = get_logger()
+
+# Seconds a subscription waits for a message before checking the connection
+INVALIDATION_POLL_INTERVAL = 1.0
+
+
+class EventCache:
+    """Bounded in-process cache of decoded event lists keyed by datastore SHA.
+
+    The worker publishes the new SHA of a datastore on `EVENT_CACHE_CHANNEL`
+    whenever it syncs, so between syncs a lookup never touches Redis. Entries
+    and known SHAs also expire after `ttl` seconds in case an invalidation
+    message is missed, so the SHA is then read from Redis again.
+    """
+
+    def __init__(self, max_entries: int = 16, ttl: int = 900):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple[str, str], tuple[float, list]] = OrderedDict()
+        self._shas: dict[str, tuple[str, float]] = {}
+
+    def get(self, key: str) -> list | None:
+        """Returns the cached events for the latest known SHA of `key`."""
+        sha = self.sha(key)
+        if not sha:
+            return
+
+        entry = self._entries.get((key, sha))
+        if not entry:
+            return
+
+        expires_at, events = entry
+        if expires_at < monotonic():
+            self.invalidate(key)
+            return
+
+        self._entries.move_to_end((key, sha))
+        return events
+
+    def sha(self, key: str) -> str | None:
+        """Returns the latest known SHA of `key`, unless it expired."""
+        known = self._shas.get(key)
+        if not known:
+            return
+
+        sha, expires_at = known
+        if expires_at < monotonic():
+            del self._shas[key]
+            return
+        return sha
+
+    def observe(self, key: str, sha: str) -> bool:
+        """Records a SHA read from Redis, unless another SHA was published since.
+
+        A reader may read a SHA just before the worker publishes the next one, so
+        a known SHA is only replaced by `invalidate` or once it expires, and the
+        cache does not go backwards.
+
+        Returns whether `sha` is the latest known SHA of `key`.
+        """
+        known = self.sha(key)
+        if known is None:
+            self.invalidate(key, sha)
+            return True
+        return known == sha
+
+    def set(self, key: str, sha: str, events: list) -> None:
+        """Caches the events of `key` loaded at `sha`, see `observe`."""
+        if not self.observe(key, sha):
+            return
+
+        self._entries[(key, sha)] = (monotonic() + self.ttl, events)
+
+        while len(self._entries) > self.max_entries:
+            # Only one SHA is cached per key so the key is now unknown
+            (evicted_key, _), _ = self._entries.popitem(last=False)
+            self._shas.pop(evicted_key, None)
+
+    def invalidate(self, key: str, sha: str | None = None) -> None:
+        """Drops every cached entry for `key` which does not match `sha`.
+
+        Args:
+            key:    Normalized datastore key, eg. "event_game_releases".
+            sha:    New SHA of the datastore, `None` if unknown.
+        """
+        if sha:
+            self._shas[key] = (sha, monotonic() + self.ttl)
+        else:
+            self._shas.pop(key, None)
+
+        for cached_key, cached_sha in list(self._entries):
+            if cached_key == key and cached_sha != sha:
+                del self._entries[(cached_key, cached_sha)]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._shas.clear()
+
+
+class PageCache:
+    """Bounded LRU cache of rendered pages keyed by their ETag."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[bytes, str, int]] = OrderedDict()
+
+    def get(self, etag: str) -> tuple[bytes, str, int] | None:
+        entry = self._entries.get(etag)
+        if entry:
+            self._entries.move_to_end(etag)
+        return entry
+
+    def set(self, etag: str, body: bytes, media_type: str, last_modified: int) -> None:
+        self._entries[etag] = (body, media_type, last_modified)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+event_cache = EventCache(
+    max_entries=settings.EVENT_CACHE_MAX_ENTRIES, ttl=settings.EVENT_CACHE_TTL
+)
+# Pre-serialized API records, invalidated alongside the events they are built from
+record_cache = EventCache(
+    max_entries=settings.EVENT_CACHE_MAX_ENTRIES, ttl=settings.EVENT_CACHE_TTL
+)
+page_cache = PageCache(max_entries=settings.PAGE_CACHE_MAX_ENTRIES)
+
+
+async def load_versions(client: RedisDependency, keys: list[str]) -> dict[str, str]:
+    """Returns the current SHA of each key, avoiding Redis for SHAs already known.
+
+    Args:
+        client:     Redis client.
+        keys:       Redis keys written by the worker alongside a `{key}_sha`.
+    """
+    versions = {}
+    if settings.EVENT_CACHE_ENABLED:
+        versions = {key: event_cache.sha(key) for key in keys if event_cache.sha(key)}
+
+    missing = [key for key in keys if key not in versions]
+    if not missing:
+        return versions
+
+    shas = await client.redis.mget([f"{key}_sha" for key in missing])
+    for key, sha in zip(missing, shas):
+        versions[key] = sha.decode("utf-8") if sha else ""
+        if sha and settings.EVENT_CACHE_ENABLED:
+            event_cache.observe(key, versions[key])
+            record_cache.observe(key, versions[key])
+
+    return versions
+
+
+def make_etag(
+    request: Request, versions: dict[str, str], period: int | None = None
+) -> str:
+    """Builds a strong ETag from the data versions, the request and the time period.
+
+    Without a `period` the ETag only changes with the data versions.
+    """
+    query = sorted(request.query_params.multi_items())
+    parts = [
+        str(request.base_url),
+        request.url.path,
+        json.dumps(query),
+        json.dumps(versions, sort_keys=True),
+    ]
+    if period:
+        parts.append(str(int(time() // period)))
+    return '"' + hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def not_modified_since(request: Request, last_modified: int) -> bool:
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or "if-none-match" in request.headers:
+        return False
+
+    try:
+        return parsedate_to_datetime(if_modified_since).timestamp() >= last_modified
+    except (TypeError, ValueError):
+        return False
+
+
+async def cached_response(
+    request: Request,
+    client: RedisDependency,
+    keys: list[str],
+    render: Callable[[], Awaitable[Response]],
+    period: int = 86400,
+) -> Response:
+    """Serves a page from the ETag keyed page cache, rendering it on a miss.
+
+    Args:
+        request:    Incoming request.
+        client:     Redis client.
+        keys:       Redis keys the page is rendered from.
+        render:     Renders the page when it is not cached.
+        period:     Seconds the page stays valid for even if the data does not
+                    change, eg. upcoming events change daily.
+
+    Conditional GETs are answered with a 304 when the ETag or Last-Modified matches.
+    """
+    if not settings.PAGE_CACHE_ENABLED:
+        return await render()
+
+    versions = await load_versions(client, keys)
+    etag = make_etag(request, versions, period)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.PAGE_CACHE_MAX_AGE}",
+    }
+
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    cached = page_cache.get(etag)
+    if not cached:
+        response = await render()
+        if response.status_code != 200:
+            return response
+
+        synced_at = await client.redis.mget([f"{key}_synced_at" for key in keys])
+        last_modified = max(
+            [int(time() // period) * period]
+            + [int(timestamp) for timestamp in synced_at if timestamp]
+        )
+        cached = (response.body, response.media_type, last_modified)
+        page_cache.set(etag, *cached)
+
+    body, media_type, last_modified = cached
+    headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    if not_modified_since(request, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+async def listen_for_invalidations(client: Redis, caches: list[EventCache]) -> None:
+    """Keeps `caches` in sync with the SHAs published by the worker.
+
+    Args:
+        client:     Redis client dedicated to the subscription, see
+                    `create_pubsub_client`.
+        caches:     Caches to invalidate.
+    """
+    while True:
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(settings.EVENT_CACHE_CHANNEL)
+            while True:
+                # Polled so the health check PINGs run while no messages arrive
+                try:
+                    message = await pubsub.get_message(
+                        ignore_subscribe_messages=True,
+                        timeout=INVALIDATION_POLL_INTERVAL,
+                    )
+                except RedisTimeoutError:
+                    continue
+                if not message or message["type"] != "message":
+                    continue
+
+                try:
+                    data = json.loads(message["data"])
+                    for cache in caches:
+                        cache.invalidate(data["key"], data.get("sha"))
+                except Exception as err:
+                    logger.warning(f"Ignoring invalid cache message due to: {err}")
+        except asyncio.CancelledError:
+            raise
+        except (RedisConnectionError, OSError) as err:
+            # Messages may have been missed while disconnected
+            logger.warning(f"Event cache subscription lost due to: {err}")
+            for cache in caches:
+                cache.clear()
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.close()
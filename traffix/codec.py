@@ -0,0 +1,134 @@
+import json
+import struct
+from datetime import date, datetime
+from typing import Any
+
+import msgpack
+import orjson
+import zstandard
+
+from traffix.config import settings
+
+# Binary values start with MAGIC, the codec ID and flags. Values without it are the
+# legacy JSON written by previous releases, which is still read so the worker and
+# web app can be rolled out in any order. 0xC1 never starts a UTF-8 JSON document.
+MAGIC = b"\xc1TX"
+HEADER_SIZE = len(MAGIC) + 2
+FLAG_ZSTD = 0x01
+
+EXT_NAIVE_DATETIME = 1
+EXT_DATE = 2
+# Packed field by field, building a datetime from its fields is the fastest to decode
+NAIVE_DATETIME_STRUCT = struct.Struct(">HBBBBBI")
+DATE_STRUCT = struct.Struct(">HBB")
+
+zstd_compressor = zstandard.ZstdCompressor(level=settings.REDIS_CODEC_ZSTD_LEVEL)
+zstd_decompressor = zstandard.ZstdDecompressor()
+
+
+class JSONCodec:
+    """Legacy format, dates are written as strings and values are never compressed."""
+
+    name = "json"
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, default=str).encode("utf-8")
+
+    def loads(self, data: bytes) -> Any:
+        return orjson.loads(data)
+
+
+class MsgpackCodec:
+    """msgpack with native timestamps.
+
+    Timezone aware datetimes use the msgpack timestamp type and are read back in UTC.
+    Naive datetimes, which the datastores use, and dates use extension types so
+    they are read back unchanged. Any other unsupported value is written as a string.
+    """
+
+    id = 1
+    name = "msgpack"
+
+    @staticmethod
+    def default(value: Any) -> Any:
+        if isinstance(value, datetime):
+            return msgpack.ExtType(
+                EXT_NAIVE_DATETIME,
+                NAIVE_DATETIME_STRUCT.pack(
+                    value.year,
+                    value.month,
+                    value.day,
+                    value.hour,
+                    value.minute,
+                    value.second,
+                    value.microsecond,
+                ),
+            )
+        if isinstance(value, date):
+            return msgpack.ExtType(
+                EXT_DATE, DATE_STRUCT.pack(value.year, value.month, value.day)
+            )
+        return str(value)
+
+    @staticmethod
+    def ext_hook(code: int, data: bytes) -> Any:
+        if code == EXT_NAIVE_DATETIME:
+            return datetime(*NAIVE_DATETIME_STRUCT.unpack(data))
+        if code == EXT_DATE:
+            return date(*DATE_STRUCT.unpack(data))
+        return msgpack.ExtType(code, data)
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, datetime=True, default=self.default)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(
+            data, timestamp=3, ext_hook=self.ext_hook, strict_map_key=False
+        )
+
+
+legacy_codec = JSONCodec()
+CODECS = {MsgpackCodec.id: MsgpackCodec()}
+CODECS_BY_NAME = {codec.name: codec for codec in [legacy_codec, *CODECS.values()]}
+
+
+def encode_value(value: Any, codec: str | None = None) -> bytes:
+    """Encodes a value with `codec`, defaulting to `REDIS_CODEC`.
+
+    The "json" codec writes the legacy format readable by previous releases. Binary
+    values larger than `REDIS_CODEC_COMPRESS_MIN_SIZE` are compressed with zstd.
+    """
+    encoder = CODECS_BY_NAME[codec or settings.REDIS_CODEC]
+    if encoder is legacy_codec:
+        return legacy_codec.dumps(value)
+
+    data = encoder.dumps(value)
+    flags = 0
+    if len(data) >= settings.REDIS_CODEC_COMPRESS_MIN_SIZE:
+        data = zstd_compressor.compress(data)
+        flags |= FLAG_ZSTD
+
+    return MAGIC + bytes([encoder.id, flags]) + data
+
+
+def decode_value(data: bytes | str | None) -> Any:
+    """Decodes a value written by any codec, including legacy JSON.
+
+    Raises `ValueError` if the value was written by an unknown codec.
+    """
+    if data is None:
+        return
+
+    if isinstance(data, str) or not data.startswith(MAGIC):
+        return legacy_codec.loads(data)
+
+    codec_id, flags = data[len(MAGIC)], data[len(MAGIC) + 1]
+    codec = CODECS.get(codec_id)
+    if codec is None:
+        raise ValueError(f"Unknown Redis codec {codec_id}")
+
+    payload = data[HEADER_SIZE:]
+    if flags & FLAG_ZSTD:
+        payload = zstd_decompressor.decompress(payload)
+
+    return codec.loads(payload)
@@ -1,10 +1,95 @@
 from typing import Annotated
-import json
+import hmac
+import time
 
-from aioredis import from_url
-from fastapi import Depends
+from aioredis import BlockingConnectionPool, Redis
+from aioredis.client import Pipeline
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from traffix.codec import decode_value
 from traffix.config import settings
+from traffix.metrics import observe_redis_command, payload_size
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline recording its round trip and payload sizes as one "PIPELINE" command."""
+
+    async def execute(self, raise_on_error: bool = True):
+        sent = sum(payload_size(args[1:]) for args, _ in self.command_stack)
+        started = time.perf_counter()
+        try:
+            reply = await super().execute(raise_on_error)
+        except Exception:
+            observe_redis_command("PIPELINE", started, sent, failed=True)
+            raise
+
+        observe_redis_command("PIPELINE", started, sent, reply)
+        return reply
+
+
+class InstrumentedRedis(Redis):
+    """Redis client recording the latency and payload size of every command."""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        sent = payload_size(args[1:])
+        started = time.perf_counter()
+        try:
+            reply = await super().execute_command(*args, **options)
+        except Exception:
+            observe_redis_command(command, started, sent, failed=True)
+            raise
+
+        observe_redis_command(command, started, sent, reply)
+        return reply
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: str | None = None
+    ) -> InstrumentedPipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+def create_redis_client(redis_url: str) -> Redis:
+    """Creates a Redis client backed by a bounded, blocking connection pool.
+
+    Commands are recorded in the Redis metrics when `METRICS_ENABLED` is set.
+
+    Args:
+        redis_url:      Redis DSN.
+    """
+    pool = BlockingConnectionPool.from_url(
+        str(redis_url),
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        timeout=settings.REDIS_POOL_TIMEOUT,
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+    )
+    if settings.METRICS_ENABLED:
+        return InstrumentedRedis(connection_pool=pool)
+    return Redis(connection_pool=pool)
+
+
+def create_pubsub_client(redis_url: str) -> Redis:
+    """Creates a Redis client for a long lived subscription.
+
+    Reads never time out, as a subscription is idle between messages, so a dead
+    connection is detected by the health check PINGs and TCP keepalive instead.
+
+    Args:
+        redis_url:      Redis DSN.
+    """
+    return Redis.from_url(
+        str(redis_url),
+        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        socket_timeout=None,
+        socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+    )
 
 
 class RedisDependency:
@@ -13,11 +98,32 @@ class RedisDependency:
         self.redis = None
 
     async def connect(self):
-        self.redis = await from_url(self.redis_url)
+        self.redis = create_redis_client(self.redis_url)
+        await self.redis.ping()
 
     async def disconnect(self):
         if self.redis:
             await self.redis.close()
+            await self.redis.connection_pool.disconnect()
+
+    def pool_stats(self) -> dict:
+        """Returns connection pool usage so the pool can be sized correctly."""
+        if not self.redis:
+            return {}
+
+        pool = self.redis.connection_pool
+        created = len(pool._connections)
+        # Idle connections sit in the pool queue alongside `None` placeholders
+        # for connections which have not been created yet.
+        idle = sum(1 for connection in pool.pool._queue if connection is not None)
+
+        return {
+            "max_connections": pool.max_connections,
+            "created_connections": created,
+            "idle_connections": idle,
+            "in_use_connections": created - idle,
+            "waiting_requests": len(pool.pool._getters),
+        }
 
     async def get(self, key: str, load_json: bool = True) -> str:
         data = await self.redis.get(key)
@@ -25,7 +131,7 @@ class RedisDependency:
             return
 
         if load_json:
-            return json.loads(data.decode("utf-8"))
+            return decode_value(data)
 
         return data.decode("utf-8")
 
@@ -33,13 +139,33 @@ class RedisDependency:
         await self.redis.set(key, value)
 
 
-async def get_redis(redis_url: str = "redis://localhost"):
-    client = RedisDependency(settings.REDIS)
-    await client.connect()
-    try:
-        yield client
-    finally:
-        await client.disconnect()
+def get_redis(request: Request) -> RedisDependency:
+    """Returns the application-wide Redis client created in the app lifespan."""
+    return request.app.state.redis
 
 
 RedisDep = Annotated[RedisDependency, Depends(get_redis)]
+
+
+def get_api_token(
+    credentials: Annotated[
+        HTTPAuthorizationCredentials | None, Depends(HTTPBearer(auto_error=False))
+    ],
+) -> str | None:
+    """Returns the bearer token if it is one of `API_INGEST_TOKENS`."""
+    if credentials:
+        for token in settings.API_INGEST_TOKENS:
+            if hmac.compare_digest(credentials.credentials.encode(), token.encode()):
+                return token
+
+
+def verify_ingest_token(token: Annotated[str | None, Depends(get_api_token)]) -> str:
+    """Rejects requests without a bearer token from `API_INGEST_TOKENS`."""
+    if token:
+        return token
+
+    raise HTTPException(
+        status_code=401,
+        detail="Invalid or missing API token",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
@@ -0,0 +1,58 @@
+import csv
+import io
+from typing import AsyncIterator
+
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+from traffix.logic import iter_event_chunks
+from traffix.models.export import ExportFormatEnum
+
+EXPORT_MEDIA_TYPES = {
+    ExportFormatEnum.ndjson: "application/x-ndjson",
+    ExportFormatEnum.csv: "text/csv; charset=utf-8",
+}
+CSV_FIELDS = [
+    "github_issue_id",
+    "type",
+    "name",
+    "date",
+    "version",
+    "size",
+    "source",
+    "image",
+]
+
+
+async def export_ndjson(
+    client: RedisDependency, keys: list[str]
+) -> AsyncIterator[bytes]:
+    """Streams the events of each datastore as newline-delimited JSON."""
+    for key in keys:
+        async for events in iter_event_chunks(
+            client, key, settings.API_EXPORT_CHUNK_SIZE
+        ):
+            yield b"".join(
+                event.model_dump_json().encode("utf-8") + b"\n" for event in events
+            )
+
+
+async def export_csv(client: RedisDependency, keys: list[str]) -> AsyncIterator[bytes]:
+    """Streams the events of each datastore as CSV with a header row.
+
+    Columns which do not apply to an event type, eg. `version` of a release, are empty.
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+
+    for key in keys:
+        async for events in iter_event_chunks(
+            client, key, settings.API_EXPORT_CHUNK_SIZE
+        ):
+            writer.writerows(event.model_dump(mode="json") for event in events)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
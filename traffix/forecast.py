@@ -0,0 +1,155 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+import numpy as np
+
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+from traffix.logic import load_events
+from traffix.models.events import EventGameRelease, EventGameUpdate
+from traffix.models.forecast import (
+    ForecastCurve,
+    ForecastPoint,
+    ForecastResolutionEnum,
+)
+
+HOUR = np.timedelta64(1, "h")
+FORECAST_KEYS = ["event_game_releases", "event_game_updates"]
+
+
+def curve_weights(curve: ForecastCurve) -> np.ndarray:
+    """Returns the share of an event's traffic in each hour after the event."""
+    hours = np.arange(curve.horizon_hours, dtype=np.float64)
+    if curve.peak_hours:
+        ramp = np.minimum((hours + 1) / curve.peak_hours, 1.0)
+    else:
+        ramp = np.ones_like(hours)
+    decay = np.exp(-np.maximum(hours - curve.peak_hours, 0) / curve.decay_hours)
+
+    weights = ramp * decay
+    return weights / weights.sum()
+
+
+def to_naive_utc(date: datetime) -> datetime:
+    """Datastore dates are naive UTC, so aware datetimes are converted to match."""
+    if date.tzinfo:
+        return date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+
+def to_hour(date: datetime) -> np.datetime64:
+    return np.datetime64(to_naive_utc(date), "h")
+
+
+def forecast_hourly(
+    events: Iterable[EventGameRelease | EventGameUpdate],
+    start: datetime,
+    end: datetime,
+    curves: dict[str, ForecastCurve] | None = None,
+) -> np.ndarray:
+    """Computes the expected download traffic (GB) for every hour in [start, end).
+
+    Each event is an impulse of `size * uptake` GB at its date, which is convolved
+    with the curve of its event type. Events before `start` still contribute while
+    they are within the horizon of their curve.
+
+    Args:
+        events:     Events to forecast.
+        start:      First hour of the forecast.
+        end:        End of the forecast (exclusive).
+        curves:     Curve per event type, defaults to `FORECAST_CURVES`.
+    """
+    curves = curves or settings.FORECAST_CURVES
+    start_hour = to_hour(start)
+    total_hours = max(int((to_hour(end) - start_hour) / HOUR), 0)
+
+    events_by_type: dict[str, list] = {}
+    for event in events:
+        events_by_type.setdefault(event.type, []).append(event)
+
+    series = np.zeros(total_hours, dtype=np.float64)
+    for event_type, type_events in events_by_type.items():
+        curve = curves.get(event_type)
+        if not curve or not total_hours:
+            continue
+
+        weights = curve_weights(curve)
+        horizon = len(weights)
+
+        # Hour offsets relative to `horizon` hours before the start of the forecast
+        offsets = (
+            np.array(
+                [to_hour(event.date) for event in type_events], dtype="datetime64[h]"
+            )
+            - (start_hour - horizon * HOUR)
+        ) / HOUR
+        offsets = offsets.astype(np.int64)
+        sizes = np.array([event.size for event in type_events], dtype=np.float64)
+
+        in_range = (offsets >= 0) & (offsets < total_hours + horizon)
+        impulses = np.bincount(
+            offsets[in_range],
+            weights=sizes[in_range] * curve.uptake,
+            minlength=total_hours + horizon,
+        )
+        series += np.convolve(impulses, weights)[horizon : horizon + total_hours]
+
+    return series
+
+
+def resample(
+    series: np.ndarray, start: datetime, resolution: ForecastResolutionEnum
+) -> list[ForecastPoint]:
+    """Converts an hourly series starting at `start` into forecast points.
+
+    Daily resolution sums the hours of each day, `start` must be at midnight.
+    """
+    start = start.replace(minute=0, second=0, microsecond=0)
+
+    if resolution == ForecastResolutionEnum.day:
+        days = -(-len(series) // 24)
+        padded = np.zeros(days * 24, dtype=np.float64)
+        padded[: len(series)] = series
+        values = padded.reshape(days, 24).sum(axis=1)
+        step = timedelta(days=1)
+    else:
+        values = series
+        step = timedelta(hours=1)
+
+    return [
+        ForecastPoint(timestamp=start + step * index, value=round(float(value), 3))
+        for index, value in enumerate(values)
+    ]
+
+
+async def load_forecast_events(
+    client: RedisDependency,
+) -> list[EventGameRelease | EventGameUpdate]:
+    events = []
+    for key in FORECAST_KEYS:
+        events.extend(await load_events(client, key))
+    return events
+
+
+async def load_forecast(
+    client: RedisDependency, start: datetime, end: datetime
+) -> np.ndarray:
+    """Loads the hourly forecast for [start, end).
+
+    The range is sliced out of the series precomputed by the worker when it covers
+    it, otherwise the forecast is computed from the events.
+    """
+    start_hour = to_hour(start)
+    total_hours = max(int((to_hour(end) - start_hour) / HOUR), 0)
+
+    cached = await client.get("forecast_hourly")
+    if cached:
+        offset = int(
+            (start_hour - to_hour(datetime.fromisoformat(cached["start"]))) / HOUR
+        )
+        if offset >= 0 and offset + total_hours <= len(cached["values"]):
+            return np.array(
+                cached["values"][offset : offset + total_hours], dtype=np.float64
+            )
+
+    return forecast_hourly(await load_forecast_events(client), start, end)
@@ -0,0 +1,49 @@
+from typing import Annotated
+
+from pydantic import Field, TypeAdapter
+from structlog import get_logger
+
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+from traffix.logic import EVENT_KEYS, validate_event_batch
+from traffix.models.events import Event
+
+logger = get_logger()
+
+EVENT_BATCH_ADAPTER = TypeAdapter(
+    Annotated[list[Event], Field(max_length=settings.API_INGEST_MAX_BATCH)]
+)
+WRITE_CHUNK_SIZE = 1000
+
+
+def pending_events_key(key: str) -> str:
+    """Hash of event ID to the JSON encoded event, awaiting approval."""
+    return f"pending_{key}"
+
+
+def validate_batch(body: bytes) -> tuple[list[Event], list[dict]]:
+    """Validates a JSON array of events, see `validate_event_batch`.
+
+    Raises `ValidationError` if the body is not a JSON array of at most
+    `API_INGEST_MAX_BATCH` items.
+    """
+    return validate_event_batch(body, EVENT_BATCH_ADAPTER)
+
+
+async def queue_pending_events(client: RedisDependency, events: list[Event]) -> None:
+    """Writes events into the pending queue of their datastore with pipelined HSETs.
+
+    Events are keyed by their ID, so submitting an event again replaces it.
+    """
+    async with client.redis.pipeline(transaction=False) as pipe:
+        for start in range(0, len(events), WRITE_CHUNK_SIZE):
+            records: dict[str, dict[int, str]] = {}
+            for event in events[start : start + WRITE_CHUNK_SIZE]:
+                records.setdefault(EVENT_KEYS[event.type], {})[
+                    event.github_issue_id
+                ] = event.model_dump_json()
+
+            for key, mapping in records.items():
+                pipe.hset(pending_events_key(key), mapping=mapping)
+
+        await pipe.execute()
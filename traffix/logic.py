@@ -1,13 +1,131 @@
-from datetime import datetime, timedelta
+import asyncio
+from bisect import bisect_left
+from calendar import timegm
+from datetime import datetime, time, timedelta
 from dateutil.parser import parse
+from typing import AsyncIterator
+from urllib.parse import urlsplit
+from uuid import uuid4
+import json
 
 from aioredis import Redis
+from pydantic import TypeAdapter, ValidationError
 from structlog import get_logger
 
-from traffix.models.events import GitHubEvent
+from traffix.cache import event_cache, record_cache
+from traffix.codec import decode_value
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+from traffix.models.events import (
+    Event,
+    EventEnum,
+    EventGameRelease,
+    EventGameUpdate,
+    EventQuery,
+    GitHubEvent,
+)
+from traffix.records import RecordIndex
 
 logger = get_logger()
 
+EVENT_MODELS = {
+    "event_game_releases": EventGameRelease,
+    "event_game_updates": EventGameUpdate,
+}
+EVENT_KEYS = {
+    EventEnum.game_release: "event_game_releases",
+    EventEnum.game_update: "event_game_updates",
+}
+EVENT_TYPES = {key: event_type for event_type, key in EVENT_KEYS.items()}
+EVENT_LIST_ADAPTER = TypeAdapter(list[Event])
+# Capped list of the latest GitHub events, newest first
+GITHUB_ACTIVITY_KEY = "github_activity"
+
+
+def snapshot_key(key: str, version: str) -> str:
+    """Key of the events written by one sync of a datastore."""
+    return f"{key}:{version}"
+
+
+async def resolve_snapshot(client: Redis, key: str) -> tuple[str, str | None]:
+    """Returns the key of the active snapshot of a datastore and its version.
+
+    The worker writes every sync under new keys and then switches `{key}_version`
+    to them, so reads of one snapshot stay consistent while the next sync lands.
+    Datastores last synced by a previous release are read from the unversioned key.
+
+    Args:
+        client:     Redis client.
+        key:        Normalized datastore key, eg. "event_game_releases".
+    """
+    version, sha = await client.mget(f"{key}_version", f"{key}_sha")
+    if version:
+        version = version.decode("utf-8")
+        return snapshot_key(key, version), version
+
+    return key, sha.decode("utf-8") if sha else None
+
+
+def event_index_key(key: str) -> str:
+    """Sorted set of event IDs scored by the event date."""
+    return f"{key}_by_date"
+
+
+def event_records_key(key: str) -> str:
+    """Hash of event ID to the JSON encoded event."""
+    return f"{key}_by_id"
+
+
+def event_size_key(key: str) -> str:
+    """Sorted set of event IDs scored by the event size in GB."""
+    return f"{key}_by_size"
+
+
+def event_hosts_key(key: str) -> str:
+    """Set of the hosts of the event sources, each indexed by `event_host_key`."""
+    return f"{key}_hosts"
+
+
+def event_host_key(key: str, host: str) -> str:
+    """Set of the IDs of the events whose source is on `host`."""
+    return f"{key}_by_host:{host}"
+
+
+def snapshot_keys(snapshot: str, hosts: list[str]) -> list[str]:
+    """Every key of a datastore snapshot, given the hosts of its events."""
+    return [
+        snapshot,
+        event_index_key(snapshot),
+        event_records_key(snapshot),
+        event_size_key(snapshot),
+        event_hosts_key(snapshot),
+        *(event_host_key(snapshot, host) for host in hosts),
+    ]
+
+
+def source_host(source: str) -> str:
+    """Normalizes the host of an event source URL, or of a bare host.
+
+    Eg. "https://www.gog.com/game/x" and "GOG.com" are both "gog.com".
+    """
+    if "//" not in source:
+        source = f"//{source}"
+
+    host = urlsplit(source).hostname or ""
+    return host.removeprefix("www.")
+
+
+def event_score(date: datetime | str) -> int:
+    """Converts an event date into the score used by the date index.
+
+    Dates in the datastore are naive, so they are treated as UTC to keep the
+    score stable regardless of the timezone the worker or UI runs in.
+    """
+    if isinstance(date, str):
+        date = parse(date)
+
+    return timegm(date.utctimetuple())
+
 
 def make_date_human_readable(date: datetime | str) -> str:
     """Makes a date human readable from a UI perspective.
@@ -47,35 +165,376 @@ def make_date_human_readable(date: datetime | str) -> str:
         return f"{years} years ago"
 
 
-async def load_latest_events(client: Redis, limit: int = 0) -> list[GitHubEvent]:
-    github_events = await client.get("github_events")
+def validate_events(
+    key: str, data: list[dict]
+) -> list[EventGameRelease | EventGameUpdate]:
+    """Validates raw datastore records, skipping any which are invalid."""
+    model = EVENT_MODELS[key]
 
     events = []
-    for event in github_events:
+    for record in data:
         try:
-            event_type, title = event["title"].split(":", 1)
+            events.append(model.model_validate(record))
         except Exception as err:
-            logger.warning(f"Unable to load an event due to: {err}")
+            logger.warning(f"Unable to load an event from '{key}' due to: {err}")
+
+    return events
+
+
+def validate_event_batch(
+    data: bytes | list[dict], adapter: TypeAdapter = EVENT_LIST_ADAPTER
+) -> tuple[list[Event], list[dict]]:
+    """Validates a list of events of any type in one pass.
+
+    When some events are invalid the errors are grouped by item, and the remaining
+    events are validated again in one pass.
+
+    Args:
+        data:       JSON encoded array, decoded by pydantic, or decoded records.
+        adapter:    Adapter of the list of events.
+
+    Returns the valid events and an entry per invalid item with its index and errors.
+
+    Raises `ValidationError` if `data` is not a list.
+    """
+    try:
+        if isinstance(data, bytes):
+            return adapter.validate_json(data), []
+        return adapter.validate_python(data), []
+    except ValidationError as err:
+        item_errors: dict[int, list[dict]] = {}
+        for error in err.errors(include_url=False, include_input=False):
+            if not error["loc"] or not isinstance(error["loc"][0], int):
+                raise
+
+            index, *loc = error["loc"]
+            item_errors.setdefault(index, []).append(
+                {"loc": loc, "msg": error["msg"], "type": error["type"]}
+            )
+
+    items = json.loads(data) if isinstance(data, bytes) else data
+    events = adapter.validate_python(
+        [item for index, item in enumerate(items) if index not in item_errors]
+    )
+    errors = [
+        {"index": index, "errors": errors}
+        for index, errors in sorted(item_errors.items())
+    ]
+    return events, errors
+
+
+async def load_events(
+    client: RedisDependency, key: str
+) -> list[EventGameRelease | EventGameUpdate]:
+    """Loads all events of a datastore sorted by date, using the in-process cache.
+
+    The cache is only used with `EVENT_CACHE_ENABLED`, as nothing invalidates it
+    otherwise.
+
+    Args:
+        client:     Redis client.
+        key:        Normalized datastore key, eg. "event_game_releases".
+    """
+    if settings.EVENT_CACHE_ENABLED:
+        events = event_cache.get(key)
+        if events is not None:
+            return events
+
+    snapshot, version = await resolve_snapshot(client.redis, key)
+    data = await client.redis.get(snapshot)
+    if not data:
+        return []
+
+    events = sorted(
+        validate_events(key, decode_value(data)), key=lambda event: event.date
+    )
+    if version and settings.EVENT_CACHE_ENABLED:
+        event_cache.set(key, version, events)
+
+    return events
+
+
+async def load_upcoming_events(
+    client: RedisDependency, key: str, limit: int = 25, offset: int = 0
+) -> tuple[list[EventGameRelease | EventGameUpdate], int]:
+    """Loads a page of upcoming events (today onwards) sorted by date.
+
+    Args:
+        client:     Redis client.
+        key:        Normalized datastore key, eg. "event_game_releases".
+        limit:      Page size.
+        offset:     Number of upcoming events to skip.
+
+    Returns the events on the requested page and the total amount of upcoming events.
+    """
+    today = datetime.combine(datetime.today().date(), time.min)
+
+    if settings.EVENT_CACHE_ENABLED:
+        events = await load_events(client, key)
+        start = bisect_left(events, today, key=lambda event: event.date)
+        return events[start + offset : start + offset + limit], len(events) - start
+
+    return await query_events(
+        client.redis, EventQuery(type=EVENT_TYPES[key], start=today), limit, offset
+    )
+
 
-        event_type_stripped = (
-            str(event_type).replace("[", "", 1).replace("]", "", 1).lower()
+async def iter_event_chunks(
+    client: RedisDependency, key: str, chunk_size: int = 1000
+) -> AsyncIterator[list[EventGameRelease | EventGameUpdate]]:
+    """Yields every event of a datastore sorted by date, `chunk_size` at a time.
+
+    Events are read from the date index, so only one chunk is held in memory. Every
+    chunk is read from the snapshot active when the export started.
+    """
+    snapshot, _ = await resolve_snapshot(client.redis, key)
+    index_key = event_index_key(snapshot)
+    records_key = event_records_key(snapshot)
+
+    start = 0
+    while True:
+        event_ids = await client.redis.zrange(index_key, start, start + chunk_size - 1)
+        if not event_ids:
+            return
+
+        records = await client.redis.hmget(records_key, event_ids)
+        yield validate_events(
+            key, [decode_value(record) for record in records if record]
         )
-        events.append(
-            GitHubEvent(
-                id=event["number"],
-                title=title,
-                type=event_type_stripped,
-                user=event["user"]["login"],
-                created_at=event["created_at"],
-                created_at_human_readable=make_date_human_readable(event["created_at"]),
-                updated_at=event["updated_at"],
-                closed_at=event["closed_at"],
+        start += chunk_size
+
+
+async def query_event_ids(
+    client: Redis,
+    key: str,
+    query: EventQuery,
+    limit: int | None = None,
+    offset: int = 0,
+) -> tuple[str, list[tuple[bytes, float]], int]:
+    """Finds the events of a datastore matching `query`, sorted by date.
+
+    The secondary indexes of the active snapshot are intersected by Redis in one
+    transaction, so only the IDs on the requested page are sent back.
+
+    Args:
+        client:     Redis client.
+        key:        Normalized datastore key, eg. "event_game_releases".
+        query:      Filters, the type is implied by `key`.
+        limit:      Page size, every match when None.
+        offset:     Number of matches to skip.
+
+    Returns the snapshot queried, the (event ID, date score) of each match on the
+    page and the total amount of matches.
+    """
+    snapshot, _ = await resolve_snapshot(client, key)
+    index_key = event_index_key(snapshot)
+    min_score = event_score(query.start) if query.start else "-inf"
+    max_score = event_score(query.end) if query.end else "+inf"
+
+    # Members of plain sets score 1, so a weight of 0 keeps the score of the index
+    filters = {}
+    if query.host:
+        filters[event_host_key(snapshot, source_host(query.host))] = 0
+
+    temporary_keys = []
+    async with client.pipeline(transaction=True) as pipe:
+        if query.min_size is not None or query.max_size is not None:
+            sizes_key = f"{snapshot}_query:{uuid4().hex}"
+            pipe.zinterstore(sizes_key, {event_size_key(snapshot): 1, **filters})
+            if query.min_size is not None:
+                pipe.zremrangebyscore(sizes_key, "-inf", f"({query.min_size}")
+            if query.max_size is not None:
+                pipe.zremrangebyscore(sizes_key, f"({query.max_size}", "+inf")
+            filters = {sizes_key: 0}
+            temporary_keys.append(sizes_key)
+
+        matches_key = index_key
+        if filters:
+            matches_key = f"{snapshot}_query:{uuid4().hex}"
+            pipe.zinterstore(matches_key, {index_key: 1, **filters})
+            temporary_keys.append(matches_key)
+
+        pipe.zcount(matches_key, min_score, max_score)
+        pipe.zrangebyscore(
+            matches_key,
+            min_score,
+            max_score,
+            start=offset if limit is not None else None,
+            num=limit,
+            withscores=True,
+        )
+        if temporary_keys:
+            pipe.delete(*temporary_keys)
+        results = await pipe.execute()
+
+    total, page = results[-3:-1] if temporary_keys else results[-2:]
+    return snapshot, page, total
+
+
+async def query_events(
+    client: Redis, query: EventQuery, limit: int | None = None, offset: int = 0
+) -> tuple[list[EventGameRelease | EventGameUpdate], int]:
+    """Loads the events matching `query` sorted by date.
+
+    Without a type every datastore is queried for its first `offset + limit`
+    matches, and the pages are merged by date.
+
+    Args:
+        client:     Redis client.
+        query:      Filters.
+        limit:      Page size, every match when None.
+        offset:     Number of matches to skip.
+
+    Returns the events on the requested page and the total amount of matches.
+    """
+    keys = [EVENT_KEYS[query.type]] if query.type else list(EVENT_KEYS.values())
+
+    if len(keys) == 1:
+        results = [await query_event_ids(client, keys[0], query, limit, offset)]
+        start, end = 0, None
+    else:
+        results = await asyncio.gather(
+            *(
+                query_event_ids(
+                    client, key, query, None if limit is None else offset + limit
+                )
+                for key in keys
             )
         )
+        start, end = offset, None if limit is None else offset + limit
+
+    matches = sorted(
+        (score, position, event_id)
+        for position, (_, page, _) in enumerate(results)
+        for event_id, score in page
+    )[start:end]
+
+    event_ids = [[] for _ in keys]
+    for _, position, event_id in matches:
+        event_ids[position].append(event_id)
+
+    # Snapshots are immutable, so the records match the IDs found
+    async with client.pipeline(transaction=False) as pipe:
+        for (snapshot, _, _), ids in zip(results, event_ids):
+            if ids:
+                pipe.hmget(event_records_key(snapshot), ids)
+        records = iter(await pipe.execute())
+
+    events = []
+    for key, ids in zip(keys, event_ids):
+        if ids:
+            events.extend(
+                validate_events(
+                    key, [decode_value(record) for record in next(records) if record]
+                )
+            )
+
+    total = sum(total for _, _, total in results)
+    return sorted(events, key=lambda event: event.date), total
+
+
+async def load_event_records(client: RedisDependency, key: str) -> RecordIndex:
+    """Loads the API records of a datastore keyed by (date score, event ID).
+
+    Args:
+        client:     Redis client.
+        key:        Normalized datastore key, eg. "event_game_releases".
+    """
+    index = record_cache.get(key)
+    if index is not None:
+        return index
+
+    index = RecordIndex(
+        [
+            (
+                (event_score(event.date), event.github_issue_id),
+                {"size": event.size},
+                event.model_dump_json().encode("utf-8"),
+            )
+            for event in await load_events(client, key)
+        ]
+    )
+    if event_cache.sha(key) and settings.EVENT_CACHE_ENABLED:
+        record_cache.set(key, event_cache.sha(key), index)
+
+    return index
+
+
+def github_event_from_issue(issue: dict) -> GitHubEvent:
+    """Converts a GitHub issue titled eg. "[GAME_RELEASE]: Name" into an event.
+
+    Raises `ValueError` if the issue is not an event submission.
+    """
+    event_type, separator, title = issue["title"].partition(":")
+    if not separator:
+        raise ValueError(f"Issue #{issue['number']} has no event type in its title")
+
+    return GitHubEvent(
+        id=issue["number"],
+        title=title.strip(),
+        type=event_type.strip().replace("[", "", 1).replace("]", "", 1).lower(),
+        user=issue["user"]["login"],
+        created_at=issue["created_at"],
+        updated_at=issue["updated_at"],
+        closed_at=issue["closed_at"],
+    )
+
+
+async def load_github_event_records(client: RedisDependency) -> RecordIndex:
+    """Loads the API records of the GitHub events, newest first.
+
+    Records are keyed by the negated (created_at score, issue number) so the
+    ascending key order of the index is newest first.
+    """
+    index = record_cache.get("github_events")
+    if index is not None:
+        return index
+
+    async with client.redis.pipeline(transaction=False) as pipe:
+        pipe.get("github_events_sha")
+        pipe.get("github_events")
+        sha, data = await pipe.execute()
+
+    records = []
+    for issue in decode_value(data) or []:
+        try:
+            event = github_event_from_issue(issue)
+        except Exception as err:
+            logger.warning(f"Unable to load a GitHub event due to: {err}")
+            continue
+
+        records.append(
+            (
+                (-event_score(event.created_at), -event.id),
+                {"type": event.type},
+                event.model_dump_json(exclude={"created_at_human_readable"}).encode(
+                    "utf-8"
+                ),
+            )
+        )
+
+    index = RecordIndex(records)
+    if sha and settings.EVENT_CACHE_ENABLED:
+        record_cache.set("github_events", sha.decode("utf-8"), index)
+
+    return index
+
+
+async def load_latest_events(
+    client: RedisDependency, limit: int = 0
+) -> list[GitHubEvent]:
+    """Loads the latest GitHub events from the activity feed written by the worker.
+
+    Args:
+        client:     Redis client.
+        limit:      Amount of events to load, all of the feed when 0.
+    """
+    records = await client.redis.lrange(GITHUB_ACTIVITY_KEY, 0, limit - 1)
+
+    events = []
+    for record in records:
+        event = GitHubEvent.model_validate_json(record)
+        event.created_at_human_readable = make_date_human_readable(event.created_at)
+        events.append(event)
 
-    if limit:
-        if len(events) < limit:
-            return events
-        else:
-            return events[:limit]
     return events
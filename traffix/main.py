@@ -1,15 +1,51 @@
-from fastapi import FastAPI, Request
+from contextlib import asynccontextmanager
+import asyncio
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 import json
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
+from traffix.cache import (
+    cached_response,
+    event_cache,
+    listen_for_invalidations,
+    record_cache,
+)
 from traffix.config import settings
 from traffix.menu import sidebar_menu
-from traffix.dependencies import RedisDep
+from traffix.dependencies import RedisDep, RedisDependency, create_pubsub_client
 from traffix.logic import load_latest_events
+from traffix.metrics import MetricsMiddleware
+from traffix.profiling import ProfilingMiddleware, profiling_enabled
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    redis = RedisDependency(settings.REDIS)
+    await redis.connect()
+    app.state.redis = redis
 
-app = FastAPI()
+    invalidation_listener = pubsub_client = None
+    if settings.EVENT_CACHE_ENABLED:
+        pubsub_client = create_pubsub_client(settings.REDIS)
+        invalidation_listener = asyncio.create_task(
+            listen_for_invalidations(pubsub_client, [event_cache, record_cache])
+        )
+
+    try:
+        yield
+    finally:
+        if invalidation_listener:
+            invalidation_listener.cancel()
+            await pubsub_client.close()
+            await pubsub_client.connection_pool.disconnect()
+        await redis.disconnect()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,6 +54,10 @@ app.add_middleware(
     allow_methods=("POST", "GET", "PATCH", "DELETE", "OPTIONS"),
     allow_headers=settings.CORS_HEADERS,
 )
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
 
 app.mount("/static", StaticFiles(directory="traffix/ui/static"), name="static")
 templates = Jinja2Templates(directory="traffix/ui/templates")
@@ -30,25 +70,45 @@ async def old(request: Request):
 
 @app.get("/")
 async def home(request: Request, redis: RedisDep):
-    top_50_game_releases = await redis.get("top_50_game_release")
-    github_events = await load_latest_events(redis, limit=10)
-
-    context = {
-        "appTopNav": 1,
-        "appSidebarHide": 1,
-        "sidebar_menu": sidebar_menu,
-        "top_50_game_releases": top_50_game_releases[:5]
-        if top_50_game_releases
-        else [],
-        "github_events": github_events,
-    }
-
-    return templates.TemplateResponse(
-        request=request, name="pages/index_new.html", context=context
+    async def render():
+        top_50_game_releases = await redis.get("top_50_game_release")
+        github_events = await load_latest_events(redis, limit=10)
+
+        context = {
+            "appTopNav": 1,
+            "appSidebarHide": 1,
+            "sidebar_menu": sidebar_menu,
+            "top_50_game_releases": top_50_game_releases[:5]
+            if top_50_game_releases
+            else [],
+            "github_events": github_events,
+        }
+
+        return templates.TemplateResponse(
+            request=request, name="pages/index_new.html", context=context
+        )
+
+    # Activity times are rendered relative to now, so only cache them for an hour
+    return await cached_response(
+        request, redis, ["top_50_game_release", "github_events"], render, period=3600
     )
 
 
+@app.get("/health")
+async def health(redis: RedisDep):
+    return {"redis_pool": redis.pool_stats()}
+
+
+if settings.METRICS_ENABLED:
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        return Response(content=generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
 # Views
 from traffix.views.all import router
+from traffix.views.api import router as api_router
 
 app.include_router(router)
+app.include_router(api_router)
@@ -0,0 +1,89 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+HTTP_REQUEST_DURATION = Histogram(
+    "traffix_http_request_duration_seconds",
+    "Time taken to send the full response to a request",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "traffix_http_requests_in_progress", "Requests currently being served"
+)
+
+REDIS_COMMAND_DURATION = Histogram(
+    "traffix_redis_command_duration_seconds",
+    "Round trip time of Redis commands, pipelines are timed as a whole",
+    ["command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0),
+)
+REDIS_PAYLOAD_BYTES = Histogram(
+    "traffix_redis_payload_bytes",
+    "Size of the keys and values sent to and received from Redis",
+    ["command", "direction"],
+    buckets=(64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216),
+)
+REDIS_ERRORS = Counter(
+    "traffix_redis_errors_total", "Redis commands which raised an error", ["command"]
+)
+
+
+def payload_size(value) -> int:
+    """Approximate size in bytes of a Redis command argument or reply."""
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (list, tuple, set)):
+        return sum(payload_size(item) for item in value)
+    if isinstance(value, dict):
+        return sum(
+            payload_size(key) + payload_size(item) for key, item in value.items()
+        )
+    return 0
+
+
+def observe_redis_command(
+    command: str, started: float, sent: int, reply=None, failed: bool = False
+) -> None:
+    REDIS_COMMAND_DURATION.labels(command).observe(time.perf_counter() - started)
+    REDIS_PAYLOAD_BYTES.labels(command, "sent").observe(sent)
+    if failed:
+        REDIS_ERRORS.labels(command).inc()
+    else:
+        REDIS_PAYLOAD_BYTES.labels(command, "received").observe(payload_size(reply))
+
+
+class MetricsMiddleware:
+    """Records the latency of every HTTP request by route template and status.
+
+    Requests which did not match a route, eg. static files, are recorded as "other"
+    so unknown paths do not create new series.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = getattr(scope.get("route"), "path", "other")
+            HTTP_REQUEST_DURATION.labels(scope["method"], route, status).observe(
+                time.perf_counter() - started
+            )
@@ -2,7 +2,7 @@ from datetime import datetime
 from enum import Enum
 from typing import Annotated
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Discriminator, Field, ConfigDict, Tag
 
 
 class EventEnum(str, Enum):
@@ -31,6 +31,38 @@ class EventGameUpdate(BaseEvent):
     source: str
 
 
+def event_type(value: dict | BaseEvent) -> str | None:
+    """Returns the type of a raw or validated event to pick its model."""
+    if isinstance(value, dict):
+        value_type = value.get("type")
+    else:
+        value_type = getattr(value, "type", None)
+
+    return value_type.value if isinstance(value_type, EventEnum) else value_type
+
+
+Event = Annotated[
+    Annotated[EventGameRelease, Tag(EventEnum.game_release.value)]
+    | Annotated[EventGameUpdate, Tag(EventEnum.game_update.value)],
+    Discriminator(event_type),
+]
+
+
+class EventQuery(BaseModel):
+    """Filters of an event query, an event must match every filter given.
+
+    Dates and sizes are inclusive, sizes are in GB. `host` matches the host of the
+    event source with or without "www.", eg. "store.steampowered.com".
+    """
+
+    type: EventEnum | None = None
+    start: datetime | None = None
+    end: datetime | None = None
+    min_size: Annotated[int | None, Field(ge=0)] = None
+    max_size: Annotated[int | None, Field(ge=0)] = None
+    host: str | None = None
+
+
 class GitHubEventUIEnum(str, Enum):
     game_release = "Release"
     game_update = "Update"
@@ -42,6 +74,7 @@ class GitHubEvent(BaseModel):
     type: EventEnum
     user: str
     created_at: datetime
-    created_at_human_readable: str
+    # Relative to now, so it is only filled in when the event is displayed
+    created_at_human_readable: str = ""
     updated_at: datetime | None = None
     closed_at: datetime | None = None
@@ -0,0 +1,88 @@
+from datetime import datetime
+from enum import Enum
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+
+from traffix.models.events import EventEnum
+
+
+class ForecastResolutionEnum(str, Enum):
+    hour = "hour"
+    day = "day"
+
+
+class ForecastCurve(BaseModel):
+    """Shape of the download traffic generated by a single event.
+
+    Traffic ramps up linearly until `peak_hours` after the event, then decays
+    exponentially with a time constant of `decay_hours`. The curve is normalised
+    so an event contributes `uptake * size` GB in total over `horizon_hours`.
+    """
+
+    uptake: Annotated[float, Field(ge=0)] = 1.0
+    peak_hours: Annotated[float, Field(ge=0)] = 2
+    decay_hours: Annotated[float, Field(gt=0)] = 24
+    horizon_hours: Annotated[int, Field(gt=0)] = 24 * 14
+
+
+DEFAULT_FORECAST_CURVES = {
+    EventEnum.game_release: ForecastCurve(
+        uptake=1.0, peak_hours=4, decay_hours=48, horizon_hours=24 * 21
+    ),
+    EventEnum.game_update: ForecastCurve(
+        uptake=1.0, peak_hours=2, decay_hours=12, horizon_hours=24 * 7
+    ),
+}
+
+
+class ForecastPoint(BaseModel):
+    timestamp: datetime
+    value: float
+
+
+class Forecast(BaseModel):
+    resolution: ForecastResolutionEnum
+    unit: str = "GB"
+    points: list[ForecastPoint]
+
+
+class SimulationParams(BaseModel):
+    """Uncertainty sampled by the Monte Carlo simulation.
+
+    Sizes and uptake are scaled by mean-preserving log-normal noise, so `sigma`
+    values of 0 reproduce the point forecast. Events with a `size` of 0 are
+    unknown and use `unknown_size_gb` with `unknown_size_sigma` instead.
+    """
+
+    scenarios: Annotated[int, Field(gt=0, le=10000)] = 2000
+    slip_probability: Annotated[float, Field(ge=0, le=1)] = 0.2
+    max_slip_days: Annotated[int, Field(ge=1, le=90)] = 14
+    size_sigma: Annotated[float, Field(ge=0, le=3)] = 0.15
+    unknown_size_gb: Annotated[float, Field(ge=0, lt=500)] = 40
+    unknown_size_sigma: Annotated[float, Field(ge=0, le=3)] = 0.75
+    uptake_sigma: Annotated[float, Field(ge=0, le=3)] = 0.3
+    seed: int = 0
+
+
+class SimulationPercentiles(BaseModel):
+    p50: float
+    p95: float
+    p99: float
+
+
+class SimulationPoint(SimulationPercentiles):
+    timestamp: datetime
+
+
+class Simulation(BaseModel):
+    """Percentiles across scenarios, `peak` is the busiest hour of the whole range.
+
+    Points are hourly traffic, or the busiest hour of each day at day resolution.
+    """
+
+    resolution: ForecastResolutionEnum
+    unit: str = "GB"
+    params: SimulationParams
+    peak: SimulationPercentiles
+    points: list[SimulationPoint]
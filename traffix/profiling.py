@@ -0,0 +1,226 @@
+import asyncio
+import functools
+import hmac
+import os
+import random
+import re
+import sys
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from time import monotonic, sleep
+from types import CodeType, FrameType
+from typing import Awaitable, Callable
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+from structlog import get_logger
+
+from traffix.config import settings
+
+logger = get_logger()
+
+# Samples are kept this long, so longer runs are only partly profiled
+BUFFER_SECONDS = 300
+PROFILE_HEADER = b"x-traffix-profile"
+
+
+class StackSampler:
+    """Samples the stack of one thread from a background thread.
+
+    The sampler only runs while at least one profile is being captured.
+    """
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: deque[tuple[float, str]] = deque(
+            maxlen=int(BUFFER_SECONDS / interval)
+        )
+        self._active = 0
+        self._lock = threading.Lock()
+        self._wanted = threading.Event()
+        self._labels: dict[CodeType, str] = {}
+        threading.Thread(target=self._run, name="stack-sampler", daemon=True).start()
+
+    def acquire(self) -> None:
+        with self._lock:
+            self._active += 1
+            self._wanted.set()
+
+    def release(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if not self._active:
+                self._wanted.clear()
+
+    def collect(self, start: float, end: float) -> Counter:
+        """Counts the folded stacks sampled between `start` and `end`."""
+        return Counter(stack for at, stack in list(self.samples) if start <= at <= end)
+
+    def _label(self, code: CodeType) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            filename = code.co_filename
+            for prefix in sys.path:
+                if prefix and filename.startswith(prefix):
+                    filename = filename[len(prefix) :].lstrip(os.sep)
+                    break
+            label = f"{code.co_name} ({filename}:{code.co_firstlineno})"
+            self._labels[code] = label
+        return label
+
+    def _fold(self, frame: FrameType | None) -> str:
+        stack = []
+        while frame is not None:
+            stack.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return ";".join(reversed(stack))
+
+    def _run(self) -> None:
+        while self._wanted.wait():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples.append((monotonic(), self._fold(frame)))
+            del frame
+            sleep(self.interval)
+
+
+class Profiler:
+    """Captures statistical profiles of sampled, requested or slow runs.
+
+    Profiles are written as folded stacks, one "frame;frame;frame count" line per
+    stack, which flamegraph.pl and speedscope read directly. Samples are taken from
+    the thread running the event loop, so anything else it ran concurrently, eg.
+    other requests, is part of the profile too.
+
+    Args:
+        kind:               Written into the file name, eg. "request" or "job".
+        sample_rate:        Fraction of runs profiled, every run with `DEBUG_MODE`.
+        slow_threshold:     Runs taking longer than this many seconds are always
+                            profiled, so every run is sampled until it finishes.
+    """
+
+    def __init__(self, kind: str, sample_rate: float, slow_threshold: float | None):
+        self.kind = kind
+        self.sample_rate = 1.0 if settings.DEBUG_MODE else sample_rate
+        self.slow_threshold = slow_threshold
+        self.sampler: StackSampler | None = None
+
+    def start(self, force: bool = False) -> tuple[float, bool] | None:
+        """Starts profiling a run on the current thread.
+
+        Returns the state to pass to `finish`, or None when the run is not profiled.
+        """
+        sampled = force or (self.sample_rate > 0 and random.random() < self.sample_rate)
+        if not sampled and self.slow_threshold is None:
+            return
+
+        if self.sampler is None:
+            self.sampler = StackSampler(
+                threading.get_ident(), settings.PROFILE_INTERVAL
+            )
+        self.sampler.acquire()
+
+        return monotonic(), sampled
+
+    async def finish(self, state: tuple[float, bool], name: str) -> None:
+        """Writes the profile of a run if it was sampled or slow."""
+        started, sampled = state
+        ended = monotonic()
+        self.sampler.release()
+
+        duration = ended - started
+        if not sampled and duration < self.slow_threshold:
+            return
+
+        stacks = self.sampler.collect(started, ended)
+        if stacks:
+            await asyncio.to_thread(self.write, name, duration, stacks)
+
+    def write(self, name: str, duration: float, stacks: Counter) -> None:
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")[:80]
+        path = os.path.join(
+            settings.PROFILE_DIR,
+            f"{datetime.now():%Y%m%dT%H%M%S.%f}-{self.kind}-{slug}-"
+            f"{duration * 1000:.0f}ms.folded",
+        )
+        try:
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            with open(path, "w") as file:
+                for stack, count in stacks.most_common():
+                    file.write(f"{stack} {count}\n")
+        except OSError as err:
+            logger.warning(f"Unable to write profile of '{name}' due to: {err}")
+            return
+
+        logger.info(f"Profiled '{name}' ({duration:.3f}s) to {path}")
+
+
+def profiling_enabled() -> bool:
+    return bool(
+        settings.DEBUG_MODE
+        or settings.PROFILE_SAMPLE_RATE > 0
+        or settings.PROFILE_SLOW_REQUEST_SECONDS is not None
+        or settings.PROFILE_TOKEN
+    )
+
+
+class ProfilingMiddleware:
+    """Profiles sampled and slow requests, and those sending `X-Traffix-Profile`.
+
+    The header must carry `PROFILE_TOKEN`, so only operators can trigger profiles.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.profiler = Profiler(
+            "request",
+            settings.PROFILE_SAMPLE_RATE,
+            settings.PROFILE_SLOW_REQUEST_SECONDS,
+        )
+
+    def requested(self, scope: Scope) -> bool:
+        if not settings.PROFILE_TOKEN:
+            return False
+
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, settings.PROFILE_TOKEN.encode())
+        return False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        state = self.profiler.start(force=self.requested(scope))
+        if state is None:
+            return await self.app(scope, receive, send)
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            route = getattr(scope.get("route"), "path", scope["path"])
+            await self.profiler.finish(state, f"{scope['method']} {route}")
+
+
+def profile_job(job: str) -> Callable:
+    """Profiles sampled and slow runs of a scheduled job."""
+    profiler = Profiler(
+        "job", settings.PROFILE_SAMPLE_RATE, settings.PROFILE_SLOW_JOB_SECONDS
+    )
+
+    def decorator(func: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            state = profiler.start()
+            if state is None:
+                return await func(*args, **kwargs)
+
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                await profiler.finish(state, job)
+
+        return wrapper
+
+    return decorator
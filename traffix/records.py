@@ -0,0 +1,98 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_right
+from heapq import merge
+from typing import Callable, Iterator
+
+import orjson
+
+RecordKey = tuple[int, int]
+
+
+class RecordIndex:
+    """Pre-serialized JSON records sorted by their pagination key.
+
+    Records are serialized once when the index is built, so pages are assembled by
+    joining bytes instead of validating and dumping models on every request.
+
+    Args:
+        records:    (key, fields, body) per record, where `key` is the unique
+                    (score, id) pagination key, `fields` are the attributes
+                    filters check and `body` is the serialized record.
+    """
+
+    def __init__(self, records: list[tuple[RecordKey, dict, bytes]]):
+        records = sorted(records, key=lambda record: record[0])
+        self.keys = [key for key, _, _ in records]
+        self.fields = [fields for _, fields, _ in records]
+        self.bodies = [body for _, _, body in records]
+        self.by_id = {key[1]: body for key, _, body in records}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def scan(
+        self,
+        after: RecordKey,
+        before: int | None = None,
+        predicate: Callable[[dict], bool] | None = None,
+    ) -> Iterator[tuple[RecordKey, bytes]]:
+        """Yields the records with a key greater than `after` in key order.
+
+        Args:
+            after:      Key to start after, found with a binary search.
+            before:     Stop at the first record with a score >= `before`.
+            predicate:  Filter on the fields of each record.
+        """
+        for position in range(bisect_right(self.keys, after), len(self.keys)):
+            key = self.keys[position]
+            if before is not None and key[0] >= before:
+                return
+            if predicate and not predicate(self.fields[position]):
+                continue
+            yield key, self.bodies[position]
+
+
+def encode_cursor(key: RecordKey) -> str:
+    return urlsafe_b64encode(orjson.dumps(key)).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> RecordKey:
+    """Raises `ValueError` if the cursor was not created by `encode_cursor`."""
+    try:
+        score, record_id = orjson.loads(
+            urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        )
+    except Exception as err:
+        raise ValueError("Invalid cursor") from err
+
+    if not isinstance(score, int) or not isinstance(record_id, int):
+        raise ValueError("Invalid cursor")
+
+    return score, record_id
+
+
+def build_page(scans: list[Iterator[tuple[RecordKey, bytes]]], limit: int) -> bytes:
+    """Merges the scans of one or more indexes into a JSON page of `limit` records.
+
+    The page is `{"data": [...], "next_cursor": ...}`, where `next_cursor` is
+    `null` on the last page.
+    """
+    bodies = []
+    next_cursor = None
+    last_key = None
+    for key, body in merge(*scans, key=lambda record: record[0]):
+        if len(bodies) == limit:
+            next_cursor = encode_cursor(last_key)
+            break
+        bodies.append(body)
+        last_key = key
+
+    return b"".join(
+        [
+            b'{"data":[',
+            b",".join(bodies),
+            b'],"next_cursor":',
+            orjson.dumps(next_cursor),
+            b"}",
+        ]
+    )
@@ -0,0 +1,52 @@
+import gzip
+
+import brotli
+from fastapi import Request, Response
+
+from traffix.config import settings
+
+
+def accepted_encodings(request: Request) -> set[str]:
+    """Returns the content codings the client accepts, ignoring `q=0` entries."""
+    encodings = set()
+    for value in request.headers.get("accept-encoding", "").split(","):
+        encoding, _, params = value.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        encodings.add(encoding.strip().lower())
+
+    return encodings
+
+
+def compress_response(request: Request, response: Response) -> Response:
+    """Compresses large responses with brotli or gzip depending on Accept-Encoding.
+
+    Small bodies are sent as is since the framing overhead outweighs the savings.
+    ETags are made weak as the same content may be sent with different encodings.
+    """
+    response.headers["Vary"] = "Accept-Encoding"
+    if response.headers.get("etag", "").startswith('"'):
+        response.headers["etag"] = f"W/{response.headers['etag']}"
+
+    if (
+        response.status_code != 200
+        or len(response.body) < settings.API_COMPRESSION_MIN_SIZE
+        or "content-encoding" in response.headers
+    ):
+        return response
+
+    encodings = accepted_encodings(request)
+    if "br" in encodings:
+        body = brotli.compress(response.body, quality=settings.API_BROTLI_QUALITY)
+        encoding = "br"
+    elif "gzip" in encodings:
+        body = gzip.compress(response.body, compresslevel=settings.API_GZIP_LEVEL)
+        encoding = "gzip"
+    else:
+        return response
+
+    headers = dict(response.headers)
+    headers.pop("content-length", None)
+    headers["Content-Encoding"] = encoding
+
+    return Response(content=body, media_type=response.media_type, headers=headers)
@@ -0,0 +1,367 @@
+import asyncio
+import re
+from bisect import bisect_left, insort
+from collections import Counter
+from datetime import datetime
+from heapq import nsmallest
+
+from structlog import get_logger
+
+from traffix.cache import load_versions
+from traffix.dependencies import RedisDependency
+from traffix.logic import EVENT_KEYS, event_score, load_events, source_host
+from traffix.models.events import EventGameRelease, EventGameUpdate
+
+logger = get_logger()
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+# Prefixes of more terms only expand to the first ones in alphabetical order
+MAX_PREFIX_TERMS = 128
+# Shorter tokens are only matched exactly or by prefix
+MIN_FUZZY_LENGTH = 4
+# Updates changing more events rebuild the sorted lists instead of patching them
+BULK_UPDATE_SIZE = 1000
+
+EMPTY: frozenset[int] = frozenset()
+
+
+def tokenize(text: str) -> list[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+
+def trigrams(term: str) -> set[str]:
+    return {term[start : start + 3] for start in range(len(term) - 2)}
+
+
+def fuzzy_term(term: str) -> bool:
+    """Whether misspellings of `term` are matched, numbers only match exactly."""
+    return len(term) >= 3 and not term.isdigit()
+
+
+def within_distance(a: str, b: str, max_distance: int) -> bool:
+    """Whether the Levenshtein distance between `a` and `b` is at most `max_distance`."""
+    if abs(len(a) - len(b)) > max_distance:
+        return False
+
+    previous = list(range(len(b) + 1))
+    for row, char_a in enumerate(a, 1):
+        current = [row]
+        for column, char_b in enumerate(b, 1):
+            current.append(
+                min(
+                    previous[column] + 1,
+                    current[column - 1] + 1,
+                    previous[column - 1] + (char_a != char_b),
+                )
+            )
+        if min(current) > max_distance:
+            return False
+        previous = current
+
+    return previous[-1] <= max_distance
+
+
+def event_terms(event: EventGameRelease | EventGameUpdate) -> set[str]:
+    """Terms an event is found by, from its name, version and source host."""
+    terms = set(tokenize(event.name))
+    if getattr(event, "version", None):
+        terms.update(tokenize(event.version))
+
+    # Without the top level domain, eg. "com", which nearly every event shares
+    host = source_host(event.source)
+    if host:
+        terms.update(tokenize(host.rsplit(".", 1)[0]))
+
+    return terms
+
+
+def intersect(sets: list[set[int]]) -> set[int]:
+    """Intersects `sets` smallest first, returning the only set as is."""
+    sets = sorted(sets, key=len)
+    result = sets[0]
+    for other in sets[1:]:
+        result = result & other
+    return result
+
+
+class SearchIndex:
+    """In-process full text index over the events of every datastore.
+
+    An inverted index maps each term to the IDs of the events containing it. The
+    sorted terms answer prefix lookups, and the trigrams of each term find the terms
+    within a small edit distance of a misspelt one. Events matching every word
+    exactly are ranked first, then those matching by prefix or approximately, each
+    by how close the event is to now.
+
+    The index is updated per datastore with `update`, which only re-indexes the
+    events that changed since the version previously indexed. Updates run in a
+    thread while holding `lock`, so lookups hold it too.
+    """
+
+    def __init__(self):
+        self.versions: dict[str, str] = {}
+        self.events: dict[int, EventGameRelease | EventGameUpdate] = {}
+        self.lock = asyncio.Lock()
+        self._keys: dict[int, str] = {}
+        self._terms: dict[int, set[str]] = {}
+        self._scores: dict[int, int] = {}
+        self._by_date: list[tuple[int, int]] = []
+        self._postings: dict[str, set[int]] = {}
+        self._sorted_terms: list[str] = []
+        self._trigrams: dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.events)
+
+    def update(
+        self,
+        key: str,
+        version: str,
+        events: list[EventGameRelease | EventGameUpdate],
+    ) -> tuple[int, int]:
+        """Replaces the events of a datastore, re-indexing only those which changed.
+
+        Args:
+            key:        Normalized datastore key, eg. "event_game_releases".
+            version:    Version of the datastore the events were loaded from.
+            events:     Every event of the datastore.
+
+        Returns the amount of events added or changed, and the amount removed.
+        """
+        current = {event.github_issue_id: event for event in events}
+        removed = [
+            event_id
+            for event_id, event_key in self._keys.items()
+            if event_key == key and event_id not in current
+        ]
+        changed = [
+            event
+            for event_id, event in current.items()
+            if self.events.get(event_id) != event
+        ]
+
+        bulk = len(removed) + len(changed) > BULK_UPDATE_SIZE
+        for event_id in removed:
+            self._remove(event_id, bulk)
+        for event in changed:
+            if event.github_issue_id in self.events:
+                self._remove(event.github_issue_id, bulk)
+            self._add(key, event, bulk)
+
+        if bulk:
+            self._by_date = sorted(
+                (score, event_id) for event_id, score in self._scores.items()
+            )
+            self._sorted_terms = sorted(self._postings)
+
+        self.versions[key] = version
+        return len(changed), len(removed)
+
+    def _add(
+        self, key: str, event: EventGameRelease | EventGameUpdate, bulk: bool
+    ) -> None:
+        event_id = event.github_issue_id
+        terms = event_terms(event)
+        score = event_score(event.date)
+
+        self.events[event_id] = event
+        self._keys[event_id] = key
+        self._terms[event_id] = terms
+        self._scores[event_id] = score
+        if not bulk:
+            insort(self._by_date, (score, event_id))
+
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = set()
+                if not bulk:
+                    insort(self._sorted_terms, term)
+                if fuzzy_term(term):
+                    for trigram in trigrams(term):
+                        self._trigrams.setdefault(trigram, set()).add(term)
+            postings.add(event_id)
+
+    def _remove(self, event_id: int, bulk: bool) -> None:
+        del self.events[event_id]
+        del self._keys[event_id]
+        terms = self._terms.pop(event_id)
+        score = self._scores.pop(event_id)
+        if not bulk:
+            del self._by_date[bisect_left(self._by_date, (score, event_id))]
+
+        for term in terms:
+            postings = self._postings[term]
+            postings.discard(event_id)
+            if postings:
+                continue
+
+            del self._postings[term]
+            if not bulk:
+                del self._sorted_terms[bisect_left(self._sorted_terms, term)]
+            if fuzzy_term(term):
+                for trigram in trigrams(term):
+                    similar = self._trigrams[trigram]
+                    similar.discard(term)
+                    if not similar:
+                        del self._trigrams[trigram]
+
+    def _fuzzy_terms(self, token: str) -> list[str]:
+        """Terms within an edit distance of 1, or 2 for tokens over 5 characters."""
+        max_distance = 1 if len(token) <= 5 else 2
+        token_trigrams = trigrams(token)
+
+        shared = Counter()
+        for trigram in token_trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+
+        # Every edit changes at most 3 trigrams
+        min_shared = len(token_trigrams) - 3 * max_distance
+        return [
+            term
+            for term, count in shared.items()
+            if count >= min_shared and within_distance(token, term, max_distance)
+        ]
+
+    def _match(self, token: str, prefix: bool) -> tuple[set[int], set[int]]:
+        """Returns the events matching `token` exactly, and those matching it at all."""
+        exact = self._postings.get(token, EMPTY)
+        matches = [exact] if exact else []
+
+        if prefix:
+            start = bisect_left(self._sorted_terms, token)
+            for term in self._sorted_terms[start : start + MAX_PREFIX_TERMS]:
+                if not term.startswith(token):
+                    break
+                if term != token:
+                    matches.append(self._postings[term])
+
+        if not matches and len(token) >= MIN_FUZZY_LENGTH:
+            matches = [self._postings[term] for term in self._fuzzy_terms(token)]
+
+        if len(matches) == 1:
+            return exact, matches[0]
+        return exact, set().union(*matches)
+
+    def _nearest(
+        self, event_ids: set[int], count: int, now: int, exclude: set[int] = EMPTY
+    ) -> list[int]:
+        """Returns up to `count` of `event_ids` not in `exclude`, closest to now first."""
+        if count <= 0 or not event_ids:
+            return []
+
+        # Few matches are sorted, many are found by walking outwards from now
+        if len(event_ids) ** 2 < count * len(self._by_date):
+            return nsmallest(
+                count,
+                (event_id for event_id in event_ids if event_id not in exclude),
+                key=lambda event_id: abs(self._scores[event_id] - now),
+            )
+
+        by_date = self._by_date
+        after = bisect_left(by_date, (now,))
+        before = after - 1
+
+        nearest = []
+        while len(nearest) < count and (before >= 0 or after < len(by_date)):
+            if after < len(by_date) and (
+                before < 0 or by_date[after][0] - now <= now - by_date[before][0]
+            ):
+                event_id = by_date[after][1]
+                after += 1
+            else:
+                event_id = by_date[before][1]
+                before -= 1
+
+            if event_id in event_ids and event_id not in exclude:
+                nearest.append(event_id)
+
+        return nearest
+
+    def search(
+        self, query: str, limit: int, offset: int = 0
+    ) -> tuple[list[EventGameRelease | EventGameUpdate], int]:
+        """Finds the events matching every word of `query`.
+
+        The last word also matches as a prefix, so results update as a user types,
+        and words without any match are matched approximately.
+
+        Returns the events on the requested page and the total amount of matches.
+        """
+        tokens = tokenize(query)
+        if not tokens:
+            return [], 0
+
+        exact_sets, match_sets = [], []
+        for position, token in enumerate(tokens):
+            exact, matches = self._match(token, prefix=position == len(tokens) - 1)
+            exact_sets.append(exact)
+            match_sets.append(matches)
+
+        exact = intersect(exact_sets)
+        matches = intersect(match_sets)
+
+        now = event_score(datetime.now())
+        count = offset + limit
+        ranked = self._nearest(exact, count, now)
+        ranked += self._nearest(matches, count - len(ranked), now, exclude=exact)
+
+        return [self.events[event_id] for event_id in ranked[offset:]], len(matches)
+
+    def autocomplete(self, prefix: str, limit: int) -> list[dict]:
+        """Suggests the names of the events matching `prefix`, see `search`."""
+        events, _ = self.search(prefix, limit * 4)
+
+        names = set()
+        suggestions = []
+        for event in events:
+            if event.name.casefold() in names:
+                continue
+
+            names.add(event.name.casefold())
+            suggestions.append(
+                {
+                    "name": event.name,
+                    "type": event.type,
+                    "github_issue_id": event.github_issue_id,
+                    "date": event.date.isoformat(),
+                }
+            )
+            if len(suggestions) == limit:
+                break
+
+        return suggestions
+
+
+search_index = SearchIndex()
+
+
+async def load_search_index(client: RedisDependency) -> SearchIndex:
+    """Returns the search index, first updating the datastores whose version changed.
+
+    Updates run in a thread so other requests are served meanwhile, lookups wait
+    for them on `SearchIndex.lock`.
+
+    Args:
+        client:     Redis client.
+    """
+    keys = list(EVENT_KEYS.values())
+    versions = await load_versions(client, keys)
+    if all(search_index.versions.get(key) == versions[key] for key in keys):
+        return search_index
+
+    async with search_index.lock:
+        for key in keys:
+            if search_index.versions.get(key) == versions[key]:
+                continue
+
+            events = await load_events(client, key)
+            changed, removed = await asyncio.to_thread(
+                search_index.update, key, versions[key], events
+            )
+            logger.info(
+                f"Updated the search index of '{key}', {changed} events added or "
+                f"changed and {removed} removed"
+            )
+
+    return search_index
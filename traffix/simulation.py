@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Iterable
+
+import numpy as np
+from structlog import get_logger
+
+from traffix.cache import load_versions
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+from traffix.forecast import (
+    FORECAST_KEYS,
+    HOUR,
+    curve_weights,
+    load_forecast_events,
+    to_hour,
+)
+from traffix.models.events import EventGameRelease, EventGameUpdate
+from traffix.models.forecast import (
+    ForecastCurve,
+    ForecastResolutionEnum,
+    Simulation,
+    SimulationParams,
+    SimulationPercentiles,
+    SimulationPoint,
+)
+
+logger = get_logger()
+
+PERCENTILES = [50, 95, 99]
+
+process_pool: ProcessPoolExecutor | None = None
+# Simulations currently running, so concurrent identical requests share the work
+running: dict[str, asyncio.Task] = {}
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global process_pool
+    if process_pool is None:
+        process_pool = ProcessPoolExecutor(max_workers=settings.SIMULATION_PROCESSES)
+    return process_pool
+
+
+def prepare_events(
+    events: Iterable[EventGameRelease | EventGameUpdate],
+    start_hour: np.datetime64,
+    total_hours: int,
+    curves: dict[str, ForecastCurve],
+    params: SimulationParams,
+) -> list[dict]:
+    """Converts the events of each type into the arrays sampled by `simulate_batch`.
+
+    Offsets are hours relative to `horizon` hours before `start_hour`. Events up to
+    `max_slip_days` before that are kept because they may slip into the range.
+    """
+    events_by_type: dict[str, list] = {}
+    for event in events:
+        events_by_type.setdefault(event.type, []).append(event)
+
+    groups = []
+    for event_type, type_events in events_by_type.items():
+        curve = curves.get(event_type)
+        if not curve:
+            continue
+
+        weights = curve_weights(curve)
+        horizon = len(weights)
+        offsets = (
+            np.array(
+                [to_hour(event.date) for event in type_events], dtype="datetime64[h]"
+            )
+            - (start_hour - horizon * HOUR)
+        ) / HOUR
+        offsets = offsets.astype(np.int64)
+        sizes = np.array([event.size for event in type_events], dtype=np.float64)
+
+        in_range = (offsets >= -params.max_slip_days * 24) & (
+            offsets < total_hours + horizon
+        )
+        if not in_range.any():
+            continue
+
+        groups.append(
+            {
+                "weights": weights,
+                "uptake": curve.uptake,
+                "offsets": offsets[in_range],
+                "sizes": sizes[in_range],
+            }
+        )
+
+    return groups
+
+
+def lognormal_noise(
+    rng: np.random.Generator, sigma: float | np.ndarray, size: tuple[int, int]
+) -> np.ndarray:
+    """Log-normal multipliers with a mean of 1."""
+    return rng.lognormal(-np.square(sigma) / 2, sigma, size=size)
+
+
+def simulate_batch(
+    groups: list[dict],
+    total_hours: int,
+    params: SimulationParams,
+    resolution: ForecastResolutionEnum,
+    scenarios: int,
+    seed: np.random.SeedSequence,
+) -> np.ndarray:
+    """Simulates a batch of scenarios, returning one row of traffic per scenario.
+
+    Every scenario samples a slip, size and uptake per event, the resulting
+    impulses are convolved with the curve of the event type through an FFT.
+    """
+    rng = np.random.default_rng(seed)
+    series = np.zeros((scenarios, total_hours), dtype=np.float64)
+
+    for group in groups:
+        weights = group["weights"]
+        horizon = len(weights)
+        length = total_hours + horizon
+        shape = (scenarios, len(group["offsets"]))
+
+        slipped = rng.random(shape) < params.slip_probability
+        slip_days = rng.integers(1, params.max_slip_days + 1, size=shape)
+        offsets = group["offsets"] + slip_days * 24 * slipped
+
+        unknown = group["sizes"] == 0
+        sizes = np.where(unknown, params.unknown_size_gb, group["sizes"])
+        sigma = np.where(unknown, params.unknown_size_sigma, params.size_sigma)
+        traffic = (
+            sizes
+            * lognormal_noise(rng, sigma, shape)
+            * group["uptake"]
+            * lognormal_noise(rng, params.uptake_sigma, shape)
+        )
+
+        # One bincount for the whole batch by offsetting each scenario by its row
+        in_range = (offsets >= 0) & (offsets < length)
+        rows = np.broadcast_to(np.arange(scenarios)[:, None], shape)
+        impulses = np.bincount(
+            (rows * length + offsets)[in_range],
+            weights=traffic[in_range],
+            minlength=scenarios * length,
+        ).reshape(scenarios, length)
+
+        fft_size = 1 << (length + horizon - 2).bit_length()
+        convolved = np.fft.irfft(
+            np.fft.rfft(impulses, fft_size, axis=1) * np.fft.rfft(weights, fft_size),
+            fft_size,
+            axis=1,
+        )
+        series += convolved[:, horizon:length]
+
+    if resolution == ForecastResolutionEnum.day:
+        days = -(-total_hours // 24)
+        padded = np.zeros((scenarios, days * 24), dtype=np.float64)
+        padded[:, :total_hours] = series
+        return padded.reshape(scenarios, days, 24).max(axis=2).astype(np.float32)
+
+    return series.astype(np.float32)
+
+
+def simulate(
+    events: Iterable[EventGameRelease | EventGameUpdate],
+    start: datetime,
+    end: datetime,
+    resolution: ForecastResolutionEnum,
+    params: SimulationParams,
+    curves: dict[str, ForecastCurve] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Runs `params.scenarios` scenarios of the forecast for [start, end).
+
+    Scenarios are simulated in batches of `SIMULATION_BATCH_SIZE`, across a
+    process pool when `SIMULATION_PROCESSES` is set. Each batch has its own seed
+    derived from `params.seed` so results don't depend on how batches are run.
+
+    Returns:
+        The percentiles of each point and of the peak hour across scenarios.
+    """
+    start_hour = to_hour(start)
+    total_hours = max(int((to_hour(end) - start_hour) / HOUR), 0)
+    groups = prepare_events(
+        events, start_hour, total_hours, curves or settings.FORECAST_CURVES, params
+    )
+
+    batch_sizes = [
+        min(settings.SIMULATION_BATCH_SIZE, params.scenarios - offset)
+        for offset in range(0, params.scenarios, settings.SIMULATION_BATCH_SIZE)
+    ]
+    seeds = np.random.SeedSequence(params.seed).spawn(len(batch_sizes))
+    run_batch = partial(simulate_batch, groups, total_hours, params, resolution)
+
+    if settings.SIMULATION_PROCESSES > 1 and len(batch_sizes) > 1:
+        batches = list(get_process_pool().map(run_batch, batch_sizes, seeds))
+    else:
+        batches = list(map(run_batch, batch_sizes, seeds))
+
+    results = np.concatenate(batches)
+    points = np.percentile(results, PERCENTILES, axis=0)
+    peak = np.percentile(results.max(axis=1, initial=0), PERCENTILES)
+    return points, peak
+
+
+def simulation_key(
+    versions: dict[str, str],
+    start: datetime,
+    end: datetime,
+    resolution: ForecastResolutionEnum,
+    params: SimulationParams,
+) -> str:
+    digest = hashlib.sha1(
+        json.dumps(
+            {
+                "versions": versions,
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "resolution": resolution.value,
+                "params": params.model_dump(),
+                "curves": {
+                    key: curve.model_dump()
+                    for key, curve in settings.FORECAST_CURVES.items()
+                },
+            },
+            sort_keys=True,
+        ).encode("utf-8")
+    ).hexdigest()
+    return f"simulation:{digest}"
+
+
+async def run_simulation(
+    client: RedisDependency,
+    cache_key: str,
+    start: datetime,
+    end: datetime,
+    resolution: ForecastResolutionEnum,
+    params: SimulationParams,
+) -> Simulation:
+    events = await load_forecast_events(client)
+    points, peak = await asyncio.to_thread(
+        simulate, events, start, end, resolution, params
+    )
+
+    step = HOUR * (24 if resolution == ForecastResolutionEnum.day else 1)
+    simulation = Simulation(
+        resolution=resolution,
+        params=params,
+        peak=SimulationPercentiles(
+            **{f"p{p}": round(float(v), 3) for p, v in zip(PERCENTILES, peak)}
+        ),
+        points=[
+            SimulationPoint(
+                timestamp=start + (step * index).item(),
+                **{
+                    f"p{p}": round(float(v), 3)
+                    for p, v in zip(PERCENTILES, points[:, index])
+                },
+            )
+            for index in range(points.shape[1])
+        ],
+    )
+
+    await client.redis.set(
+        cache_key, simulation.model_dump_json(), ex=settings.SIMULATION_CACHE_TTL
+    )
+    return simulation
+
+
+async def load_simulation(
+    client: RedisDependency,
+    start: datetime,
+    end: datetime,
+    resolution: ForecastResolutionEnum,
+    params: SimulationParams,
+) -> Simulation:
+    """Returns the simulation for the current datastores, simulating on a cache miss.
+
+    Args:
+        client:         Redis client.
+        start:          First hour of the simulation.
+        end:            End of the simulation (exclusive).
+        resolution:     Hourly points, or the peak hour of each day.
+        params:         Uncertainty to sample.
+    """
+    versions = await load_versions(client, FORECAST_KEYS)
+    cache_key = simulation_key(versions, start, end, resolution, params)
+
+    cached = await client.get(cache_key)
+    if cached:
+        return Simulation.model_validate(cached)
+
+    if cache_key not in running:
+        logger.info(f"Simulating {params.scenarios} scenarios for {cache_key}")
+        running[cache_key] = asyncio.create_task(
+            run_simulation(client, cache_key, start, end, resolution, params)
+        )
+        running[cache_key].add_done_callback(lambda _: running.pop(cache_key, None))
+
+    return await asyncio.shield(running[cache_key])
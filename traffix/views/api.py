@@ -0,0 +1,411 @@
+from datetime import datetime, time, timedelta
+from email.utils import formatdate
+from typing import Annotated, Callable
+
+import orjson
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
+from structlog import get_logger
+
+from traffix.cache import (
+    cached_response,
+    etag_matches,
+    load_versions,
+    make_etag,
+    not_modified_since,
+)
+from traffix.config import settings
+from traffix.dependencies import RedisDep, get_api_token, verify_ingest_token
+from traffix.export import EXPORT_MEDIA_TYPES, export_csv, export_ndjson
+from traffix.forecast import load_forecast, resample, to_naive_utc
+from traffix.ingest import queue_pending_events, validate_batch
+from traffix.logic import (
+    EVENT_KEYS,
+    event_score,
+    load_event_records,
+    load_github_event_records,
+)
+from traffix.models.events import EventEnum
+from traffix.models.export import ExportFormatEnum
+from traffix.models.forecast import (
+    Forecast,
+    ForecastResolutionEnum,
+    Simulation,
+    SimulationParams,
+)
+from traffix.records import RecordKey, build_page, decode_cursor
+from traffix.responses import compress_response
+from traffix.search import load_search_index
+from traffix.simulation import load_simulation
+from traffix.webhooks import (
+    parse_payload,
+    queue_syncs,
+    record_delivery,
+    sync_targets,
+    verify_signature,
+)
+
+logger = get_logger()
+
+router = APIRouter(prefix="/api/v1", tags=["api"])
+
+MIN_SCORE = -(2**63)
+
+
+def forecast_range(
+    from_: datetime | None,
+    to: datetime | None,
+    resolution: ForecastResolutionEnum,
+    max_days: int,
+) -> tuple[datetime, datetime]:
+    """Returns the [start, end) range requested, defaulting to the next 30 days."""
+    start = from_ or datetime.combine(datetime.today().date(), time.min)
+    if resolution == ForecastResolutionEnum.day:
+        start = datetime.combine(start.date(), time.min, tzinfo=start.tzinfo)
+    end = to or start + timedelta(days=30)
+
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+    if end - start > timedelta(days=max_days):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Forecasts are limited to {max_days} days",
+        )
+
+    return start, end
+
+
+def align_bound(
+    value: datetime | None, resolution: ForecastResolutionEnum, ceil: bool = False
+) -> datetime | None:
+    """Moves a bound onto the hours, or days, of `resolution` in naive UTC."""
+    if value is None:
+        return None
+
+    if resolution == ForecastResolutionEnum.day:
+        step = timedelta(days=1)
+    else:
+        step = timedelta(hours=1)
+    value = to_naive_utc(value)
+    aligned = datetime.min + (value - datetime.min) // step * step
+    return aligned + step if ceil and aligned < value else aligned
+
+
+@router.get("/forecast", response_model=Forecast)
+async def get_forecast(
+    redis: RedisDep,
+    from_: Annotated[datetime | None, Query(alias="from")] = None,
+    to: datetime | None = None,
+    resolution: ForecastResolutionEnum = ForecastResolutionEnum.hour,
+):
+    start, end = forecast_range(from_, to, resolution, settings.FORECAST_MAX_DAYS)
+    series = await load_forecast(redis, start, end)
+    return Forecast(resolution=resolution, points=resample(series, start, resolution))
+
+
+@router.get("/forecast/simulation", response_model=Simulation)
+async def get_forecast_simulation(
+    redis: RedisDep,
+    params: Annotated[SimulationParams, Depends()],
+    token: Annotated[str | None, Depends(get_api_token)],
+    from_: Annotated[datetime | None, Query(alias="from")] = None,
+    to: datetime | None = None,
+    resolution: ForecastResolutionEnum = ForecastResolutionEnum.day,
+):
+    """Simulates the forecast, custom params and seeds require an API token.
+
+    Each distinct range and params is simulated on a cache miss, so anonymous
+    callers are limited to the default params over `SIMULATION_PUBLIC_MAX_DAYS`,
+    with `from` and `to` widened to whole hours or days.
+    """
+    max_days = settings.SIMULATION_MAX_DAYS
+    if not token:
+        if params != SimulationParams():
+            raise HTTPException(
+                status_code=401,
+                detail="Simulation params other than the defaults require an API token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        max_days = settings.SIMULATION_PUBLIC_MAX_DAYS
+        from_ = align_bound(from_, resolution)
+        to = align_bound(to, resolution, ceil=True)
+
+    start, end = forecast_range(from_, to, resolution, max_days)
+    return await load_simulation(redis, start, end, resolution, params)
+
+
+def parse_cursor(cursor: str | None) -> RecordKey | None:
+    if not cursor:
+        return
+    try:
+        return decode_cursor(cursor)
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+
+def size_predicate(
+    min_size: int | None, max_size: int | None
+) -> Callable[[dict], bool] | None:
+    """Returns a filter on the size of records, `None` without any size bound."""
+    if min_size is None and max_size is None:
+        return None
+
+    def predicate(fields: dict) -> bool:
+        return (min_size is None or fields["size"] >= min_size) and (
+            max_size is None or fields["size"] <= max_size
+        )
+
+    return predicate
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+@router.get("/events")
+async def get_events(
+    request: Request,
+    redis: RedisDep,
+    type: EventEnum | None = None,
+    from_: Annotated[datetime | None, Query(alias="from")] = None,
+    to: datetime | None = None,
+    min_size: Annotated[int | None, Query(ge=0)] = None,
+    max_size: Annotated[int | None, Query(ge=0)] = None,
+    limit: Annotated[
+        int, Query(gt=0, le=settings.API_MAX_PAGE_SIZE)
+    ] = settings.API_PAGE_SIZE,
+    cursor: str | None = None,
+):
+    """Events of every datastore sorted by date, paginated with `next_cursor`."""
+    keys = [EVENT_KEYS[type]] if type else list(EVENT_KEYS.values())
+
+    # Keys are (date score, event ID) and event IDs are positive
+    after = max(
+        parse_cursor(cursor) or (MIN_SCORE, 0),
+        (event_score(from_), -1) if from_ else (MIN_SCORE, 0),
+    )
+    before = event_score(to) if to else None
+
+    predicate = size_predicate(min_size, max_size)
+
+    async def render():
+        scans = [
+            (await load_event_records(redis, key)).scan(after, before, predicate)
+            for key in keys
+        ]
+        return json_response(build_page(scans, limit))
+
+    return compress_response(
+        request, await cached_response(request, redis, keys, render)
+    )
+
+
+@router.post("/events:batch", dependencies=[Depends(verify_ingest_token)])
+async def create_events_batch(request: Request, redis: RedisDep):
+    """Queues a JSON array of events for approval, reporting invalid items by index.
+
+    Responds with a 202 when any event was queued, otherwise a 422.
+    """
+    try:
+        events, errors = validate_batch(await request.body())
+    except ValidationError as err:
+        raise RequestValidationError(err.errors(include_url=False))
+
+    if events:
+        await queue_pending_events(redis, events)
+    logger.info(f"Queued {len(events)} pending events, rejected {len(errors)}")
+
+    return JSONResponse(
+        status_code=202 if events else 422,
+        content={"accepted": len(events), "rejected": len(errors), "errors": errors},
+    )
+
+
+@router.post("/webhooks/github")
+async def receive_github_webhook(
+    request: Request,
+    redis: RedisDep,
+    x_github_event: Annotated[str, Header()],
+    x_github_delivery: Annotated[str | None, Header()] = None,
+    x_hub_signature_256: Annotated[str | None, Header()] = None,
+):
+    """Queues resyncs of the datastore files and issues a GitHub delivery changed.
+
+    Deliveries are verified against `GITHUB_WEBHOOK_SECRET`, and the worker runs
+    the resyncs once no more deliveries arrive for them, or once they waited
+    `GITHUB_WEBHOOK_MAX_WAIT`, see `queue_syncs`.
+    Responds with a 202 and the resyncs queued.
+    """
+    body = await request.body()
+    if not verify_signature(body, x_hub_signature_256):
+        raise HTTPException(status_code=401, detail="Invalid webhook signature")
+
+    try:
+        payload = parse_payload(body, request.headers.get("content-type"))
+    except ValueError as err:
+        raise HTTPException(status_code=400, detail=str(err))
+
+    if settings.GITHUB_WEBHOOK_RECORD_DIR:
+        record_delivery(
+            settings.GITHUB_WEBHOOK_RECORD_DIR,
+            x_github_event,
+            x_github_delivery,
+            payload,
+        )
+
+    targets = sync_targets(x_github_event, payload)
+    if targets:
+        await queue_syncs(redis, targets)
+    logger.info(
+        f"Received GitHub '{x_github_event}' delivery {x_github_delivery}, "
+        f"queued resyncs: {targets}"
+    )
+
+    return JSONResponse(status_code=202, content={"queued": targets})
+
+
+@router.get("/events/{event_id}")
+async def get_event(request: Request, redis: RedisDep, event_id: int):
+    async def render():
+        for key in EVENT_KEYS.values():
+            body = (await load_event_records(redis, key)).by_id.get(event_id)
+            if body:
+                return json_response(body)
+
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    return compress_response(
+        request,
+        await cached_response(request, redis, list(EVENT_KEYS.values()), render),
+    )
+
+
+@router.get("/search")
+async def search_events(
+    request: Request,
+    redis: RedisDep,
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[
+        int, Query(gt=0, le=settings.SEARCH_MAX_PAGE_SIZE)
+    ] = settings.SEARCH_PAGE_SIZE,
+    offset: Annotated[int, Query(ge=0)] = 0,
+):
+    """Events matching every word of `q` by name, version or source host.
+
+    The last word also matches as a prefix and misspelt words match approximately.
+    Events are sorted by how close they are to now, exact matches first.
+    """
+
+    async def render():
+        index = await load_search_index(redis)
+        async with index.lock:
+            events, total = index.search(q, limit, offset)
+        return json_response(
+            b"".join(
+                [
+                    b'{"data":[',
+                    b",".join(
+                        event.model_dump_json().encode("utf-8") for event in events
+                    ),
+                    b'],"total":',
+                    orjson.dumps(total),
+                    b"}",
+                ]
+            )
+        )
+
+    return compress_response(
+        request,
+        await cached_response(request, redis, list(EVENT_KEYS.values()), render),
+    )
+
+
+@router.get("/search/autocomplete")
+async def autocomplete_events(
+    request: Request,
+    redis: RedisDep,
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[
+        int, Query(gt=0, le=settings.SEARCH_MAX_PAGE_SIZE)
+    ] = settings.SEARCH_AUTOCOMPLETE_SIZE,
+):
+    """Names of the events matching `q` as it is typed, see `/search`."""
+
+    async def render():
+        index = await load_search_index(redis)
+        async with index.lock:
+            suggestions = index.autocomplete(q, limit)
+        return json_response(orjson.dumps({"data": suggestions}))
+
+    return compress_response(
+        request,
+        await cached_response(request, redis, list(EVENT_KEYS.values()), render),
+    )
+
+
+@router.get("/github_events")
+async def get_github_events(
+    request: Request,
+    redis: RedisDep,
+    type: EventEnum | None = None,
+    limit: Annotated[
+        int, Query(gt=0, le=settings.API_MAX_PAGE_SIZE)
+    ] = settings.API_PAGE_SIZE,
+    cursor: str | None = None,
+):
+    """Event submissions on GitHub, newest first, paginated with `next_cursor`."""
+    after = parse_cursor(cursor) or (MIN_SCORE, MIN_SCORE)
+    predicate = (lambda fields: fields["type"] == type) if type else None
+
+    async def render():
+        index = await load_github_event_records(redis)
+        return json_response(build_page([index.scan(after, None, predicate)], limit))
+
+    return compress_response(
+        request, await cached_response(request, redis, ["github_events"], render)
+    )
+
+
+@router.get("/export")
+async def export_events(
+    request: Request,
+    redis: RedisDep,
+    format: ExportFormatEnum = ExportFormatEnum.ndjson,
+    type: EventEnum | None = None,
+):
+    """Streams every event as NDJSON or CSV, reading them from Redis in chunks."""
+    keys = [EVENT_KEYS[type]] if type else list(EVENT_KEYS.values())
+
+    versions = await load_versions(redis, keys)
+    synced_at = await redis.redis.mget([f"{key}_synced_at" for key in keys])
+    last_modified = max([int(timestamp) for timestamp in synced_at if timestamp] or [0])
+
+    headers = {
+        "ETag": make_etag(request, versions),
+        "Cache-Control": f"public, max-age={settings.PAGE_CACHE_MAX_AGE}",
+    }
+    if last_modified:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+
+    if etag_matches(request, headers["ETag"]) or (
+        last_modified and not_modified_since(request, last_modified)
+    ):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = (
+        f'attachment; filename="traffix-events.{format.value}"'
+    )
+    export = export_csv if format == ExportFormatEnum.csv else export_ndjson
+    return StreamingResponse(
+        export(redis, keys), media_type=EXPORT_MEDIA_TYPES[format], headers=headers
+    )
@@ -0,0 +1,177 @@
+import hashlib
+import hmac
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import parse_qs
+
+import orjson
+from structlog import get_logger
+
+from traffix.config import settings
+from traffix.dependencies import RedisDependency
+from traffix.models.events import EventEnum
+
+logger = get_logger()
+
+# Sorted set of resync targets, scored by the Unix time they are due
+WEBHOOK_QUEUE_KEY = "github_webhook_syncs"
+# Hash of each queued target to the Unix time of its first delivery
+WEBHOOK_FIRST_DELIVERY_KEY = "github_webhook_syncs_first_delivery"
+
+# Targets are "datastore:<YAML file>" or "issue:<issue ID>:<issue number>"
+DATASTORE_TARGET = "datastore:"
+ISSUE_TARGET = "issue:"
+
+# Issue labels the worker syncs, eg. "event_game_release"
+ISSUE_LABELS = {f"event_{event_type.value}" for event_type in EventEnum}
+
+
+def sign_payload(body: bytes, secret: str) -> str:
+    """Returns the X-Hub-Signature-256 header GitHub sends with `body`."""
+    digest = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(body: bytes, signature: str | None) -> bool:
+    """Checks the signature of a delivery, always failing without a secret set."""
+    if not settings.GITHUB_WEBHOOK_SECRET or not signature:
+        return False
+
+    expected = sign_payload(body, settings.GITHUB_WEBHOOK_SECRET)
+    return hmac.compare_digest(expected.encode("utf-8"), signature.encode("utf-8"))
+
+
+def parse_payload(body: bytes, content_type: str | None) -> dict:
+    """Parses a delivery sent as JSON or form encoded, depending on the webhook.
+
+    Raises `ValueError` if the body is not a JSON object.
+    """
+    if content_type and content_type.startswith("application/x-www-form-urlencoded"):
+        body = parse_qs(body.decode("utf-8")).get("payload", ["null"])[0]
+
+    payload = orjson.loads(body)
+    if not isinstance(payload, dict):
+        raise ValueError("Webhook payload must be a JSON object")
+    return payload
+
+
+def datastore_file(path: str) -> str | None:
+    """Returns the YAML file of the datastore a repository path belongs to.
+
+    Both the single file, eg. "datastore/event_game_releases.yml", and its monthly
+    shards, eg. "datastore/event_game_releases/2024-08.yml", map to the datastore.
+    """
+    for yaml_file in [
+        settings.EVENT_GAME_RELEASES_YAML,
+        settings.EVENT_GAME_UPDATES_YAML,
+    ]:
+        shard_directory = yaml_file.rsplit(".", 1)[0]
+        if path == f"datastore/{yaml_file}" or path.startswith(
+            f"datastore/{shard_directory}/"
+        ):
+            return yaml_file
+
+
+def sync_targets(event: str, payload: dict) -> list[str]:
+    """Returns the resyncs a delivery calls for.
+
+    Pushes to the default branch resync the datastores whose files changed, and
+    issue events resync the issue when it has, or just lost, an event label.
+    Deliveries of any other event or repository call for none.
+
+    Args:
+        event:      Value of the X-GitHub-Event header, eg. "push".
+        payload:    Parsed body of the delivery.
+    """
+    repository = payload.get("repository") or {}
+    if repository.get("full_name", "").lower() != settings.GITHUB_REPO.lower():
+        return []
+
+    targets = []
+    if event == "push":
+        if payload.get("ref") != f"refs/heads/{repository.get('default_branch')}":
+            return []
+
+        # A force push may revert files without listing them in any commit
+        if payload.get("forced"):
+            files = [
+                settings.EVENT_GAME_RELEASES_YAML,
+                settings.EVENT_GAME_UPDATES_YAML,
+            ]
+        else:
+            files = [
+                datastore_file(path)
+                for commit in payload.get("commits") or []
+                for change in ["added", "modified", "removed"]
+                for path in commit.get(change) or []
+            ]
+
+        for yaml_file in files:
+            if yaml_file and f"{DATASTORE_TARGET}{yaml_file}" not in targets:
+                targets.append(f"{DATASTORE_TARGET}{yaml_file}")
+
+    elif event == "issues":
+        issue = payload.get("issue") or {}
+        labels = {label["name"] for label in issue.get("labels") or []}
+        # An "unlabeled" action carries the label removed from the issue
+        if payload.get("label"):
+            labels.add(payload["label"]["name"])
+
+        if issue.get("id") and labels & ISSUE_LABELS:
+            targets.append(f"{ISSUE_TARGET}{issue['id']}:{issue['number']}")
+
+    return targets
+
+
+async def queue_syncs(client: RedisDependency, targets: list[str]) -> None:
+    """Queues resyncs due once no deliveries arrived for `GITHUB_WEBHOOK_DEBOUNCE`.
+
+    Every delivery for a queued target pushes its due time back, so a burst of
+    deliveries changing the same file or issue is coalesced into one resync. A
+    resync is never delayed over `GITHUB_WEBHOOK_MAX_WAIT` past its first delivery,
+    so a steady stream of deliveries does not hold it back forever.
+    """
+    now = time.time()
+    first_deliveries = await client.redis.hmget(WEBHOOK_FIRST_DELIVERY_KEY, targets)
+
+    due = {}
+    for target, first_delivery in zip(targets, first_deliveries):
+        first_delivery = float(first_delivery) if first_delivery else now
+        due[target] = min(
+            now + settings.GITHUB_WEBHOOK_DEBOUNCE,
+            first_delivery + settings.GITHUB_WEBHOOK_MAX_WAIT,
+        )
+
+    async with client.redis.pipeline(transaction=True) as pipe:
+        for target in targets:
+            pipe.hsetnx(WEBHOOK_FIRST_DELIVERY_KEY, target, now)
+        pipe.zadd(WEBHOOK_QUEUE_KEY, due)
+        await pipe.execute()
+
+
+def record_delivery(
+    directory: str, event: str, delivery: str | None, payload: dict
+) -> Path:
+    """Saves a verified delivery to replay later, eg. with benchmarks/webhook_replay.py.
+
+    Args:
+        directory:  Directory to write the delivery into, created if missing.
+        event:      Value of the X-GitHub-Event header.
+        delivery:   Value of the X-GitHub-Delivery header.
+        payload:    Parsed body of the delivery.
+
+    Returns the path written.
+    """
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{event}-{delivery or 'unknown'}.json"
+    path = path / name
+    path.write_bytes(
+        orjson.dumps(
+            {"event": event, "delivery": delivery, "payload": payload},
+            option=orjson.OPT_INDENT_2,
+        )
+    )
+    return path
@@ -0,0 +1,118 @@
+import functools
+import time
+from typing import Awaitable, Callable
+
+import aiohttp
+from apscheduler.events import EVENT_JOB_MAX_INSTANCES, EVENT_JOB_MISSED, JobEvent
+from apscheduler.schedulers.base import BaseScheduler
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from structlog import get_logger
+
+logger = get_logger()
+
+JOB_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+JOB_DURATION = Histogram(
+    "traffix_job_duration_seconds",
+    "Duration of a scheduled job run",
+    ["job"],
+    buckets=JOB_BUCKETS,
+)
+JOB_STAGE_DURATION = Histogram(
+    "traffix_job_stage_duration_seconds",
+    "Duration of a stage of a scheduled job run",
+    ["job", "stage"],
+    buckets=JOB_BUCKETS,
+)
+JOB_RUNNING = Gauge(
+    "traffix_job_running", "Runs of a scheduled job in progress", ["job"]
+)
+JOB_FAILURES = Counter(
+    "traffix_job_failures_total", "Scheduled job runs which raised an error", ["job"]
+)
+JOB_SKIPPED = Counter(
+    "traffix_job_skipped_total",
+    "Scheduled job runs skipped because the previous run overlapped or was late",
+    ["job", "reason"],
+)
+JOB_LAST_SUCCESS = Gauge(
+    "traffix_job_last_success_timestamp_seconds",
+    "Unix time the scheduled job last completed successfully",
+    ["job"],
+)
+
+GITHUB_RATE_LIMIT_REMAINING = Gauge(
+    "traffix_github_rate_limit_remaining",
+    "Requests left in the current GitHub API rate limit window",
+    ["resource"],
+)
+GITHUB_FETCHED_BYTES = Counter(
+    "traffix_github_fetched_bytes_total",
+    "Bytes of response bodies fetched from GitHub",
+    ["host"],
+)
+NOTIFIER_MESSAGES = Counter(
+    "traffix_notifier_messages_total",
+    "Messages sent to a notification sink by outcome",
+    ["notifier", "outcome"],
+)
+
+
+def instrument_job(job: str) -> Callable:
+    """Records the duration, outcome and concurrent runs of a scheduled job."""
+
+    def decorator(func: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            JOB_RUNNING.labels(job).inc()
+            started = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                JOB_FAILURES.labels(job).inc()
+                raise
+            finally:
+                JOB_RUNNING.labels(job).dec()
+                JOB_DURATION.labels(job).observe(time.perf_counter() - started)
+
+            JOB_LAST_SUCCESS.labels(job).set_to_current_time()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def count_skipped_runs(scheduler: BaseScheduler) -> None:
+    """Counts runs APScheduler skipped, eg. because the previous run still overlaps."""
+    reasons = {EVENT_JOB_MAX_INSTANCES: "overlap", EVENT_JOB_MISSED: "missed"}
+
+    def listener(event: JobEvent) -> None:
+        JOB_SKIPPED.labels(event.job_id, reasons[event.code]).inc()
+
+    scheduler.add_listener(listener, EVENT_JOB_MAX_INSTANCES | EVENT_JOB_MISSED)
+
+
+def github_trace_config() -> aiohttp.TraceConfig:
+    """Records the GitHub rate limit and bytes fetched by a session."""
+
+    async def on_request_end(session, context, params: aiohttp.TraceRequestEndParams):
+        remaining = params.response.headers.get("X-RateLimit-Remaining")
+        if remaining is not None:
+            resource = params.response.headers.get("X-RateLimit-Resource", "core")
+            GITHUB_RATE_LIMIT_REMAINING.labels(resource).set(int(remaining))
+
+    async def on_response_chunk_received(
+        session, context, params: aiohttp.TraceResponseChunkReceivedParams
+    ):
+        GITHUB_FETCHED_BYTES.labels(params.url.host).inc(len(params.chunk))
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_end.append(on_request_end)
+    trace_config.on_response_chunk_received.append(on_response_chunk_received)
+    return trace_config
+
+
+def start_metrics_server(port: int) -> None:
+    start_http_server(port)
+    logger.info(f"Serving metrics on port {port}")
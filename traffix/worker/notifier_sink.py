@@ -0,0 +1,69 @@
+"""Local stand-in for the Slack and Discord webhooks to try notifiers against.
+
+Messages are validated against the limits of each sink and logged instead of being
+delivered. Failures can be injected to exercise retries, eg:
+
+    python traffix/worker/notifier_sink.py --port 8080 --fail-every 3
+    SLACK_WEBHOOK=http://localhost:8080/slack DISCORD_WEBHOOK=http://localhost:8080/discord \\
+        python traffix/worker/slack_notifier.py
+"""
+
+import argparse
+import json
+from itertools import count
+
+from aiohttp import web
+from structlog import get_logger
+
+logger = get_logger()
+
+LIMITS = {"slack": ("blocks", 50), "discord": ("embeds", 10)}
+
+
+def create_app(fail_every: int = 0, retry_after: int = 1) -> web.Application:
+    """Creates the sink, rejecting every `fail_every`th message with a 429."""
+    requests = count(1)
+    app = web.Application()
+    app["messages"] = []
+
+    async def receive(request: web.Request) -> web.Response:
+        sink = request.match_info["sink"]
+        if sink not in LIMITS:
+            return web.Response(status=404, text="unknown_sink")
+
+        if fail_every and next(requests) % fail_every == 0:
+            logger.info(f"Rate limiting a {sink} message")
+            return web.Response(
+                status=429,
+                text="rate_limited",
+                headers={"Retry-After": str(retry_after)},
+            )
+
+        try:
+            message = await request.json()
+        except json.JSONDecodeError:
+            return web.Response(status=400, text="invalid_payload")
+
+        field, limit = LIMITS[sink]
+        if not message.get(field) or len(message[field]) > limit:
+            logger.warning(
+                f"Rejecting a {sink} message with {len(message.get(field) or [])} {field}"
+            )
+            return web.Response(status=400, text=f"invalid_{field}")
+
+        app["messages"].append((sink, message))
+        logger.info(f"Received a {sink} message with {len(message[field])} {field}")
+        return web.Response(status=204 if sink == "discord" else 200, text="ok")
+
+    app.router.add_post("/{sink}", receive)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--fail-every", type=int, default=0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    web.run_app(create_app(args.fail_every, args.retry_after), port=args.port)
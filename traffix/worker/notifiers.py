@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import random
+from abc import ABC, abstractmethod
+from datetime import datetime
+
+import aiohttp
+from aioredis import Redis
+from slack_sdk.models.blocks import (
+    Block,
+    ButtonElement,
+    ContextBlock,
+    DividerBlock,
+    HeaderBlock,
+    MarkdownTextObject,
+    SectionBlock,
+)
+from slack_sdk.webhook.async_client import AsyncWebhookClient as SlackClient
+from structlog import get_logger
+
+from traffix.config import settings
+from traffix.logic import event_score
+from traffix.models.events import EventGameRelease, EventGameUpdate
+from traffix.worker.metrics import NOTIFIER_MESSAGES
+
+logger = get_logger()
+
+GITHUB_ISSUE_URL = "https://github.com/veesix-networks/traffix/issues/{}"
+
+
+class NotifierError(Exception):
+    """A message was rejected by the sink.
+
+    Args:
+        message:        Error returned by the sink.
+        retryable:      Whether sending the message again may succeed.
+        retry_after:    Seconds the sink asked to wait before retrying.
+    """
+
+    def __init__(
+        self, message: str, retryable: bool = False, retry_after: float | None = None
+    ):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+def backoff(attempt: int, retry_after: float | None = None) -> float:
+    """Exponential backoff with full jitter, honouring `Retry-After` when given."""
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(
+        0,
+        min(settings.NOTIFIER_BACKOFF_MAX, settings.NOTIFIER_BACKOFF_BASE * 2**attempt),
+    )
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class Notifier(ABC):
+    """Announces events to a single sink, eg. a Slack or Discord webhook.
+
+    Subclasses render events into blocks and send messages. Events are packed into
+    as many messages as needed to keep each one within `max_blocks`, and messages
+    are retried with backoff when the sink is rate limiting or unavailable.
+    """
+
+    name = "notifier"
+    max_blocks = 50
+
+    def intro_blocks(self, total_events: int, days: int) -> list:
+        """Blocks at the start of the first message."""
+        return []
+
+    @abstractmethod
+    def event_blocks(self, event: EventGameRelease | EventGameUpdate) -> list:
+        """Blocks announcing one event."""
+
+    @abstractmethod
+    def build_message(self, blocks: list) -> dict:
+        """Message carrying `blocks`, as sent to the sink."""
+
+    @abstractmethod
+    async def send_message(self, message: dict) -> None:
+        """Sends one message, raising `NotifierError` if the sink rejects it."""
+
+    def build_messages(
+        self, events: list[EventGameRelease | EventGameUpdate], days: int
+    ) -> list[tuple[list[EventGameRelease | EventGameUpdate], dict]]:
+        """Packs events into messages of at most `max_blocks` blocks.
+
+        Returns each message together with the events it announces.
+        """
+        messages = []
+        blocks = self.intro_blocks(len(events), days)
+        message_events = []
+
+        for event in events:
+            event_blocks = self.event_blocks(event)
+            if message_events and len(blocks) + len(event_blocks) > self.max_blocks:
+                messages.append((message_events, self.build_message(blocks)))
+                blocks, message_events = [], []
+
+            blocks.extend(event_blocks)
+            message_events.append(event)
+
+        if message_events:
+            messages.append((message_events, self.build_message(blocks)))
+
+        return messages
+
+    async def send_notification(self, message: dict) -> None:
+        """Sends a message, retrying up to `NOTIFIER_MAX_RETRIES` times."""
+        for attempt in range(settings.NOTIFIER_MAX_RETRIES + 1):
+            try:
+                return await self.send_message(message)
+            except NotifierError as err:
+                if not err.retryable or attempt == settings.NOTIFIER_MAX_RETRIES:
+                    raise
+
+                NOTIFIER_MESSAGES.labels(self.name, "retried").inc()
+                delay = backoff(attempt, err.retry_after)
+                logger.warning(
+                    f"{self.name} rejected a message due to: {err}, retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+
+class SlackNotifier(Notifier):
+    name = "slack"
+    max_blocks = 50  # Slack rejects messages with more blocks
+
+    def __init__(self, webhook_url: str, session: aiohttp.ClientSession):
+        self.client = SlackClient(url=webhook_url, session=session)
+
+    def intro_blocks(self, total_events: int, days: int) -> list[Block]:
+        return [
+            ContextBlock(
+                elements=[
+                    MarkdownTextObject(
+                        text=f"Here is a summary of the new or changed game releases and updates coming out within the next {days} days."
+                    )
+                ]
+            )
+        ]
+
+    def event_blocks(self, event: EventGameRelease | EventGameUpdate) -> list[Block]:
+        return [
+            HeaderBlock(text=event.name),
+            SectionBlock(
+                text=f"Estimated Size: {event.size}GB\nType: {event.type}",
+                accessory=ButtonElement(
+                    text=f"Issue #{event.github_issue_id}",
+                    url=GITHUB_ISSUE_URL.format(event.github_issue_id),
+                ),
+            ),
+            ContextBlock(
+                elements=[MarkdownTextObject(text=f"Estimated date: {event.date}")]
+            ),
+            DividerBlock(),
+        ]
+
+    def build_message(self, blocks: list[Block]) -> dict:
+        return {"blocks": blocks}
+
+    async def send_message(self, message: dict) -> None:
+        try:
+            response = await self.client.send(**message)
+        except aiohttp.ClientError as err:
+            raise NotifierError(str(err), retryable=True)
+
+        if response.status_code == 200:
+            return
+
+        raise NotifierError(
+            f"HTTP {response.status_code}: {response.body}",
+            retryable=response.status_code == 429 or response.status_code >= 500,
+            retry_after=parse_retry_after(response.headers.get("retry-after")),
+        )
+
+
+class DiscordNotifier(Notifier):
+    name = "discord"
+    max_blocks = 10  # Discord allows up to 10 embeds per message
+
+    def __init__(self, webhook_url: str, session: aiohttp.ClientSession):
+        self.webhook_url = webhook_url
+        self.session = session
+
+    def event_blocks(self, event: EventGameRelease | EventGameUpdate) -> list[dict]:
+        return [
+            {
+                "title": event.name,
+                "url": GITHUB_ISSUE_URL.format(event.github_issue_id),
+                "description": f"Estimated Size: {event.size}GB\nType: {event.type}",
+                "footer": {"text": f"Estimated date: {event.date}"},
+            }
+        ]
+
+    def build_message(self, blocks: list[dict]) -> dict:
+        return {"embeds": blocks}
+
+    async def send_message(self, message: dict) -> None:
+        try:
+            async with self.session.post(self.webhook_url, json=message) as response:
+                if response.status < 300:
+                    return
+
+                body = await response.text()
+                raise NotifierError(
+                    f"HTTP {response.status}: {body}",
+                    retryable=response.status == 429 or response.status >= 500,
+                    retry_after=parse_retry_after(response.headers.get("Retry-After")),
+                )
+        except aiohttp.ClientError as err:
+            raise NotifierError(str(err), retryable=True)
+
+
+def notified_events_key(notifier: Notifier) -> str:
+    """Hash of event to the digest of the event when it was last announced."""
+    return f"notified_events:{notifier.name}"
+
+
+def event_digest(event: EventGameRelease | EventGameUpdate) -> str:
+    """Digest of an event, suffixed with its date score so old entries can be pruned."""
+    digest = hashlib.sha1(event.model_dump_json().encode("utf-8")).hexdigest()
+    return f"{digest}:{event_score(event.date)}"
+
+
+def event_field(event: EventGameRelease | EventGameUpdate) -> str:
+    return f"{event.type}:{event.github_issue_id}"
+
+
+async def notify(
+    client: Redis,
+    notifier: Notifier,
+    events: list[EventGameRelease | EventGameUpdate],
+    days: int,
+) -> None:
+    """Announces the events which are new or changed since they were last announced.
+
+    Every message which was delivered is recorded straight away, so if a later
+    message fails only its events are announced again on the next run.
+    """
+    key = notified_events_key(notifier)
+    notified = {
+        field.decode("utf-8"): digest.decode("utf-8")
+        for field, digest in (await client.hgetall(key)).items()
+    }
+
+    # Forget events which have already happened
+    now = event_score(datetime.now())
+    passed = [
+        field
+        for field, digest in notified.items()
+        if int(digest.rsplit(":", 1)[-1]) < now
+    ]
+    if passed:
+        await client.hdel(key, *passed)
+
+    pending = [
+        event
+        for event in events
+        if notified.get(event_field(event)) != event_digest(event)
+    ]
+    if not pending:
+        logger.info(f"No new or changed events to announce on {notifier.name}")
+        return
+
+    for message_events, message in notifier.build_messages(pending, days):
+        await notifier.send_notification(message)
+        NOTIFIER_MESSAGES.labels(notifier.name, "sent").inc()
+        if message_events:
+            await client.hset(
+                key,
+                mapping={
+                    event_field(event): event_digest(event) for event in message_events
+                },
+            )
+
+    logger.info(f"Announced {len(pending)} events on {notifier.name}")
+
+
+async def fan_out(
+    client: Redis,
+    notifiers: list[Notifier],
+    events: list[EventGameRelease | EventGameUpdate],
+    days: int,
+) -> None:
+    """Notifies every sink concurrently, so a slow or failing sink doesn't hold up the rest."""
+    results = await asyncio.gather(
+        *[notify(client, notifier, events, days) for notifier in notifiers],
+        return_exceptions=True,
+    )
+    for notifier, result in zip(notifiers, results):
+        if isinstance(result, Exception):
+            NOTIFIER_MESSAGES.labels(notifier.name, "failed").inc()
+            logger.error(f"Unable to notify {notifier.name} due to: {result}")
@@ -1,25 +1,64 @@
 import asyncio
+import hashlib
 import json
-from datetime import datetime
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Awaitable
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from aioredis import from_url, Redis
+from aioredis.client import Pipeline
 from structlog import get_logger
 import aiohttp
 import yaml
 import os
 
+from traffix.codec import decode_value, encode_value
 from traffix.config import settings
+from traffix.forecast import FORECAST_KEYS, forecast_hourly
+from traffix.logic import (
+    EVENT_TYPES,
+    GITHUB_ACTIVITY_KEY,
+    event_host_key,
+    event_hosts_key,
+    event_index_key,
+    event_records_key,
+    event_score,
+    event_size_key,
+    github_event_from_issue,
+    resolve_snapshot,
+    snapshot_key,
+    snapshot_keys,
+    source_host,
+    validate_events,
+)
 from traffix.models.events import (
     BaseEvent,
     EventGameRelease,
     EventGameUpdate,
-    EventEnum,
+)
+from traffix.profiling import profile_job
+from traffix.worker.metrics import (
+    JOB_STAGE_DURATION,
+    count_skipped_runs,
+    github_trace_config,
+    instrument_job,
+    start_metrics_server,
+)
+from traffix.webhooks import (
+    DATASTORE_TARGET,
+    ISSUE_TARGET,
+    WEBHOOK_FIRST_DELIVERY_KEY,
+    WEBHOOK_QUEUE_KEY,
 )
 
 logger = get_logger()
 
+JOB_ID = "sync_datastore"
+WEBHOOK_JOB_ID = "webhook_sync"
+
 OWNER = "veesix-networks"
 REPO = "traffix"
 EVENTS = {
@@ -30,145 +69,717 @@ EVENTS = {
 # GitHub API URL to fetch issues
 GITHUB_API_URL = f"https://api.github.com/repos/{OWNER}/{REPO}/issues"
 
+# Hash of every issue ID to the issue, merged incrementally on each sync
+GITHUB_ISSUES_KEY = "github_issues_by_id"
 
-async def fetch_issues(sort_by_date: bool = True):
-    # headers = {"Authorization": f"token {os.getenv('GITHUB_TOKEN')}"}
-    headers = {}
-    all_issues = []
+# Full syncs and webhook resyncs of the same datastore run one at a time
+DATASTORE_LOCKS: defaultdict[str, asyncio.Lock] = defaultdict(asyncio.Lock)
 
-    for label in EVENTS.keys():
-        params = {"labels": label, "state": "all"}
-        async with aiohttp.ClientSession() as session:
-            async with session.get(
-                GITHUB_API_URL, headers=headers, params=params
-            ) as response:
-                if response.status != 200:
-                    response.raise_for_status()
 
-                issues = await response.json()
+def create_session() -> aiohttp.ClientSession:
+    """Creates the HTTP session shared by every request made during a job run."""
+    connector = aiohttp.TCPConnector(
+        limit=settings.WORKER_MAX_CONCURRENCY,
+        ttl_dns_cache=settings.WORKER_DNS_CACHE_TTL,
+        keepalive_timeout=settings.WORKER_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(total=settings.WORKER_HTTP_TIMEOUT)
+    return aiohttp.ClientSession(
+        connector=connector, timeout=timeout, trace_configs=[github_trace_config()]
+    )
 
-        issue_ids = {issue["id"] for issue in all_issues}
+
+async def run_stage(
+    stage: str, timings: dict[str, float], awaitable: Awaitable, job: str = JOB_ID
+):
+    """Awaits a stage of a job and records how long it took in `timings`."""
+    start = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        duration = time.perf_counter() - start
+        timings[stage] = round(duration, 3)
+        JOB_STAGE_DURATION.labels(job, stage).observe(duration)
+
+
+def github_headers() -> dict[str, str]:
+    headers = {"Accept": "application/vnd.github.v3+json"}
+    if settings.GITHUB_TOKEN:
+        headers["Authorization"] = f"token {settings.GITHUB_TOKEN}"
+    return headers
+
+
+async def fetch_label_issues(
+    session: aiohttp.ClientSession, client: Redis, label: str
+) -> tuple[list[dict], dict[str, str]]:
+    """Fetches the issues of a label which changed since the last sync.
+
+    The first page is requested with the ETag of the previous sync, so when nothing
+    changed GitHub answers with a 304 which does not count against the rate limit.
+    Issues are sorted by most recently updated, so any change lands on the first page.
+
+    Args:
+        session:    HTTP session.
+        client:     Redis client.
+        label:      GitHub issue label.
+
+    Returns the changed issues and the sync state to store once they are merged.
+    """
+    etag_key = f"github_issues_etag:{label}"
+    since_key = f"github_issues_since:{label}"
+    etag, since = await client.mget(etag_key, since_key)
+
+    headers = github_headers()
+    if etag:
+        headers["If-None-Match"] = etag.decode("utf-8")
+
+    params = {
+        "labels": label,
+        "state": "all",
+        "sort": "updated",
+        "direction": "desc",
+        "per_page": 100,
+    }
+    if since:
+        params["since"] = since.decode("utf-8")
+
+    issues = []
+    url = GITHUB_API_URL
+    first_page_etag = None
+
+    while url:
+        async with session.get(url, headers=headers, params=params) as response:
+            if response.status == 304:
+                logger.info(f"No issues changed for label '{label}'")
+                return [], {}
+
+            if response.status != 200:
+                response.raise_for_status()
+
+            if first_page_etag is None:
+                first_page_etag = response.headers.get("ETag")
+
+            issues.extend(await response.json())
+            url = response.links.get("next", {}).get("url")
+
+        # The next link already contains the query, and only the first page is conditional
+        params = None
+        headers.pop("If-None-Match", None)
+
+    sync_state = {}
+    if issues:
+        sync_state[since_key] = max(issue["updated_at"] for issue in issues)
+    if first_page_etag:
+        sync_state[etag_key] = first_page_etag
+
+    logger.info(f"Fetched {len(issues)} changed issues for label '{label}'")
+    return issues, sync_state
+
+
+async def fetch_issues(
+    session: aiohttp.ClientSession, client: Redis
+) -> tuple[list[dict], dict[str, str]]:
+    """Fetches the issues of every label which changed since the last sync."""
+    all_issues = []
+    sync_state = {}
+
+    results = await asyncio.gather(
+        *(fetch_label_issues(session, client, label) for label in EVENTS.keys())
+    )
+
+    issue_ids = set()
+    for issues, label_sync_state in results:
+        sync_state.update(label_sync_state)
         for issue in issues:
             if issue["id"] not in issue_ids:
                 all_issues.append(issue)
+                issue_ids.add(issue["id"])
 
-    if sort_by_date:
-        sorted_objects = sorted(
-            all_issues,
-            key=lambda obj: obj["created_at"],
-            reverse=True,
-        )
-        return sorted_objects
-
-    return all_issues
+    return all_issues, sync_state
 
 
-async def fetch_latest_commit_sha(yaml_file: str) -> str:
+async def fetch_latest_commit_sha(
+    session: aiohttp.ClientSession, yaml_file: str
+) -> str:
     url = f"https://api.github.com/repos/{settings.GITHUB_REPO}/commits?path=datastore/{yaml_file}&per_page=1"
     headers = {"Accept": "application/vnd.github.v3+json"}
 
     file_commit_sha = None
 
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                data = await response.json()
-                if not data or not data[0]:
-                    return
-                file_commit_sha = data[0].get(
-                    "sha"
-                )  # Get the SHA of the latest commit for this file
-            else:
-                response.raise_for_status()
+    async with session.get(url, headers=headers) as response:
+        if response.status == 200:
+            data = await response.json()
+            if not data or not data[0]:
+                return
+            file_commit_sha = data[0].get(
+                "sha"
+            )  # Get the SHA of the latest commit for this file
+        else:
+            response.raise_for_status()
     return file_commit_sha
 
 
-async def fetch_yaml_from_github(yaml_file: str) -> str:
-    url = f"https://raw.githubusercontent.com/{settings.GITHUB_REPO}/main/datastore/{yaml_file}"
+async def fetch_yaml_from_github(
+    session: aiohttp.ClientSession, yaml_file: str, ref: str = "main"
+) -> str:
+    # Branches are served from a cache for a few minutes, a commit SHA never goes stale
+    url = f"https://raw.githubusercontent.com/{settings.GITHUB_REPO}/{ref}/datastore/{yaml_file}"
 
     data = None
-    async with aiohttp.ClientSession() as session:
-        async with session.get(url) as response:
-            if response.status == 200:
-                data = yaml.safe_load(await response.text())
-            else:
-                response.raise_for_status()
+    async with session.get(url) as response:
+        if response.status == 200:
+            data = yaml.safe_load(await response.text())
+        else:
+            response.raise_for_status()
 
     return data
 
 
+async def fetch_sharded_yaml_from_github(
+    session: aiohttp.ClientSession,
+    client: Redis,
+    key: str,
+    shard_directory: str,
+    ref: str = "main",
+) -> list[dict]:
+    """Fetches a datastore stored as one YAML file per month.
+
+    Only shards whose blob SHA changed since the last sync are downloaded, the
+    others are read back from the parsed copies cached in Redis.
+
+    Args:
+        session:            HTTP session.
+        client:             Redis client.
+        key:                Normalized datastore key, eg. "event_game_releases".
+        shard_directory:    Directory of the shards within `datastore/`.
+        ref:                Branch or commit SHA to fetch the shards at.
+    """
+    url = f"https://api.github.com/repos/{settings.GITHUB_REPO}/contents/datastore/{shard_directory}"
+    async with session.get(
+        url, headers=github_headers(), params={"ref": ref}
+    ) as response:
+        if response.status == 404:
+            return []
+        if response.status != 200:
+            response.raise_for_status()
+        listing = await response.json()
+
+    shards = {
+        item["name"]: item["sha"]
+        for item in listing
+        if item["type"] == "file" and item["name"].endswith(".yml")
+    }
+
+    shards_key = f"{key}_shards"
+    shard_shas_key = f"{key}_shard_shas"
+    cached_shas = {
+        name.decode("utf-8"): sha.decode("utf-8")
+        for name, sha in (await client.hgetall(shard_shas_key)).items()
+    }
+
+    changed = [name for name, sha in shards.items() if cached_shas.get(name) != sha]
+    unchanged = [name for name in shards if name not in changed]
+    removed = [name for name in cached_shas if name not in shards]
+
+    fetched = await asyncio.gather(
+        *(
+            fetch_yaml_from_github(session, f"{shard_directory}/{name}", ref)
+            for name in changed
+        )
+    )
+    shard_events = {name: events or [] for name, events in zip(changed, fetched)}
+
+    if unchanged:
+        cached = await client.hmget(shards_key, unchanged)
+        for name, data in zip(unchanged, cached):
+            # Legacy JSON serialized dates as strings, the YAML loader returns datetimes
+            shard_events[name] = [
+                (
+                    {**event, "date": datetime.fromisoformat(event["date"])}
+                    if isinstance(event["date"], str)
+                    else event
+                )
+                for event in decode_value(data) or []
+            ]
+
+    async with client.pipeline(transaction=True) as pipe:
+        if changed:
+            pipe.hset(
+                shards_key,
+                mapping={name: encode_value(shard_events[name]) for name in changed},
+            )
+            pipe.hset(shard_shas_key, mapping={name: shards[name] for name in changed})
+        if removed:
+            pipe.hdel(shards_key, *removed)
+            pipe.hdel(shard_shas_key, *removed)
+        await pipe.execute()
+
+    logger.info(
+        f"Fetched {len(changed)} of {len(shards)} shards for '{key}', {len(removed)} removed"
+    )
+    return [event for name in sorted(shard_events) for event in shard_events[name]]
+
+
+def queue_versioned(pipe: Pipeline, key: str, value: str | bytes) -> None:
+    """Queues the commands of `set_versioned_redis` onto a pipeline.
+
+    Args:
+        pipe:       Redis pipeline.
+        key:        Redis key.
+        value:      Serialized value.
+    """
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    sha = hashlib.sha1(value).hexdigest()
+
+    pipe.set(key, value)
+    pipe.set(f"{key}_sha", sha)
+    pipe.set(f"{key}_synced_at", int(time.time()))
+    pipe.publish(settings.EVENT_CACHE_CHANNEL, json.dumps({"key": key, "sha": sha}))
+
+
+async def set_versioned_redis(client: Redis, key: str, value: str | bytes) -> None:
+    """Sets a derived key together with a content SHA so web caches can track it.
+
+    Args:
+        client:     Redis client.
+        key:        Redis key.
+        value:      Serialized value.
+    """
+    async with client.pipeline(transaction=True) as pipe:
+        queue_versioned(pipe, key, value)
+        await pipe.execute()
+
+
+def latest_50_events(events: list[dict]) -> list[dict]:
+    """Returns the next 50 events coming out, sorted by date."""
+    now = datetime.now()
+    return sorted(
+        (event for event in events if event["date"] >= now),
+        key=lambda event: event["date"],
+    )[:50]
+
+
 async def update_event_list_redis(
-    client: Redis, datastore_file: str
+    client: Redis, session: aiohttp.ClientSession, datastore_file: str
 ) -> list[BaseEvent | EventGameRelease | EventGameUpdate]:
+    """Syncs a datastore into a new snapshot when its latest commit changed.
+
+    The events, their records, the secondary indexes queried by `query_events` and
+    the top 50 events are written under keys of their own version, then
+    `{key}_version` is switched to them, all in one transaction. Readers resolving
+    the version never see a partial sync, and a sync which fails leaves the
+    previous version active so the next run retries.
+    The previous snapshot expires after `DATASTORE_SNAPSHOT_TTL` seconds.
+
+    Args:
+        client:             Redis client.
+        session:            HTTP session.
+        datastore_file:     YAML file of the datastore, eg. "event_game_releases.yml".
+
+    Returns the events synced, or None when the datastore did not change.
+    """
     key_normalized = (
         datastore_file.split(".")[0].lower().replace("-", "_").replace(" ", "_")
     )
 
+    # Sharded datastores live in a directory named after the YAML file
+    datastore_path = datastore_file
+    if settings.DATASTORE_SHARDED:
+        datastore_path = datastore_file.rsplit(".", 1)[0]
+
     logger.info(f"Validating and checking: '{key_normalized}'")
-    file_sha = await fetch_latest_commit_sha(datastore_file)
+    file_sha = await fetch_latest_commit_sha(session, datastore_path)
 
-    redis_event_sha = await client.get(f"{key_normalized}_sha")
-    if redis_event_sha:
-        redis_event_sha = redis_event_sha.decode("utf-8")
-        if redis_event_sha == file_sha:
+    active_version = await client.get(f"{key_normalized}_version")
+    if active_version:
+        active_version = active_version.decode("utf-8")
+        if active_version == file_sha:
             logger.info("Commit SHA is the same, skipping sync for these events...")
             return
 
-    events = await fetch_yaml_from_github(datastore_file)
+    if settings.DATASTORE_SHARDED:
+        events = await fetch_sharded_yaml_from_github(
+            session, client, key_normalized, datastore_path, file_sha or "main"
+        )
+    else:
+        events = (
+            await fetch_yaml_from_github(session, datastore_file, file_sha or "main")
+            or []
+        )
     total_events = len(events)
-    await client.set(f"{key_normalized}_sha", file_sha)
-    await client.set(key_normalized, json.dumps(events, default=str))
-    await client.set(f"{key_normalized}_len", total_events)
 
-    logger.info(f"Updated {key_normalized}")
+    snapshot = snapshot_key(key_normalized, file_sha)
+    index_key = event_index_key(snapshot)
+    records_key = event_records_key(snapshot)
+
+    hosts: dict[str, list[int]] = {}
+    for event in events:
+        host = source_host(event.get("source") or "")
+        if host:
+            hosts.setdefault(host, []).append(event["github_issue_id"])
+
+    # The unversioned keys were written by previous releases, which may still read them
+    if active_version:
+        previous = snapshot_key(key_normalized, active_version)
+        previous_hosts = await client.smembers(event_hosts_key(previous))
+        superseded = snapshot_keys(
+            previous, [host.decode("utf-8") for host in previous_hosts]
+        )
+    else:
+        superseded = [
+            key_normalized,
+            event_index_key(key_normalized),
+            event_records_key(key_normalized),
+        ]
+
+    async with client.pipeline(transaction=True) as pipe:
+        pipe.delete(*snapshot_keys(snapshot, list(hosts)))
+        pipe.set(snapshot, encode_value(events))
+
+        # Date index so the UI can page through upcoming events with a range query
+        if events:
+            pipe.zadd(
+                index_key,
+                {
+                    event["github_issue_id"]: event_score(event["date"])
+                    for event in events
+                },
+            )
+            pipe.hset(
+                records_key,
+                mapping={
+                    event["github_issue_id"]: encode_value(event) for event in events
+                },
+            )
+
+            # Secondary indexes intersected with the date index by `query_events`
+            pipe.zadd(
+                event_size_key(snapshot),
+                {event["github_issue_id"]: event.get("size") or 0 for event in events},
+            )
+        for host, event_ids in hosts.items():
+            pipe.sadd(event_host_key(snapshot, host), *event_ids)
+        if hosts:
+            pipe.sadd(event_hosts_key(snapshot), *hosts)
+
+        pipe.mset(
+            {
+                f"{key_normalized}_version": file_sha,
+                f"{key_normalized}_sha": file_sha,
+                f"{key_normalized}_len": total_events,
+                f"{key_normalized}_synced_at": int(time.time()),
+            }
+        )
+        for key in superseded:
+            pipe.expire(key, settings.DATASTORE_SNAPSHOT_TTL)
+
+        event_type = EVENT_TYPES.get(key_normalized)
+        if event_type:
+            queue_versioned(
+                pipe,
+                f"top_50_{event_type.value}",
+                encode_value(latest_50_events(events)),
+            )
+
+        # Let every web worker know its in-process copy of these events is stale
+        pipe.publish(
+            settings.EVENT_CACHE_CHANNEL,
+            json.dumps({"key": key_normalized, "sha": file_sha}),
+        )
+        await pipe.execute()
+
+    logger.info(f"Updated {key_normalized} to version {file_sha}")
     return events
 
 
-async def update_latest_50_event_list_redis(
-    client: Redis, events: list[BaseEvent], event_type: EventEnum
+async def sync_datastore(
+    client: Redis, session: aiohttp.ClientSession, datastore_file: str
+) -> list[BaseEvent | EventGameRelease | EventGameUpdate]:
+    """Runs `update_event_list_redis` once other syncs of the datastore finished.
+
+    A sync which waited usually finds the commit SHA already synced and skips.
+    """
+    async with DATASTORE_LOCKS[datastore_file]:
+        return await update_event_list_redis(client, session, datastore_file)
+
+
+async def update_latest_github_events_redis(
+    client: Redis,
+    events: list[dict],
+    sync_state: dict[str, str] | None = None,
+    removed_ids: list[int] | None = None,
 ) -> None:
-    """Updates Redis with the latest 50 events coming out based on the provided events.
+    """Merges changed github events into Redis and rebuilds the latest events list.
+
+    An event is only replaced by a copy updated at the same time or later, as full
+    syncs and webhook resyncs may fetch the same issue concurrently.
 
     Args:
-        client:         Redis client.
-        events:         List of events.
-        event_type:     EventEnum.
+        client:         Redis Client.
+        events:         List of github issues/events changed since the last sync.
+        sync_state:     ETags and timestamps to store for the next incremental sync.
+        removed_ids:    IDs of the issues deleted or no longer labeled as events.
     """
-    if not events:
+    if events:
+        stored = await client.hmget(
+            GITHUB_ISSUES_KEY, [event["id"] for event in events]
+        )
+        events = [
+            event
+            for event, data in zip(events, stored)
+            if not data or decode_value(data)["updated_at"] <= event["updated_at"]
+        ]
+
+    async with client.pipeline(transaction=True) as pipe:
+        if events:
+            pipe.hset(
+                GITHUB_ISSUES_KEY,
+                mapping={event["id"]: encode_value(event) for event in events},
+            )
+        if removed_ids:
+            pipe.hdel(GITHUB_ISSUES_KEY, *removed_ids)
+        if sync_state:
+            pipe.mset(sync_state)
+        results = await pipe.execute()
+
+    removed = bool(removed_ids) and results[1 if events else 0] > 0
+    if (
+        not events
+        and not removed
+        and await client.exists("github_events", GITHUB_ACTIVITY_KEY) == 2
+    ):
         return
 
-    if not isinstance(event_type, EventEnum):
-        logger.warning(f"'{event_type}' is not a valid event type")
+    all_events = [
+        decode_value(event) for event in await client.hvals(GITHUB_ISSUES_KEY)
+    ]
+    if not all_events:
         return
 
-    now = datetime.now()
+    sorted_events = sorted(all_events, key=lambda obj: obj["created_at"], reverse=True)
+
+    # One transaction, as pages are cached by the version of github_events alone
+    async with client.pipeline(transaction=True) as pipe:
+        queue_versioned(pipe, "github_events", encode_value(sorted_events))
+        total_activity = queue_github_activity(pipe, sorted_events)
+        await pipe.execute()
 
-    filtered_objects = [obj for obj in events if obj["date"] >= now]
+    logger.info(f"Updated {GITHUB_ACTIVITY_KEY} with {total_activity} events")
 
-    # Sort filtered objects by datetime in ascending order
-    sorted_objects = sorted(filtered_objects, key=lambda obj: obj["date"])
 
-    # Retrieve top 50 items
-    top_50_events = sorted_objects[:50]
-    await client.set(
-        f"top_50_{event_type.value}", json.dumps(top_50_events, default=str)
+def queue_github_activity(pipe: Pipeline, sorted_events: list[dict]) -> int:
+    """Queues writing the latest events as pre-parsed records into a capped list.
+
+    Args:
+        pipe:               Redis pipeline.
+        sorted_events:      GitHub issues, newest first.
+
+    Returns the amount of events written.
+    """
+    activity = []
+    for issue in sorted_events:
+        try:
+            event = github_event_from_issue(issue)
+        except Exception as err:
+            logger.warning(f"Skipping issue #{issue.get('number')} due to: {err}")
+            continue
+
+        activity.append(event.model_dump_json(exclude={"created_at_human_readable"}))
+        if len(activity) == settings.GITHUB_ACTIVITY_SIZE:
+            break
+
+    pipe.delete(GITHUB_ACTIVITY_KEY)
+    if activity:
+        pipe.rpush(GITHUB_ACTIVITY_KEY, *activity)
+        pipe.ltrim(GITHUB_ACTIVITY_KEY, 0, settings.GITHUB_ACTIVITY_SIZE - 1)
+
+    return len(activity)
+
+
+async def update_forecast_redis(client: Redis) -> None:
+    """Precomputes the hourly bandwidth forecast from every datastore.
+
+    Args:
+        client:     Redis client.
+    """
+    events = []
+    for key in FORECAST_KEYS:
+        snapshot, _ = await resolve_snapshot(client, key)
+        data = await client.get(snapshot)
+        if data:
+            events.extend(validate_events(key, decode_value(data)))
+
+    start = datetime.combine(
+        datetime.utcnow().date() - timedelta(days=settings.FORECAST_PAST_DAYS),
+        datetime.min.time(),
     )
-    return top_50_events
+    end = start + timedelta(
+        days=settings.FORECAST_PAST_DAYS + settings.FORECAST_FUTURE_DAYS
+    )
+    series = forecast_hourly(events, start, end)
+
+    await set_versioned_redis(
+        client,
+        "forecast_hourly",
+        json.dumps(
+            {
+                "start": start.isoformat(),
+                "values": [round(float(value), 3) for value in series],
+            }
+        ),
+    )
+    logger.info(f"Updated forecast_hourly with {len(series)} hours")
+
+
+async def fetch_issue(session: aiohttp.ClientSession, number: int) -> dict | None:
+    """Fetches an issue, returning None when it was deleted."""
+    async with session.get(
+        f"{GITHUB_API_URL}/{number}", headers=github_headers()
+    ) as response:
+        if response.status in (404, 410):
+            return
+        if response.status != 200:
+            response.raise_for_status()
+        return await response.json()
+
 
+def is_event_issue(issue: dict) -> bool:
+    return any(label["name"] in EVENTS for label in issue.get("labels") or [])
 
-async def update_latest_github_events_redis(client: Redis, events: list[dict]) -> None:
-    """Attempts to update Redis with the latest github events.
+
+async def claim_webhook_syncs(client: Redis) -> list[str]:
+    """Takes the resyncs which came due off the webhook queue.
+
+    A resync is only claimed by the worker whose ZREM removed it, so each runs once
+    even with several workers polling the queue.
+    """
+    due = await client.zrangebyscore(WEBHOOK_QUEUE_KEY, "-inf", time.time())
+    if not due:
+        return []
+
+    async with client.pipeline(transaction=False) as pipe:
+        for target in due:
+            pipe.zrem(WEBHOOK_QUEUE_KEY, target)
+        claimed = await pipe.execute()
+
+    claimed = [target.decode("utf-8") for target, won in zip(due, claimed) if won]
+    if claimed:
+        # Deliveries from now on start a new burst
+        await client.hdel(WEBHOOK_FIRST_DELIVERY_KEY, *claimed)
+
+    return claimed
+
+
+async def sync_issues(
+    client: Redis, session: aiohttp.ClientSession, issue_targets: dict[int, int]
+) -> None:
+    """Resyncs issues by ID and number, dropping those no longer labeled as events."""
+    issues = await asyncio.gather(
+        *(fetch_issue(session, number) for number in issue_targets.values())
+    )
+
+    changed, removed_ids = [], []
+    for issue_id, issue in zip(issue_targets, issues):
+        if issue and is_event_issue(issue):
+            changed.append(issue)
+        else:
+            removed_ids.append(issue_id)
+
+    await update_latest_github_events_redis(client, changed, removed_ids=removed_ids)
+
+
+@instrument_job(WEBHOOK_JOB_ID)
+async def sync_webhook_targets(client: Redis, targets: list[str]) -> None:
+    """Resyncs the datastores and issues queued by the webhook receiver.
+
+    Failed resyncs are queued again after `GITHUB_WEBHOOK_RETRY_DELAY` seconds.
 
     Args:
-        client:     Redis Client.
-        events:     List of latest github issues/events.
+        client:     Redis client.
+        targets:    Claimed resyncs, see `traffix.webhooks.sync_targets`.
     """
-    if not events:
-        return
+    timings = {}
+    start = time.perf_counter()
+
+    datastore_files = [
+        target.removeprefix(DATASTORE_TARGET)
+        for target in targets
+        if target.startswith(DATASTORE_TARGET)
+    ]
+    issue_targets = {}
+    for target in targets:
+        if target.startswith(ISSUE_TARGET):
+            issue_id, number = target.removeprefix(ISSUE_TARGET).split(":")
+            issue_targets[int(issue_id)] = int(number)
+
+    stages = [*datastore_files, "issues"] if issue_targets else datastore_files
+    async with create_session() as session:
+        awaitables = [
+            sync_datastore(client, session, datastore_file)
+            for datastore_file in datastore_files
+        ]
+        if issue_targets:
+            awaitables.append(sync_issues(client, session, issue_targets))
+
+        results = await asyncio.gather(
+            *(
+                run_stage(stage, timings, awaitable, WEBHOOK_JOB_ID)
+                for stage, awaitable in zip(stages, awaitables)
+            ),
+            return_exceptions=True,
+        )
+
+    failed = []
+    for stage, result in zip(stages, results):
+        if not isinstance(result, Exception):
+            continue
+
+        logger.error(f"Unable to resync '{stage}' due to: {result}")
+        if stage == "issues":
+            failed.extend(
+                f"{ISSUE_TARGET}{issue_id}:{number}"
+                for issue_id, number in issue_targets.items()
+            )
+        else:
+            failed.append(f"{DATASTORE_TARGET}{stage}")
+
+    if failed:
+        retry_at = time.time() + settings.GITHUB_WEBHOOK_RETRY_DELAY
+        await client.zadd(
+            WEBHOOK_QUEUE_KEY, {target: retry_at for target in failed}, nx=True
+        )
+
+    if any(
+        result is not None and not isinstance(result, Exception)
+        for stage, result in zip(stages, results)
+        if stage != "issues"
+    ):
+        await run_stage(
+            "forecast", timings, update_forecast_redis(client), WEBHOOK_JOB_ID
+        )
+
+    timings["total"] = round(time.perf_counter() - start, 3)
+    logger.info(
+        f"Finished webhook resyncs of {targets}, stage timings (seconds): {timings}"
+    )
+
 
-    await client.set("github_events", json.dumps(events, default=str))
+async def process_webhook_syncs(client: Redis) -> None:
+    """Runs the resyncs queued by the webhook receiver as they come due, forever."""
+    while True:
+        try:
+            targets = await claim_webhook_syncs(client)
+            if targets:
+                await sync_webhook_targets(client, targets)
+        except Exception as err:
+            logger.error(f"Unable to run webhook resyncs due to: {err}")
 
+        await asyncio.sleep(settings.WORKER_WEBHOOK_POLL_INTERVAL)
 
+
+@instrument_job(JOB_ID)
+@profile_job(JOB_ID)
 async def run_job():
     logger.info("Checking if any redis keys need to be updated...")
 
@@ -179,39 +790,78 @@ async def run_job():
         logger.error(f"Unable to connect to Redis due to: {err}")
         exit()
 
-    game_releases = await update_event_list_redis(
-        client, settings.EVENT_GAME_RELEASES_YAML
-    )
-    game_updates = await update_event_list_redis(
-        client, settings.EVENT_GAME_UPDATES_YAML
-    )
-
-    # Set top 50 for various redis queues
-    await update_latest_50_event_list_redis(
-        client, game_releases, EventEnum.game_release
-    )
-    await update_latest_50_event_list_redis(client, game_updates, EventEnum.game_update)
+    timings = {}
+    start = time.perf_counter()
 
-    # GitHub Issues
-    # Update recent events
+    try:
+        async with create_session() as session:
+            # The datastores and GitHub issues are independent so fetch them concurrently
+            game_releases, game_updates, changed_issues = await asyncio.gather(
+                run_stage(
+                    "event_game_releases",
+                    timings,
+                    sync_datastore(client, session, settings.EVENT_GAME_RELEASES_YAML),
+                ),
+                run_stage(
+                    "event_game_updates",
+                    timings,
+                    sync_datastore(client, session, settings.EVENT_GAME_UPDATES_YAML),
+                ),
+                run_stage("fetch_issues", timings, fetch_issues(session, client)),
+            )
+            latest_events, sync_state = changed_issues
+
+        # Recompute the forecast when a datastore changed, or once a day to roll it forward
+        forecast_synced_at = await client.get("forecast_hourly_synced_at")
+        if (
+            game_releases is not None
+            or game_updates is not None
+            or not forecast_synced_at
+            or time.time() - int(forecast_synced_at) > 86400
+        ):
+            await run_stage("forecast", timings, update_forecast_redis(client))
+
+        # GitHub Issues
+        # Update recent events
+        await run_stage(
+            "github_events",
+            timings,
+            update_latest_github_events_redis(client, latest_events, sync_state),
+        )
+    finally:
+        await client.close()
 
-    latest_events = await fetch_issues()
-    # sorted_objects = sorted(filtered_objects, key=lambda obj: obj["date"])
-    await update_latest_github_events_redis(client, latest_events)
+    timings["total"] = round(time.perf_counter() - start, 3)
+    logger.info(f"Finished syncing datastores, stage timings (seconds): {timings}")
 
 
 if __name__ == "__main__":
+    if settings.METRICS_ENABLED:
+        start_metrics_server(settings.WORKER_METRICS_PORT)
+
     scheduler = AsyncIOScheduler()
+    count_skipped_runs(scheduler)
 
-    trigger = IntervalTrigger(minutes=10)
+    # Webhooks resync changes as they are pushed, so full syncs only catch up on
+    # deliveries which were missed, eg. while the app was down
+    interval = settings.WORKER_SYNC_INTERVAL
+    if settings.GITHUB_WEBHOOK_SECRET:
+        interval = settings.WORKER_WEBHOOK_SYNC_INTERVAL
+    trigger = IntervalTrigger(seconds=interval)
 
-    scheduler.add_job(run_job, trigger=trigger, id="sync_datastore")
+    scheduler.add_job(run_job, trigger=trigger, id=JOB_ID)
     scheduler.start()
 
     if settings.RUN_NOW:
         logger.info("Running Job straight away")
-        scheduler.modify_job(job_id="sync_datastore", next_run_time=datetime.now())
-        job = scheduler.get_job(job_id="sync_datastore")
+        scheduler.modify_job(job_id=JOB_ID, next_run_time=datetime.now())
+        job = scheduler.get_job(job_id=JOB_ID)
+
+    if settings.GITHUB_WEBHOOK_SECRET:
+        logger.info("Running webhook resyncs as they are queued")
+        asyncio.get_event_loop().create_task(
+            process_webhook_syncs(from_url(str(settings.REDIS)))
+        )
 
     try:
         asyncio.get_event_loop().run_forever()
@@ -1,124 +1,36 @@
-# Future plans is to build a base class for any notifier
-# eg. Slack, Discord, Email, Twitter, etc... and implement a generic send_notification() method on all classes.
-
 import asyncio
-import json
 from datetime import datetime, timedelta
 
+import aiohttp
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from aioredis import from_url, Redis
+from aioredis import from_url
 from structlog import get_logger
-from slack_sdk.webhook.async_client import AsyncWebhookClient as SlackClient
-from slack_sdk.models.blocks import (
-    HeaderBlock,
-    DividerBlock,
-    ContextBlock,
-    MarkdownTextObject,
-    SectionBlock,
-    ButtonElement,
-)
 
 from traffix.config import settings
-from traffix.models.events import EventGameRelease, EventGameUpdate
+from traffix.logic import query_events
+from traffix.models.events import EventQuery
+from traffix.profiling import profile_job
+from traffix.worker.metrics import (
+    JOB_STAGE_DURATION,
+    count_skipped_runs,
+    instrument_job,
+    start_metrics_server,
+)
+from traffix.worker.notifiers import (
+    DiscordNotifier,
+    Notifier,
+    SlackNotifier,
+    fan_out,
+)
 
 logger = get_logger()
 
-
-async def load_events(
-    event_name: str, client: Redis
-) -> list[EventGameRelease | EventGameUpdate]:
-    data = await client.get(event_name)
-    if not data:
-        return []
-
-    try:
-        data = json.loads(data)
-    except Exception as err:
-        logger.error(f"Unable to load events due to error: {err}")
-        return []
-
-    events = []
-    for event in data:
-        event_type = event.get("type")
-        match event_type:
-            case "game_release":
-                event = EventGameRelease.model_validate(event)
-            case "game_update":
-                event = EventGameUpdate.model_validate(event)
-            case _:
-                continue
-
-        events.append(event)
-
-    return events
-
-
-async def send_events_slack_released_within_days(
-    events: list[EventGameRelease] | list[EventGameUpdate], days: int = 60
-) -> None:
-    blocks = []
-    now = datetime.now()
-    interesting_date = now + timedelta(days=days)
-
-    filtered_events = [
-        event for event in events if now <= event.date <= interesting_date
-    ]
-
-    # Sort events by size in descending order
-    sorted_events = sorted(filtered_events, key=lambda event: event.date)
-
-    total_events = 0
-    for event in sorted_events:
-        logger.info(
-            f"Event {event} is scheduled to release within the next {days} days"
-        )
-
-        event_block = [
-            HeaderBlock(text=event.name),
-            SectionBlock(
-                text=f"Estimated Size: {event.size}GB\nType: {event.type}",
-                accessory=ButtonElement(
-                    text=f"Issue #{event.github_issue_id}",
-                    url=f"https://github.com/veesix-networks/traffix/issues/{event.github_issue_id}",
-                ),
-            ),
-            ContextBlock(
-                elements=[MarkdownTextObject(text=f"Estimated date: {event.date}")]
-            ),
-            DividerBlock(),
-        ]
-        total_events += 1
-
-        blocks.extend(event_block)
-
-    if total_events:
-        blocks.insert(
-            0,
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(
-                        text=f"Here is a summary of all the game releases and updates coming out within the next {days} days."
-                    )
-                ]
-            ),
-        )
-    else:
-        blocks.insert(
-            0,
-            ContextBlock(
-                elements=[
-                    MarkdownTextObject(
-                        text=f"No game releases or updates are being released that Traffix knows about within the next {days} days."
-                    )
-                ]
-            ),
-        )
-
-    client = SlackClient(url=settings.SLACK_WEBHOOK)
-    await client.send(blocks=blocks)
+JOB_ID = "notifier"
 
 
+@instrument_job(JOB_ID)
+@profile_job(JOB_ID)
 async def run_job() -> None:
     logger.info("Checking if any redis keys need to be updated...")
 
@@ -129,26 +41,41 @@ async def run_job() -> None:
         logger.error(f"Unable to connect to Redis due to: {err}")
         exit()
 
-    events = []
+    days = settings.NOTIFIER_WINDOW_DAYS
+    start = datetime.now()
+    end = start + timedelta(days=days)
 
-    events.extend(await load_events("event_game_releases", client))
-    events.extend(await load_events("event_game_updates", client))
+    with JOB_STAGE_DURATION.labels(JOB_ID, "load_events").time():
+        events, _ = await query_events(client, EventQuery(start=start, end=end))
 
-    await send_events_slack_released_within_days(events)
+    try:
+        async with aiohttp.ClientSession() as session:
+            notifiers: list[Notifier] = [SlackNotifier(settings.SLACK_WEBHOOK, session)]
+            if settings.DISCORD_WEBHOOK:
+                notifiers.append(DiscordNotifier(settings.DISCORD_WEBHOOK, session))
+
+            with JOB_STAGE_DURATION.labels(JOB_ID, "notify").time():
+                await fan_out(client, notifiers, events, days)
+    finally:
+        await client.close()
 
 
 if __name__ == "__main__":
+    if settings.METRICS_ENABLED:
+        start_metrics_server(settings.NOTIFIER_METRICS_PORT)
+
     scheduler = AsyncIOScheduler()
+    count_skipped_runs(scheduler)
 
     trigger = CronTrigger(hour=8, minute=30)
 
-    scheduler.add_job(run_job, trigger=trigger, id="notifier")
+    scheduler.add_job(run_job, trigger=trigger, id=JOB_ID)
     scheduler.start()
 
     if settings.RUN_NOW:
         logger.info("Running Job straight away")
-        scheduler.modify_job(job_id="notifier", next_run_time=datetime.now())
-        job = scheduler.get_job(job_id="notifier")
+        scheduler.modify_job(job_id=JOB_ID, next_run_time=datetime.now())
+        job = scheduler.get_job(job_id=JOB_ID)
 
     try:
         asyncio.get_event_loop().run_forever()